@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .approvals import approve_transactions, reject_transactions
 from .models import Transaction, PaymentSettings
 
 @admin.register(Transaction)
@@ -12,16 +13,11 @@ class TransactionAdmin(admin.ModelAdmin):
 
     @admin.action(description='Approve selected transactions')
     def approve_transactions(self, request, queryset):
-        for tx in queryset:
-            if tx.status == 'pending':
-                tx.status = 'approved'
-                tx.user.credits += tx.credits
-                tx.user.save()
-                tx.save()
+        approve_transactions(queryset.values_list('pk', flat=True))
 
     @admin.action(description='Reject selected transactions')
     def reject_transactions(self, request, queryset):
-        queryset.update(status='rejected')
+        reject_transactions(queryset.values_list('pk', flat=True))
 
 @admin.register(PaymentSettings)
 class PaymentSettingsAdmin(admin.ModelAdmin):
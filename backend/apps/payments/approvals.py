@@ -0,0 +1,65 @@
+"""
+Set-based approval and rejection of credit purchases.
+
+Approval never reads a balance: each batch is claimed with one conditional
+UPDATE (status pending -> approved, tagged with a random approval token)
+and credited with one UPDATE that adds, per user, the sum of the claimed
+transactions' credits via F(), and the matching credit ledger entries are
+inserted in one statement. All of it runs in one DB transaction, so a
+transaction is credited exactly once even when admins approve it
+concurrently, and concurrent F() deductions by generations are preserved.
+"""
+
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import transaction as db_transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CreditLedgerEntry, Transaction
+
+# Ids per statement; keeps IN lists well below backend parameter limits
+APPROVAL_CHUNK_SIZE = 500
+
+
+def approve_transactions(ids):
+    """
+    Approve the pending transactions among ``ids`` and credit their users.
+    Returns the ids that this call approved; others were not pending.
+    """
+    User = get_user_model()
+    ids = list(dict.fromkeys(ids))
+    approved = []
+    with db_transaction.atomic():
+        for start in range(0, len(ids), APPROVAL_CHUNK_SIZE):
+            chunk = ids[start:start + APPROVAL_CHUNK_SIZE]
+            token = uuid.uuid4().hex
+            claimed = Transaction.objects.filter(id__in=chunk, status='pending').update(
+                status='approved', approval_token=token, updated_at=timezone.now(),
+            )
+            if not claimed:
+                continue
+            claimed_rows = Transaction.objects.filter(approval_token=token)
+            per_user = (
+                claimed_rows.filter(user=OuterRef('pk')).order_by().values('user')
+                .annotate(total=Sum('credits')).values('total')
+            )
+            User.objects.filter(id__in=claimed_rows.values('user')).update(
+                credits=F('credits') + Coalesce(Subquery(per_user), 0),
+            )
+            claimed_list = list(claimed_rows.order_by('id').values_list('id', 'user_id', 'credits'))
+            CreditLedgerEntry.objects.bulk_create([
+                CreditLedgerEntry(user_id=user_id, delta=credits, kind='purchase', reference=f'transaction:{tx_id}')
+                for tx_id, user_id, credits in claimed_list
+            ])
+            approved.extend(tx_id for tx_id, _, _ in claimed_list)
+    return approved
+
+
+def reject_transactions(ids):
+    """Reject the pending transactions among ``ids``; returns how many were rejected."""
+    return Transaction.objects.filter(id__in=list(ids), status='pending').update(
+        status='rejected', updated_at=timezone.now(),
+    )
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PaymentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.payments'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_save
+        from .ledger import record_signup_grant
+
+        post_save.connect(record_signup_grant, sender=get_user_model(), dispatch_uid='credit-ledger-signup')
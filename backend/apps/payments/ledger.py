@@ -0,0 +1,181 @@
+"""
+Append-only credit ledger.
+
+Every change of ``User.credits`` goes through change_credits() (or writes
+its CreditLedgerEntry rows in the same DB transaction, as approvals do), so
+the ledger sums to each user's balance. CreditSnapshot rows, written
+periodically by ``python manage.py snapshot_credit_balances``, hold a
+user's balance through a given entry. A past balance or a statement page
+is the nearest snapshot plus a range scan over the (user, id) index, not a
+scan of the user's whole history.
+
+Snapshots only cover entries older than SNAPSHOT_LAG, so an entry whose
+transaction commits late is never skipped. ``python manage.py
+reconcile_credits`` compares the ledger with User.credits in batches.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CreditLedgerEntry, CreditSnapshot
+
+SNAPSHOT_LAG = timedelta(minutes=1)
+
+
+def change_credits(user_id, delta, kind, reference='', require_balance=False):
+    """
+    Add ``delta`` to the user's credits and append the ledger entry atomically.
+    With ``require_balance`` a debit only applies if the balance covers it.
+    Returns False when nothing was changed.
+    """
+    if not delta:
+        return True
+    users = get_user_model().objects.filter(id=user_id)
+    if require_balance and delta < 0:
+        users = users.filter(credits__gte=-delta)
+    with transaction.atomic():
+        if not users.update(credits=F('credits') + delta):
+            return False
+        CreditLedgerEntry.objects.create(user_id=user_id, delta=delta, kind=kind, reference=reference)
+    return True
+
+
+def record_signup_grant(sender, instance, created=False, raw=False, **kwargs):
+    """post_save handler for users: the starting credits are the first entry."""
+    if created and not raw and instance.credits:
+        CreditLedgerEntry.objects.create(user_id=instance.pk, delta=instance.credits, kind='signup')
+
+
+def _latest_snapshots(user_ids, through_id=None):
+    latest = CreditSnapshot.objects.filter(user=OuterRef('user'))
+    if through_id is not None:
+        latest = latest.filter(last_entry_id__lte=through_id)
+    latest = latest.order_by('-last_entry_id').values('pk')[:1]
+    return {
+        snapshot.user_id: snapshot
+        for snapshot in CreditSnapshot.objects.filter(user_id__in=user_ids, pk=Subquery(latest))
+    }
+
+
+def ledger_balances(user_ids, through_id=None):
+    """
+    Ledger balance of each user (through entry ``through_id`` if given):
+    ``{user_id: (balance, last_entry_id, as_of, entries_since_snapshot)}``.
+    Users without entries are omitted.
+    """
+    snapshots = _latest_snapshots(user_ids, through_id)
+    since = CreditSnapshot.objects.filter(user=OuterRef('user'))
+    if through_id is not None:
+        since = since.filter(last_entry_id__lte=through_id)
+    since = since.order_by('-last_entry_id').values('last_entry_id')[:1]
+    entries = CreditLedgerEntry.objects.filter(user_id__in=user_ids, id__gt=Coalesce(Subquery(since), 0))
+    if through_id is not None:
+        entries = entries.filter(id__lte=through_id)
+
+    balances = {
+        user_id: (snapshot.balance, snapshot.last_entry_id, snapshot.as_of, 0)
+        for user_id, snapshot in snapshots.items()
+    }
+    totals = entries.order_by().values('user').annotate(
+        total=Sum('delta'), last=Max('id'), as_of=Max('created_at'), count=Count('id'),
+    )
+    for row in totals:
+        base = balances.get(row['user'], (0,))[0]
+        balances[row['user']] = (base + row['total'], row['last'], row['as_of'], row['count'])
+    return balances
+
+
+def balance_at(user_id, when):
+    """The user's balance at time ``when``."""
+    snapshot = (
+        CreditSnapshot.objects.filter(user_id=user_id, as_of__lte=when).order_by('-last_entry_id').first()
+    )
+    entries = CreditLedgerEntry.objects.filter(user_id=user_id, created_at__lte=when)
+    if snapshot:
+        entries = entries.filter(id__gt=snapshot.last_entry_id)
+    return (snapshot.balance if snapshot else 0) + (entries.aggregate(total=Sum('delta'))['total'] or 0)
+
+
+def statement_page(user_id, before_id=None, limit=50):
+    """
+    Up to ``limit`` entries older than ``before_id`` (newest first), each
+    with the balance after it.
+    """
+    entries = CreditLedgerEntry.objects.filter(user_id=user_id)
+    if before_id is not None:
+        entries = entries.filter(id__lt=before_id)
+    page = list(entries.order_by('-id')[:limit])
+    if not page:
+        return []
+    balance = ledger_balances([user_id], through_id=page[0].id)[user_id][0]
+    rows = []
+    for entry in page:
+        rows.append({
+            'id': entry.id,
+            'delta': entry.delta,
+            'kind': entry.kind,
+            'reference': entry.reference,
+            'created_at': entry.created_at,
+            'balance_after': balance,
+        })
+        balance -= entry.delta
+    return rows
+
+
+def _user_id_batches(batch_size):
+    last_pk = 0
+    User = get_user_model()
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return
+        last_pk = ids[-1]
+        yield ids
+
+
+def take_snapshots(batch_size=1000, min_entries=1, now=None):
+    """
+    Snapshot every user with at least ``min_entries`` entries since their
+    last snapshot (and older than SNAPSHOT_LAG). Returns the number written.
+    """
+    cutoff = (now or timezone.now()) - SNAPSHOT_LAG
+    high_water = (
+        CreditLedgerEntry.objects.filter(created_at__lt=cutoff).aggregate(last=Max('id'))['last']
+    )
+    if high_water is None:
+        return 0
+    written = 0
+    for ids in _user_id_batches(batch_size):
+        snapshots = [
+            CreditSnapshot(user_id=user_id, last_entry_id=last_entry_id, as_of=as_of, balance=balance)
+            for user_id, (balance, last_entry_id, as_of, count) in ledger_balances(ids, high_water).items()
+            if count >= min_entries
+        ]
+        CreditSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+        written += len(snapshots)
+    return written
+
+
+def reconcile(batch_size=1000):
+    """
+    Yield ``(user_id, credits, ledger_balance)`` for users whose credits
+    disagree with the ledger. Candidates found in a batch are re-checked
+    with the user row locked, so in-flight changes are not reported.
+    """
+    User = get_user_model()
+    for ids in _user_id_batches(batch_size):
+        balances = ledger_balances(ids)
+        credits = dict(User.objects.filter(pk__in=ids).values_list('pk', 'credits'))
+        for user_id in ids:
+            if credits.get(user_id) == balances.get(user_id, (0,))[0]:
+                continue
+            with transaction.atomic():
+                locked = User.objects.select_for_update().filter(pk=user_id).values_list('credits', flat=True).first()
+                ledger_balance = ledger_balances([user_id]).get(user_id, (0,))[0]
+            if locked is not None and locked != ledger_balance:
+                yield user_id, locked, ledger_balance
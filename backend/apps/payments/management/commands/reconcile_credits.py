@@ -0,0 +1,34 @@
+"""
+Management command that checks User.credits against the credit ledger.
+Run with: python manage.py reconcile_credits [--batch-size 1000]
+
+Users are streamed in primary-key batches; each batch costs a few queries
+(latest snapshots, ledger sums after them, current credits). Exits with an
+error if any user's credits disagree with the ledger.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.payments.ledger import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Verify ledger balances against User.credits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per batch')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        mismatches = 0
+        for user_id, credits, ledger_balance in reconcile(batch_size=max(1, options['batch_size'])):
+            mismatches += 1
+            self.stderr.write(
+                f'User {user_id}: credits {credits}, ledger {ledger_balance} ({credits - ledger_balance:+d})'
+            )
+        elapsed = time.monotonic() - started
+        if mismatches:
+            raise CommandError(f'{mismatches} user(s) do not match the ledger ({elapsed:.2f}s)')
+        self.stdout.write(self.style.SUCCESS(f'All balances match the ledger ({elapsed:.2f}s)'))
@@ -0,0 +1,33 @@
+"""
+Management command that snapshots per-user credit balances from the ledger.
+Run periodically (e.g. nightly cron) with:
+python manage.py snapshot_credit_balances [--batch-size 1000] [--min-entries 20]
+
+Only users with at least --min-entries ledger entries since their last
+snapshot get a new one, which bounds the range scanned for any balance.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.payments.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Write credit balance snapshots for users with new ledger entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per batch')
+        parser.add_argument('--min-entries', type=int, default=20,
+                            help='Entries since the last snapshot required for a new one')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = take_snapshots(
+            batch_size=max(1, options['batch_size']),
+            min_entries=max(1, options['min_entries']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} snapshot(s) in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:28
+
+import apps.voices.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_paymentsettings'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentsettings',
+            name='qr_code',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.voices.storage.ShardedUpload('payment_settings')),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='screenshot',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.voices.storage.ShardedUpload('payment_screenshots')),
+        ),
+    ]
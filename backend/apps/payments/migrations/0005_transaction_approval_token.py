@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_sharded_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='approval_token',
+            field=models.CharField(blank=True, db_index=True, max_length=32),
+        ),
+    ]
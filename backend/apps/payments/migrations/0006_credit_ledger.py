@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """Record each existing user's current credits as an opening entry."""
+    User = apps.get_model('users', 'User')
+    CreditLedgerEntry = apps.get_model('payments', 'CreditLedgerEntry')
+    last_pk = 0
+    while True:
+        batch = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'credits')[:1000])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        CreditLedgerEntry.objects.bulk_create([
+            CreditLedgerEntry(user_id=pk, delta=credits, kind='opening')
+            for pk, credits in batch
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_transaction_approval_token'),
+        ('users', '0003_user_credits'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CreditLedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('signup', 'Signup grant'), ('purchase', 'Purchase'), ('generation', 'Generation'), ('refund', 'Refund'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'credit_ledger',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='credit_ledger_user_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CreditSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('as_of', models.DateTimeField()),
+                ('balance', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='credit_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'credit_snapshots',
+                'indexes': [models.Index(fields=['user', 'as_of'], name='credit_snapshot_user_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'last_entry_id'), name='credit_snapshot_unique_entry')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from apps.voices.storage import ShardedUpload
+
 class Transaction(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -12,9 +14,11 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     credits = models.IntegerField()
     transaction_id = models.CharField(max_length=100, unique=True, help_text="UPI Reference ID / UTR")
-    screenshot = models.ImageField(upload_to='payment_screenshots/', null=True, blank=True)
+    screenshot = models.ImageField(upload_to=ShardedUpload('payment_screenshots'), null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=50, default='UPI')
+    # Set by apps.payments.approvals to find the rows one approval claimed
+    approval_token = models.CharField(max_length=32, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -23,7 +27,7 @@ class Transaction(models.Model):
 
 class PaymentSettings(models.Model):
     upi_id = models.CharField(max_length=100, default='sajin.602@oksbi')
-    qr_code = models.ImageField(upload_to='payment_settings/', null=True, blank=True)
+    qr_code = models.ImageField(upload_to=ShardedUpload('payment_settings'), null=True, blank=True)
     is_active = models.BooleanField(default=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -40,3 +44,74 @@ class PaymentSettings(models.Model):
         # Or checking existing count and preventing new?
         # Let's rely on retrieving `first()` in view.
         super().save(*args, **kwargs)
+
+
+class AppendOnlyQuerySet(models.QuerySet):
+    """Ledger rows are never changed or removed in bulk (user deletion still cascades)."""
+
+    def update(self, **kwargs):
+        raise TypeError('The credit ledger is append-only')
+
+    def delete(self):
+        raise TypeError('The credit ledger is append-only')
+
+
+class CreditLedgerEntry(models.Model):
+    """One change of a user's credits, written in the same DB transaction as the change."""
+    KIND_CHOICES = (
+        ('opening', 'Opening balance'),
+        ('signup', 'Signup grant'),
+        ('purchase', 'Purchase'),
+        ('generation', 'Generation'),
+        ('refund', 'Refund'),
+        ('adjustment', 'Adjustment'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='credit_entries')
+    delta = models.IntegerField()
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # What caused the change, e.g. "transaction:12"
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AppendOnlyQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'credit_ledger'
+        ordering = ['-id']
+        indexes = [
+            # Per-user range scans after a snapshot
+            models.Index(fields=['user', 'id'], name='credit_ledger_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.delta:+d} ({self.kind})"
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise TypeError('The credit ledger is append-only')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('The credit ledger is append-only')
+
+
+class CreditSnapshot(models.Model):
+    """A user's balance after ledger entry ``last_entry_id`` (created at ``as_of``)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='credit_snapshots')
+    last_entry_id = models.BigIntegerField()
+    as_of = models.DateTimeField()
+    balance = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'credit_snapshots'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'last_entry_id'], name='credit_snapshot_unique_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'as_of'], name='credit_snapshot_user_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.balance} through entry {self.last_entry_id}"
@@ -1,10 +1,13 @@
 from rest_framework import serializers
+from apps.voices.image_variants import ImageVariantsField
 from .models import Transaction, PaymentSettings
 
 class TransactionSerializer(serializers.ModelSerializer):
+    screenshot_variants = ImageVariantsField(source='screenshot')
+
     class Meta:
         model = Transaction
-        fields = ['id', 'amount', 'credits', 'transaction_id', 'screenshot', 'status', 'created_at']
+        fields = ['id', 'amount', 'credits', 'transaction_id', 'screenshot', 'screenshot_variants', 'status', 'created_at']
         read_only_fields = ['id', 'status', 'credits', 'created_at']
 
     def create(self, validated_data):
@@ -22,10 +25,14 @@ class TransactionSerializer(serializers.ModelSerializer):
 
 class AdminTransactionSerializer(serializers.ModelSerializer):
     user_email = serializers.EmailField(source='user.email', read_only=True)
+    screenshot_variants = ImageVariantsField(source='screenshot')
     
     class Meta:
         model = Transaction
-        fields = ['id', 'user_email', 'amount', 'credits', 'transaction_id', 'screenshot', 'status', 'created_at', 'updated_at']
+        fields = [
+            'id', 'user_email', 'amount', 'credits', 'transaction_id', 'screenshot', 'screenshot_variants',
+            'status', 'created_at', 'updated_at'
+        ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 class PaymentSettingsSerializer(serializers.ModelSerializer):
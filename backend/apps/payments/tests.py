@@ -1,3 +1,157 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .approvals import approve_transactions
+from .ledger import balance_at, change_credits, reconcile, statement_page, take_snapshots
+from .models import CreditLedgerEntry, CreditSnapshot, Transaction
+
+User = get_user_model()
+
+
+def make_transactions(user, count, credits=10, prefix='utr'):
+    return Transaction.objects.bulk_create([
+        Transaction(user=user, amount=Decimal(credits), credits=credits, transaction_id=f'{prefix}-{user.pk}-{i}')
+        for i in range(count)
+    ])
+
+
+class AdminTransactionApprovalTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@example.com', password='pw', name='Admin', is_admin=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.users = [
+            User.objects.create_user(email=f'buyer{i}@example.com', password='pw', name='Buyer', credits=10)
+            for i in range(3)
+        ]
+
+    def test_approve_credits_once(self):
+        """Test that a transaction approved twice is credited once."""
+        tx = make_transactions(self.users[0], 1, credits=100)[0]
+        url = f'/api/payments/admin/transactions/{tx.pk}/approve/'
+
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].credits, 110)
+
+    def test_bulk_approve_is_set_based(self):
+        """Test that hundreds of approvals run in a constant number of statements."""
+        transactions = [tx for user in self.users for tx in make_transactions(user, 100)]
+        Transaction.objects.filter(pk=transactions[0].pk).update(status='approved')
+        ids = [tx.pk for tx in transactions] + [999999]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/payments/admin/transactions/bulk-approve/', {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['approved']), 299)
+        self.assertEqual(response.data['skipped'], [transactions[0].pk, 999999])
+        self.assertLess(len(queries), 15)
+        credits = sorted(User.objects.filter(pk__in=[u.pk for u in self.users]).values_list('credits', flat=True))
+        self.assertEqual(credits, [1000, 1010, 1010])
+
+
+class CreditLedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='ledger@example.com', password='pw', name='Ledger', credits=10)
+
+    def test_every_balance_change_is_recorded(self):
+        """Test that signup, charges, refunds and approvals all land in the ledger."""
+        change_credits(self.user.pk, -5, 'generation', require_balance=True)
+        self.assertFalse(change_credits(self.user.pk, -50, 'generation', require_balance=True))
+        change_credits(self.user.pk, 5, 'refund')
+        approve_transactions([tx.pk for tx in make_transactions(self.user, 2, credits=100)])
+
+        self.user.refresh_from_db()
+        kinds = list(CreditLedgerEntry.objects.filter(user=self.user).order_by('id').values_list('kind', 'delta'))
+        self.assertEqual(kinds, [('signup', 10), ('generation', -5), ('refund', 5), ('purchase', 100), ('purchase', 100)])
+        self.assertEqual(self.user.credits, 210)
+        self.assertEqual(list(reconcile()), [])
+
+    def test_reconcile_reports_untracked_changes(self):
+        """Test that a balance changed outside the ledger is reported."""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from io import StringIO
+
+        User.objects.filter(pk=self.user.pk).update(credits=999)
+
+        self.assertEqual(list(reconcile(batch_size=1)), [(self.user.pk, 999, 10)])
+        with self.assertRaises(CommandError):
+            call_command('reconcile_credits', stderr=StringIO())
+
+    def test_statement_and_past_balance_start_from_snapshot(self):
+        """Test that statements and past balances agree with the running balance across a snapshot."""
+        from datetime import timedelta
+        from django.utils import timezone
+
+        for delta in (5, -3, 7):
+            change_credits(self.user.pk, delta, 'adjustment')
+        self.assertEqual(take_snapshots(now=timezone.now() + timedelta(minutes=5)), 1)
+        snapshot = CreditSnapshot.objects.get(user=self.user)
+        self.assertEqual(snapshot.balance, 19)
+        middle = timezone.now()
+        change_credits(self.user.pk, -4, 'adjustment')
+
+        page = statement_page(self.user.pk, limit=2)
+        self.assertEqual([(row['delta'], row['balance_after']) for row in page], [(-4, 15), (7, 19)])
+        older = statement_page(self.user.pk, before_id=page[-1]['id'])
+        self.assertEqual([row['balance_after'] for row in older], [12, 15, 10])
+        self.assertEqual(balance_at(self.user.pk, middle), 19)
+
+    def test_entries_are_append_only(self):
+        """Test that ledger rows cannot be edited or deleted."""
+        entry = CreditLedgerEntry.objects.get(user=self.user)
+
+        with self.assertRaises(TypeError):
+            entry.save()
+        with self.assertRaises(TypeError):
+            CreditLedgerEntry.objects.filter(user=self.user).delete()
+
+
+class ConcurrentApprovalTests(TransactionTestCase):
+    def test_concurrent_approvals_and_deductions_lose_no_updates(self):
+        """Test that parallel approvals and deductions on one user all apply and reach the ledger."""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a database that lets threads write concurrently')
+
+        user = User.objects.create_user(email='race@example.com', password='pw', name='Race', credits=1000)
+        transactions = make_transactions(user, 40, credits=5)
+        ids = [tx.pk for tx in transactions]
+        barrier = threading.Barrier(8)
+
+        def approver(offset):
+            barrier.wait()
+            try:
+                # Every approver also tries everyone else's transactions
+                for tx_id in ids[offset::2] + ids:
+                    approve_transactions([tx_id])
+            finally:
+                close_old_connections()
+
+        def spender():
+            barrier.wait()
+            try:
+                for _ in range(50):
+                    change_credits(user.pk, -1, 'generation', require_balance=True)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=approver, args=(i % 2,)) for i in range(4)]
+        threads += [threading.Thread(target=spender) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        user.refresh_from_db()
+        self.assertEqual(user.credits, 1000 + 40 * 5 - 4 * 50)
+        self.assertFalse(Transaction.objects.filter(status='pending').exists())
+        self.assertEqual(list(reconcile()), [])
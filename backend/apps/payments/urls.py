@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TransactionViewSet, AdminTransactionViewSet, PaymentSettingsView
+from .views import TransactionViewSet, AdminTransactionViewSet, PaymentSettingsView, CreditStatementView
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionViewSet, basename='transaction')
@@ -8,5 +8,6 @@ router.register(r'admin/transactions', AdminTransactionViewSet, basename='admin-
 
 urlpatterns = [
     path('settings/', PaymentSettingsView.as_view(), name='payment-settings'),
+    path('ledger/', CreditStatementView.as_view(), name='credit-statement'),
     path('', include(router.urls)),
 ]
@@ -3,9 +3,12 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from .approvals import approve_transactions, reject_transactions
+from .ledger import statement_page
 from .models import Transaction, PaymentSettings
 from .serializers import TransactionSerializer, AdminTransactionSerializer, PaymentSettingsSerializer
 from apps.users.views import IsAdminPermission
+from apps.voices.response_cache import cached_json_response
 
 class TransactionViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -28,34 +31,60 @@ class AdminTransactionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         transaction = self.get_object()
-        if transaction.status != 'pending':
+        if not approve_transactions([transaction.pk]):
             return Response({'error': 'Transaction already processed'}, status=status.HTTP_400_BAD_REQUEST)
         
-        transaction.status = 'approved'
-        transaction.save()
-        
-        # Add credits to user
-        transaction.user.credits += transaction.credits
-        transaction.user.save()
-        
         return Response({'message': 'Transaction approved and credits added'})
 
+    @action(detail=False, methods=['post'], url_path='bulk-approve')
+    def bulk_approve(self, request):
+        """Approve many pending transactions: POST {"ids": [...]}."""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            return Response({'error': 'ids must be a non-empty list of transaction ids.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        approved = approve_transactions(ids)
+        approved_set = set(approved)
+        return Response({
+            'approved': approved,
+            'skipped': [i for i in dict.fromkeys(ids) if i not in approved_set],
+        })
+
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
         transaction = self.get_object()
-        if transaction.status != 'pending':
+        if not reject_transactions([transaction.pk]):
             return Response({'error': 'Transaction already processed'}, status=status.HTTP_400_BAD_REQUEST)
             
-        transaction.status = 'rejected'
-        transaction.save()
         return Response({'message': 'Transaction rejected'})
 
 class PaymentSettingsView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
+        return cached_json_response(request, 'payment-settings', self.build)
+
+    @staticmethod
+    def build():
         settings = PaymentSettings.objects.filter(is_active=True).first()
         if not settings:
-            return Response({'upi_id': 'sajin.602@oksbi', 'qr_code': None})
+            return {'upi_id': 'sajin.602@oksbi', 'qr_code': None}
         serializer = PaymentSettingsSerializer(settings)
-        return Response(serializer.data)
+        return serializer.data
+
+class CreditStatementView(APIView):
+    """The current user's credit history, newest first: GET ?before=<entry id>&limit=50."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            before = int(request.query_params['before']) if request.query_params.get('before') else None
+            limit = min(max(int(request.query_params.get('limit', 50)), 1), 200)
+        except ValueError:
+            return Response({'error': 'before and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = statement_page(request.user.id, before_id=before, limit=limit)
+        return Response({
+            'results': entries,
+            'next_before': entries[-1]['id'] if len(entries) == limit else None,
+        })
@@ -0,0 +1,129 @@
+"""
+JWT authentication backed by a short-lived per-process user cache.
+
+simplejwt's JWTAuthentication loads the user row on every request. Here the
+loaded user is kept for AUTH_USER_CACHE_TTL seconds and each request gets
+its own copy, so views can mutate request.user safely.
+
+Entries are versioned per user id. User save/delete signals (which covers
+profile edits, admin changes and password changes) bump the version and
+drop the entry. A load that raced with an invalidation is never cached.
+Other processes see changes after at most the TTL. Tokens issued after a
+role change carry the new ``is_admin``/``email`` claims, and a mismatch with
+the cached copy forces a reload.
+
+Credits are not trusted from the cache: credit-sensitive views update with
+conditional UPDATEs and re-read the row (see GenerateSpeechView, ProfileView).
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Claims added by CustomTokenObtainPairSerializer that mirror user fields
+CLAIM_FIELDS = ('is_admin', 'email')
+
+
+class UserCache:
+    """Thread-safe LRU of user instances with a TTL and per-user versions."""
+
+    def __init__(self, ttl=30, max_entries=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user id -> (expires_at, version, user)
+        self._versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions.get(str(user_id), 0)
+
+    def get(self, user_id):
+        """Return a private copy of the cached user, or None."""
+        user_id = str(user_id)  # token claims carry the id as a string
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, version, user = entry
+                if expires_at > self._clock() and version == self._versions.get(user_id, 0):
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return copy.copy(user)
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user, version):
+        """Cache ``user`` unless it was invalidated since ``version`` was read."""
+        user_id = str(user.pk)
+        with self._lock:
+            if version != self._versions.get(user_id, 0):
+                return
+            self._entries[user_id] = (self._clock() + self.ttl, version, copy.copy(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+user_cache = UserCache(
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 30),
+    max_entries=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+)
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves users through ``user_cache``."""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or not getattr(settings, 'AUTH_USER_CACHE_TTL', 30):
+            return super().get_user(validated_token)
+
+        user = user_cache.get(user_id)
+        if user is not None and any(
+            claim in validated_token and validated_token[claim] != getattr(user, claim)
+            for claim in CLAIM_FIELDS
+        ):
+            # Token issued after a change this process has not seen yet
+            user_cache.invalidate(user_id)
+            user = None
+
+        if user is None:
+            version = user_cache.version(user_id)
+            user = super().get_user(validated_token)
+            user_cache.set(user, version)
+            return user
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
@@ -0,0 +1,159 @@
+"""
+Management command to compare mail throughput against a local SMTP stand-in.
+Run with: python manage.py benchmark_mail [--messages 200] [--connections 2]
+
+'per-request' sends each message with send_mail() on a new connection, as
+TextMailView used to. 'pooled' delivers the same messages with MailSender
+(one kept-open connection per thread) across --connections threads. The
+stand-in adds --latency-ms to every SMTP reply and --handshake-ms to each
+new connection, standing in for network round trips and TLS + login.
+Nothing is written to the database.
+"""
+
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from apps.users.models import OutgoingEmail
+from apps.users.outbox import MailSender
+
+
+# Minimal local SMTP server, also used by the outbox tests. Implements just
+# enough of SMTP for smtplib (no TLS or AUTH). Accepted messages are kept in
+# ``messages``; ``replies`` maps recipient addresses to RCPT replies (e.g.
+# '550 No such user'). ``latency`` delays every reply and ``handshake_latency``
+# the greeting, to approximate a remote server where connection setup
+# (TCP + TLS + login) costs more than a command.
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        if self.server.handshake_latency:
+            time.sleep(self.server.handshake_latency)
+        self.reply('220 localhost SMTP stand-in')
+        recipients = []
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb in ('MAIL', 'RSET'):
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                response = self.server.replies.get(address, '250 OK')
+                if response.startswith('250'):
+                    recipients.append(address)
+                self.reply(response)
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                with self.server.lock:
+                    self.server.messages.append((recipients, data))
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, replies=None, latency=0.0, handshake_latency=0.0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.replies = replies or {}
+        self.latency = latency
+        self.handshake_latency = handshake_latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request vs pooled SMTP delivery against a local stand-in server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Messages per run')
+        parser.add_argument('--connections', type=int, default=2, help='Pooled SMTP connections')
+        parser.add_argument('--latency-ms', type=float, default=5.0, help='Delay before every SMTP reply')
+        parser.add_argument('--handshake-ms', type=float, default=100.0, help='Extra delay per new connection')
+
+    def handle(self, *args, **options):
+        count = max(1, options['messages'])
+        connections = max(1, options['connections'])
+        server = SMTPStandIn(
+            latency=options['latency_ms'] / 1000.0,
+            handshake_latency=options['handshake_ms'] / 1000.0,
+        ).start()
+        rows = [
+            OutgoingEmail(recipient=f'user{i}@example.com', subject='Benchmark', body=f'Message {i}')
+            for i in range(count)
+        ]
+
+        def per_request():
+            for row in rows:
+                send_mail(row.subject, row.body, None, [row.recipient])
+
+        def pooled():
+            def send_share(share):
+                sender = MailSender()
+                try:
+                    for row in share:
+                        sender.send(row)
+                finally:
+                    sender.close()
+
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(send_share, [rows[i::connections] for i in range(connections)]))
+
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=server.port,
+                EMAIL_USE_TLS=False,
+                EMAIL_USE_SSL=False,
+                EMAIL_HOST_USER='',
+                EMAIL_HOST_PASSWORD='',
+                DEFAULT_FROM_EMAIL='benchmark@example.com',
+            ):
+                for label, run in (('per-request', per_request), (f'pooled x{connections}', pooled)):
+                    server.connections = 0
+                    server.messages.clear()
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f'{label:>14}: {len(server.messages)} messages over {server.connections} connection(s) '
+                        f'in {elapsed:.2f}s = {len(server.messages) / elapsed:.1f} msg/s'
+                    )
+        finally:
+            server.stop()
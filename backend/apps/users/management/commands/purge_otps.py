@@ -0,0 +1,24 @@
+"""
+Management command that deletes used and expired email OTPs.
+Run periodically (e.g. hourly cron) with: python manage.py purge_otps [--batch-size 1000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.users.otp import purge_stale_otps
+
+
+class Command(BaseCommand):
+    help = 'Delete used and expired email OTP rows in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per statement')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        deleted = purge_stale_otps(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} stale OTP row(s) in {time.monotonic() - started:.2f}s'
+        ))
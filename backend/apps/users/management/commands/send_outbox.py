@@ -0,0 +1,90 @@
+"""
+Management command that delivers queued email from the outbox.
+Run with: python manage.py send_outbox [--connections 2] [--batch-size 50] [--once]
+
+Use with EMAIL_OUTBOX_MODE=worker so web processes only enqueue. Each sender
+thread keeps its own SMTP connection open while there is mail to send and
+closes it after --keepalive idle seconds.
+"""
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.users.outbox import MailSender, drain, requeue_stale
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email over a pool of persistent SMTP connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2,
+                            help='Parallel SMTP connections, one sender thread each')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--keepalive', type=float, default=60.0,
+                            help='Close the SMTP connection after this many idle seconds')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Requeue rows stuck in sending for this many seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale email(s)')
+
+        stats_lock = threading.Lock()
+        stats = {'sent': 0, 'retry': 0, 'failed': 0, 'latency': 0.0}
+        stop = threading.Event()
+        started = time.monotonic()
+
+        def worker():
+            sender = MailSender()
+            last_sent = time.monotonic()
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    totals = drain(sender, options['batch_size'])
+                    with stats_lock:
+                        for key, value in totals.items():
+                            stats[key] += value
+                    if totals['sent'] or totals['retry'] or totals['failed']:
+                        last_sent = time.monotonic()
+                        self.stdout.write(
+                            f"{totals['sent']} sent, {totals['retry']} to retry, {totals['failed']} failed"
+                        )
+                    if options['once']:
+                        return
+                    if time.monotonic() - last_sent > options['keepalive']:
+                        sender.close()
+                    stop.wait(options['poll_interval'])
+            finally:
+                sender.close()
+                close_old_connections()
+
+        threads = [
+            threading.Thread(target=worker, name=f'mail-sender-{i}', daemon=True)
+            for i in range(max(1, options['connections']))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        sent = stats['sent']
+        wall = time.monotonic() - started
+        if sent or stats['failed']:
+            self.stdout.write(self.style.SUCCESS(
+                f"Sent {sent} email(s), {stats['failed']} failed, {stats['retry']} retries scheduled in {wall:.2f}s "
+                f"({sent / wall if wall else 0:.1f} msg/s); "
+                f"mean delivery latency {stats['latency'] / sent if sent else 0:.2f}s"
+            ))
+        else:
+            self.stdout.write('No queued email')
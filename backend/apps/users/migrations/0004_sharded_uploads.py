@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:28
+
+import apps.voices.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_credits'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.voices.storage.ShardedUpload('avatars')),
+        ),
+    ]
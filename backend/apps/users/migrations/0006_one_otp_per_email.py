@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:42
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def keep_newest_otp_per_email(apps, schema_editor):
+    EmailOTP = apps.get_model('users', 'EmailOTP')
+    duplicated = (
+        EmailOTP.objects.values('email').annotate(rows=Count('id'), newest=Max('id')).filter(rows__gt=1)
+    )
+    for entry in duplicated:
+        EmailOTP.objects.filter(email=entry['email']).exclude(id=entry['newest']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_email_outbox'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_newest_otp_per_email, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='emailotp',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='emailotp',
+            index=models.Index(fields=['is_used', 'expires_at'], name='email_otps_purge_idx'),
+        ),
+    ]
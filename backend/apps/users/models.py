@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.utils import timezone
+
+from apps.voices.storage import ShardedUpload
 
 
 class UserManager(BaseUserManager):
@@ -26,7 +29,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     email = models.EmailField(unique=True, max_length=255)
     name = models.CharField(max_length=255)
-    avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    avatar = models.ImageField(upload_to=ShardedUpload('avatars'), null=True, blank=True)
     credits = models.IntegerField(default=10)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
@@ -52,9 +55,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 class EmailOTP(models.Model):
-    """Store OTP codes for email verification."""
+    """Store OTP codes for email verification (at most one row per email)."""
     
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     otp = models.CharField(max_length=6)
     name = models.CharField(max_length=255)
     password = models.CharField(max_length=255)  # Hashed password
@@ -65,6 +68,10 @@ class EmailOTP(models.Model):
     class Meta:
         db_table = 'email_otps'
         ordering = ['-created_at']
+        indexes = [
+            # Purge scans: used rows, then unused rows by expiry
+            models.Index(fields=['is_used', 'expires_at'], name='email_otps_purge_idx'),
+        ]
     
     def __str__(self):
         return f"OTP for {self.email}"
@@ -73,3 +80,47 @@ class EmailOTP(models.Model):
     def is_expired(self):
         from django.utils import timezone
         return timezone.now() > self.expires_at
+
+
+class OutgoingEmail(models.Model):
+    """Queued email, delivered by apps.users.outbox (one row per recipient)."""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    # Random id shared by the rows of one bulk request, for status lookups
+    batch = models.CharField(max_length=32, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # Random token of the sender that claimed the row, and when
+    claim_token = models.CharField(max_length=32, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'email_outbox'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.recipient} ({self.status})"
+    
+    @property
+    def delivery_latency(self):
+        """Seconds from enqueue to delivery, or None while undelivered."""
+        if self.sent_at is None:
+            return None
+        return (self.sent_at - self.created_at).total_seconds()
@@ -0,0 +1,57 @@
+"""
+Email OTP store.
+
+EmailOTP holds at most one row per email (unique index): issuing a code
+overwrites the previous one, so verification is a single index probe.
+Used and expired rows are deleted by purge_stale_otps() in bounded batches,
+run periodically with ``python manage.py purge_otps``.
+"""
+
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import EmailOTP
+
+OTP_LIFETIME = timedelta(minutes=10)
+
+
+def issue_otp(email, otp, name, password_hash):
+    """Store ``otp`` as the only live code for ``email``, replacing any earlier one."""
+    now = timezone.now()
+    record, _ = EmailOTP.objects.update_or_create(
+        email=email,
+        defaults={
+            'otp': otp,
+            'name': name,
+            'password': password_hash,
+            'created_at': now,
+            'expires_at': now + OTP_LIFETIME,
+            'is_used': False,
+        },
+    )
+    return record
+
+
+def consume_otp(record):
+    """Mark ``record`` used unless another request already did; returns True if this call won."""
+    return bool(EmailOTP.objects.filter(pk=record.pk, otp=record.otp, is_used=False).update(is_used=True))
+
+
+def purge_stale_otps(batch_size=1000, now=None):
+    """Delete used and expired OTP rows, ``batch_size`` at a time. Returns the number deleted."""
+    now = now or timezone.now()
+    deleted = 0
+    for stale in (
+        EmailOTP.objects.filter(is_used=True),
+        EmailOTP.objects.filter(is_used=False, expires_at__lt=now),
+    ):
+        while True:
+            ids = list(stale.order_by().values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            # Re-apply the filter: a row may have been re-issued since it was selected
+            deleted += stale.filter(id__in=ids).delete()[0]
+            if len(ids) < batch_size:
+                break
+    return deleted
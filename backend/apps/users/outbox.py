@@ -0,0 +1,314 @@
+"""
+Database-backed email outbox.
+
+Views call enqueue_email() instead of send_mail(): the message is stored as
+OutgoingEmail rows (one per recipient) in the request's transaction and the
+request returns without touching SMTP. A sender then claims due rows in
+batches and delivers them over one SMTP connection that stays open between
+messages and batches (MailSender), so TLS and login happen once per
+connection instead of once per email.
+
+In 'thread' mode (EMAIL_OUTBOX_MODE) each web process drains the outbox
+after commit, and again when its earliest retry is due, in up to
+EMAIL_OUTBOX_CONNECTIONS threads with one connection each; in 'worker' mode
+rows wait for ``python manage.py send_outbox``. Claims are atomic, so any
+number of senders can drain the same outbox. Threads and retry timers die
+with their process, so in 'thread' mode each web process also runs
+start_recovery(): rows stuck in 'sending' are requeued and due rows drained
+at startup and every EMAIL_OUTBOX_RECOVERY_INTERVAL seconds.
+
+Failed deliveries are retried with full-jitter exponential backoff up to
+EMAIL_OUTBOX_MAX_ATTEMPTS; permanent SMTP rejections (5xx) fail at once.
+Each row keeps its attempt count, last error and sent_at, from which the
+delivery latency is derived.
+"""
+
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.voices.resilience import backoff_delay
+
+from .models import OutgoingEmail
+
+# Errors that mean the connection is gone rather than the message refused
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """Queue a plain-text email to each of ``recipients``; returns the rows."""
+    return enqueue_messages([(subject, body, recipient) for recipient in recipients], from_email)
+
+
+def enqueue_messages(messages, from_email=None, batch=''):
+    """Queue ``(subject, body, recipient)`` messages in one insert; returns the rows."""
+    rows = OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(
+            recipient=recipient,
+            subject=subject,
+            body=body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+            batch=batch,
+        )
+        for subject, body, recipient in messages
+    ], batch_size=500)
+    if getattr(settings, 'EMAIL_OUTBOX_MODE', 'thread') == 'thread':
+        transaction.on_commit(_schedule_drain)
+    return rows
+
+
+def claim_batch(limit):
+    """Atomically move up to ``limit`` due rows to sending; returns them."""
+    now = timezone.now()
+    due = list(
+        OutgoingEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('next_attempt_at')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not due:
+        return []
+    token = uuid.uuid4().hex
+    OutgoingEmail.objects.filter(id__in=due, status='pending').update(
+        status='sending', claim_token=token, claimed_at=now,
+    )
+    return list(OutgoingEmail.objects.filter(claim_token=token, status='sending').order_by('id'))
+
+
+def requeue_stale(stale_after):
+    """Return rows stuck in sending (crashed sender) to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return OutgoingEmail.objects.filter(status='sending', claimed_at__lt=cutoff).update(status='pending')
+
+
+def is_permanent(error):
+    """True for SMTP rejections that a retry will not fix (5xx replies)."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class MailSender:
+    """
+    Delivers claimed rows over one SMTP connection that is reused for every
+    message until close() (or a disconnect, after which it reconnects once).
+    Not thread-safe: use one sender per thread.
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection or get_connection(fail_silently=False)
+        self._open = False
+
+    def close(self):
+        if self._open:
+            try:
+                self.connection.close()
+            finally:
+                self._open = False
+
+    def _send(self, message):
+        if not self._open:
+            self.connection.open()
+            self._open = True
+        self.connection.send_messages([message])
+
+    def send(self, row):
+        message = EmailMessage(
+            subject=row.subject,
+            body=row.body,
+            from_email=row.from_email or None,
+            to=[row.recipient],
+            connection=self.connection,
+        )
+        try:
+            self._send(message)
+        except CONNECTION_ERRORS:
+            # The server dropped the kept-open connection; reconnect once
+            self.close()
+            self._send(message)
+
+    def deliver(self, rows):
+        """Send ``rows`` and record the outcome of each in one bulk update."""
+        max_attempts = getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        base = getattr(settings, 'EMAIL_OUTBOX_RETRY_BASE', 30)
+        cap = getattr(settings, 'EMAIL_OUTBOX_RETRY_CAP', 3600)
+        counts = {'sent': 0, 'retry': 0, 'failed': 0}
+        for row in rows:
+            row.attempts += 1
+            try:
+                self.send(row)
+            except Exception as e:
+                if isinstance(e, CONNECTION_ERRORS):
+                    self.close()
+                row.last_error = f'{type(e).__name__}: {e}'[:1000]
+                if is_permanent(e) or row.attempts >= max_attempts:
+                    row.status = 'failed'
+                    counts['failed'] += 1
+                    print(f"Email {row.id} to {row.recipient} failed after {row.attempts} attempt(s): {row.last_error}")
+                else:
+                    row.status = 'pending'
+                    row.next_attempt_at = timezone.now() + timedelta(
+                        seconds=backoff_delay(row.attempts - 1, base, cap)
+                    )
+                    counts['retry'] += 1
+            else:
+                row.status = 'sent'
+                row.sent_at = timezone.now()
+                row.last_error = ''
+                counts['sent'] += 1
+        OutgoingEmail.objects.bulk_update(
+            rows, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+        )
+        return counts
+
+
+def drain(sender, batch_size=None):
+    """Deliver due rows until none are left; returns outcome counts and latencies."""
+    batch_size = batch_size or getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 50)
+    totals = {'sent': 0, 'retry': 0, 'failed': 0, 'latency': 0.0}
+    while True:
+        rows = claim_batch(batch_size)
+        if not rows:
+            return totals
+        for outcome, count in sender.deliver(rows).items():
+            totals[outcome] += count
+        totals['latency'] += sum(row.delivery_latency for row in rows if row.status == 'sent')
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_retry_timer = None
+# Drain threads running in this process, and whether mail arrived meanwhile
+_active_drains = 0
+_drain_requested = False
+
+
+def pool_size():
+    return max(1, getattr(settings, 'EMAIL_OUTBOX_CONNECTIONS', 2))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # One SMTP connection per thread
+            _executor = ThreadPoolExecutor(max_workers=pool_size(), thread_name_prefix='email-outbox')
+        return _executor
+
+
+def _drain_in_thread():
+    global _active_drains, _drain_requested
+    close_old_connections()
+    sender = MailSender()
+    try:
+        while True:
+            try:
+                totals = drain(sender)
+                if totals['sent'] or totals['failed']:
+                    print(
+                        f"Email outbox: {totals['sent']} sent, {totals['retry']} to retry, {totals['failed']} failed"
+                    )
+            except Exception as e:
+                print(f"Email outbox drain failed: {e}")
+            with _executor_lock:
+                # Mail queued while this thread was finishing is drained here
+                if not _drain_requested:
+                    _active_drains -= 1
+                    break
+                _drain_requested = False
+        _schedule_retry()
+    except Exception as e:
+        print(f"Email outbox retry scheduling failed: {e}")
+    finally:
+        sender.close()
+        close_old_connections()
+
+
+def _schedule_drain():
+    """Start a drain thread, up to pool_size() of them, or flag the running ones."""
+    global _active_drains, _drain_requested
+    with _executor_lock:
+        if _active_drains >= pool_size():
+            _drain_requested = True
+            return
+        _active_drains += 1
+    _get_executor().submit(_drain_in_thread)
+
+
+def _schedule_retry():
+    """Wake the drain thread when the earliest backed-off row becomes due."""
+    global _retry_timer
+    next_due = (
+        OutgoingEmail.objects.filter(status='pending')
+        .order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    )
+    with _executor_lock:
+        if _retry_timer is not None:
+            _retry_timer.cancel()
+            _retry_timer = None
+        if next_due is not None:
+            _retry_timer = threading.Timer(max(0.0, (next_due - timezone.now()).total_seconds()), _schedule_drain)
+            _retry_timer.daemon = True
+            _retry_timer.start()
+
+
+_recovery_started = False
+
+
+def recover(stale_after=None):
+    """
+    Requeue rows stuck in sending and drain what is due, or arm the retry
+    timer for the earliest backed-off row. Returns the number requeued.
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, 'EMAIL_OUTBOX_STALE_AFTER', 600)
+    requeued = requeue_stale(stale_after)
+    if OutgoingEmail.objects.filter(status='pending', next_attempt_at__lte=timezone.now()).exists():
+        _schedule_drain()
+    else:
+        _schedule_retry()
+    return requeued
+
+
+def start_recovery():
+    """
+    In 'thread' mode, recover the outbox now and every
+    EMAIL_OUTBOX_RECOVERY_INTERVAL seconds (once only if it is 0) in a
+    daemon thread. Called once per web process from the WSGI entry point.
+    """
+    global _recovery_started
+    if getattr(settings, 'EMAIL_OUTBOX_MODE', 'thread') != 'thread':
+        return None
+    with _executor_lock:
+        if _recovery_started:
+            return None
+        _recovery_started = True
+    interval = getattr(settings, 'EMAIL_OUTBOX_RECOVERY_INTERVAL', 60)
+
+    def loop():
+        while True:
+            close_old_connections()
+            try:
+                requeued = recover()
+                if requeued:
+                    print(f"Email outbox recovery: {requeued} stale email(s) requeued")
+            except Exception as e:
+                print(f"Email outbox recovery failed: {e}")
+            finally:
+                close_old_connections()
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='email-outbox-recovery', daemon=True)
+    thread.start()
+    return thread
@@ -3,15 +3,19 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 
+from apps.voices.image_variants import ImageVariantsField
+
 User = get_user_model()
 
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for user details."""
     
+    avatar_variants = ImageVariantsField(source='avatar')
+    
     class Meta:
         model = User
-        fields = ['id', 'email', 'name', 'avatar', 'is_admin', 'created_at', 'credits']
+        fields = ['id', 'email', 'name', 'avatar', 'avatar_variants', 'is_admin', 'created_at', 'credits']
         read_only_fields = ['id', 'email', 'is_admin', 'created_at', 'credits']
 
 
@@ -70,10 +74,13 @@ class AdminUserSerializer(serializers.ModelSerializer):
     """Serializer for admin user management."""
     
     password = serializers.CharField(write_only=True, required=False)
+    avatar_variants = ImageVariantsField(source='avatar')
     
     class Meta:
         model = User
-        fields = ['id', 'email', 'name', 'avatar', 'is_active', 'is_admin', 'created_at', 'password']
+        fields = [
+            'id', 'email', 'name', 'avatar', 'avatar_variants', 'is_active', 'is_admin', 'created_at', 'password'
+        ]
         read_only_fields = ['id', 'created_at']
     
     def create(self, validated_data):
@@ -0,0 +1,82 @@
+"""
+Aggregate user statistics for the admin endpoints.
+
+compute_user_stats() gets totals, active and admin counts, signups per day
+and the credit distribution from a single query: every figure is a
+conditional COUNT over one scan of ``users``. user_stats() caches the
+result for ADMIN_STATS_CACHE_TTL seconds, and both AdminUserViewSet.stats
+and AdminDashboardView read it from there.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+SIGNUP_DAYS = 30
+
+# (label, lowest, highest) credit balances; None means unbounded
+CREDIT_BUCKETS = [
+    ('0', None, 0),
+    ('1-9', 1, 9),
+    ('10-49', 10, 49),
+    ('50-99', 50, 99),
+    ('100-499', 100, 499),
+    ('500+', 500, None),
+]
+
+
+def _bucket_filter(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(credits__gte=low)
+    if high is not None:
+        condition &= Q(credits__lte=high)
+    return condition
+
+
+def compute_user_stats(days=SIGNUP_DAYS, now=None):
+    """User statistics in one conditional-aggregation query."""
+    today = timezone.localdate(now or timezone.now())
+    day_starts = [
+        timezone.make_aware(datetime.combine(today - timedelta(days=offset), time.min))
+        for offset in range(days - 1, -2, -1)  # oldest first, plus tomorrow as the end bound
+    ]
+
+    aggregates = {
+        'total': Count('id'),
+        'active': Count('id', filter=Q(is_active=True)),
+        'admin': Count('id', filter=Q(is_admin=True)),
+    }
+    for i, (start, end) in enumerate(zip(day_starts, day_starts[1:])):
+        aggregates[f'day_{i}'] = Count('id', filter=Q(created_at__gte=start, created_at__lt=end))
+    for i, (_, low, high) in enumerate(CREDIT_BUCKETS):
+        aggregates[f'bucket_{i}'] = Count('id', filter=_bucket_filter(low, high))
+
+    row = get_user_model().objects.aggregate(**aggregates)
+    return {
+        'total_users': row['total'],
+        'active_users': row['active'],
+        'admin_users': row['admin'],
+        'signups_per_day': [
+            {'date': start.date().isoformat(), 'count': row[f'day_{i}']}
+            for i, start in enumerate(day_starts[:-1])
+        ],
+        'credit_buckets': [
+            {'range': label, 'count': row[f'bucket_{i}']}
+            for i, (label, _, _) in enumerate(CREDIT_BUCKETS)
+        ],
+    }
+
+
+def user_stats(days=SIGNUP_DAYS):
+    """compute_user_stats(), cached for ADMIN_STATS_CACHE_TTL seconds."""
+    key = f'admin-user-stats:{days}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_user_stats(days)
+        cache.set(key, stats, getattr(settings, 'ADMIN_STATS_CACHE_TTL', 30))
+    return stats
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -29,3 +29,348 @@ class UserTests(TestCase):
         self.assertTrue(admin.is_staff)
         self.assertTrue(admin.is_superuser)
         self.assertTrue(admin.is_active)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .authentication import user_cache
+
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user(email='cache@example.com', password='pw', name='Cache', credits=50)
+        self.client = APIClient()
+        self.authorize(self.user)
+
+    def authorize(self, user):
+        from .serializers import CustomTokenObtainPairSerializer
+
+        token = CustomTokenObtainPairSerializer.get_token(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_cached_user_skips_lookup(self):
+        """Test that repeated requests resolve the user without a users query."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.assertEqual(self.client.get('/api/voices/history/').status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/api/voices/history/').status_code, 200)
+
+        self.assertFalse([q for q in queries if 'FROM "users"' in q['sql']])
+
+    def test_user_save_invalidates_entry(self):
+        """Test that a User save (as done by profile and password changes) invalidates the entry."""
+        self.client.get('/api/auth/profile/')
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        # Stale cache still authenticates until a signal or the TTL invalidates it
+        self.assertEqual(self.client.get('/api/voices/history/').status_code, 200)
+
+        self.user.refresh_from_db()
+        self.user.save()
+        self.assertEqual(self.client.get('/api/voices/history/').status_code, 401)
+
+    def test_newer_token_claims_force_reload(self):
+        """Test that a token issued after a role change bypasses the stale entry."""
+        self.client.get('/api/voices/history/')
+        self.assertEqual(self.client.get('/api/auth/admin/users/stats/').status_code, 403)
+
+        User.objects.filter(pk=self.user.pk).update(is_admin=True)
+        self.user.refresh_from_db()
+        self.authorize(self.user)
+
+        self.assertEqual(self.client.get('/api/auth/admin/users/stats/').status_code, 200)
+
+    def test_credits_are_read_fresh(self):
+        """Test that the profile returns current credits despite a cached user."""
+        self.client.get('/api/auth/profile/')
+        User.objects.filter(pk=self.user.pk).update(credits=7)
+
+        self.assertEqual(self.client.get('/api/auth/profile/').data['credits'], 7)
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        from .management.commands.benchmark_mail import SMTPStandIn
+
+        self.smtp = SMTPStandIn({
+            'gone@example.com': '550 No such user',
+            'busy@example.com': '451 Try again later',
+        }).start()
+        self.addCleanup(self.smtp.stop)
+        settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.port,
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER=None,
+            EMAIL_HOST_PASSWORD=None,
+            DEFAULT_FROM_EMAIL='noreply@example.com',
+            EMAIL_OUTBOX_MODE='worker',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def drain(self):
+        from .outbox import MailSender, drain
+
+        sender = MailSender()
+        try:
+            return drain(sender, batch_size=2)
+        finally:
+            sender.close()
+
+    def test_send_otp_only_enqueues(self):
+        """Test that the OTP request returns without contacting the SMTP server."""
+        from .models import OutgoingEmail
+
+        response = self.client.post('/api/auth/send-otp/', {
+            'email': 'new@example.com', 'name': 'New',
+            'password': 'Str0ng-passphrase', 'password_confirm': 'Str0ng-passphrase',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.smtp.connections, 0)
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual((queued.recipient, queued.status), ('new@example.com', 'pending'))
+
+    def test_batches_share_one_connection(self):
+        """Test that several batches are delivered over a single SMTP connection."""
+        from .models import OutgoingEmail
+        from .outbox import enqueue_email
+
+        recipients = [f'user{i}@example.com' for i in range(5)]
+        enqueue_email('Hello', 'Body', recipients)
+
+        self.assertEqual(self.drain()['sent'], 5)
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(sorted(r[0] for r, _ in self.smtp.messages), recipients)
+        for row in OutgoingEmail.objects.all():
+            self.assertEqual((row.status, row.attempts), ('sent', 1))
+            self.assertGreaterEqual(row.delivery_latency, 0)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_retry_with_backoff(self):
+        """Test that 4xx replies are retried later and 5xx replies fail at once."""
+        from django.utils import timezone
+        from .models import OutgoingEmail
+        from .outbox import enqueue_email
+
+        enqueue_email('Hello', 'Body', ['gone@example.com', 'busy@example.com', 'ok@example.com'])
+        totals = self.drain()
+
+        self.assertEqual((totals['sent'], totals['retry'], totals['failed']), (1, 1, 1))
+        gone = OutgoingEmail.objects.get(recipient='gone@example.com')
+        self.assertEqual(gone.status, 'failed')
+        self.assertIn('No such user', gone.last_error)
+        busy = OutgoingEmail.objects.get(recipient='busy@example.com')
+        self.assertEqual((busy.status, busy.attempts), ('pending', 1))
+
+        # Due again: the second failure exhausts EMAIL_OUTBOX_MAX_ATTEMPTS
+        OutgoingEmail.objects.filter(pk=busy.pk).update(next_attempt_at=timezone.now())
+        self.drain()
+        busy.refresh_from_db()
+        self.assertEqual((busy.status, busy.attempts), ('failed', 2))
+
+    def test_recovery_requeues_stale_rows_and_drains(self):
+        """Test that a restarted web process delivers rows a crashed sender left in sending."""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from . import outbox
+        from .models import OutgoingEmail
+
+        outbox.enqueue_email('Code', 'Body', ['stuck@example.com', 'later@example.com'])
+        OutgoingEmail.objects.filter(recipient='stuck@example.com').update(
+            status='sending', claimed_at=timezone.now() - timedelta(hours=1)
+        )
+        OutgoingEmail.objects.filter(recipient='later@example.com').update(
+            next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+
+        with mock.patch.object(outbox, '_schedule_drain') as schedule_drain, \
+                mock.patch.object(outbox, '_schedule_retry') as schedule_retry:
+            self.assertEqual(outbox.recover(), 1)
+            schedule_drain.assert_called_once_with()
+            self.drain()
+            self.assertEqual(outbox.recover(), 0)
+            # Only the backed-off row is left: a retry timer is armed instead
+            schedule_retry.assert_called_once_with()
+
+        self.assertEqual(OutgoingEmail.objects.get(recipient='stuck@example.com').status, 'sent')
+
+    def test_bulk_text_mail_reports_per_recipient_status(self):
+        """Test that a bulk request queues valid pairs, rejects the rest and reports delivery."""
+        from rest_framework.test import APIClient
+
+        anonymous = self.client.post('/api/auth/text-mail/bulk/', {'messages': [
+            {'email': 'a@example.com', 'message': 'Spam'},
+        ]}, content_type='application/json')
+        self.assertEqual(anonymous.status_code, 401)
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(email='staff@example.com', password='pw', name='Staff', is_admin=True)
+        )
+
+        response = self.client.post('/api/auth/text-mail/bulk/', {'messages': [
+            {'email': 'a@example.com', 'message': 'One'},
+            {'email': 'not-an-address', 'message': 'Two'},
+            {'email': 'gone@example.com', 'message': 'Three'},
+            {'email': 'b@example.com', 'message': 'Four'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.data['results']], ['queued', 'rejected', 'queued', 'queued'])
+
+        self.drain()
+
+        report = self.client.get(f"/api/auth/text-mail/bulk/{response.data['batch']}/").data
+        self.assertEqual(APIClient().get(f"/api/auth/text-mail/bulk/{response.data['batch']}/").status_code, 401)
+        self.assertEqual(report['counts'], {'sent': 2, 'failed': 1})
+        self.assertEqual([r['email'] for r in report['results'] if r['status'] == 'failed'], ['gone@example.com'])
+
+
+class EmailOTPStoreTests(TestCase):
+    def test_reissue_replaces_live_code(self):
+        """Test that requesting a new code keeps a single row per email."""
+        from .models import EmailOTP
+        from .otp import issue_otp
+
+        issue_otp('otp@example.com', '111111', 'Otp', 'hash')
+        EmailOTP.objects.filter(email='otp@example.com').update(is_used=True)
+        issue_otp('otp@example.com', '222222', 'Otp', 'hash')
+
+        record = EmailOTP.objects.get(email='otp@example.com')
+        self.assertEqual((record.otp, record.is_used), ('222222', False))
+
+    def test_verified_code_cannot_be_reused(self):
+        """Test that a code creates one account and is then consumed."""
+        from .otp import issue_otp
+
+        issue_otp('otp@example.com', '123456', 'Otp', 'hash')
+        first = self.client.post('/api/auth/verify-otp/', {'email': 'otp@example.com', 'otp': '123456'})
+        second = self.client.post('/api/auth/verify-otp/', {'email': 'otp@example.com', 'otp': '123456'})
+
+        self.assertEqual((first.status_code, second.status_code), (201, 400))
+        self.assertEqual(User.objects.filter(email='otp@example.com').count(), 1)
+
+    def test_purge_deletes_used_and_expired_in_batches(self):
+        """Test that the purge removes used and expired rows and keeps live ones."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import EmailOTP
+        from .otp import issue_otp, purge_stale_otps
+
+        for i in range(5):
+            issue_otp(f'expired{i}@example.com', '123456', 'Otp', 'hash')
+        EmailOTP.objects.update(expires_at=timezone.now() - timedelta(minutes=1))
+        issue_otp('used@example.com', '123456', 'Otp', 'hash')
+        EmailOTP.objects.filter(email='used@example.com').update(is_used=True)
+        issue_otp('live@example.com', '123456', 'Otp', 'hash')
+
+        self.assertEqual(purge_stale_otps(batch_size=2), 6)
+        self.assertEqual(list(EmailOTP.objects.values_list('email', flat=True)), ['live@example.com'])
+
+
+class AdminUserStatsTests(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.core.cache import cache
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.admin = User.objects.create_user(email='admin@example.com', password='pw', name='Admin', is_admin=True)
+        now = timezone.now()
+        for i, credits in enumerate([0, 0, 5, 10, 49, 50, 120, 499, 500, 10000]):
+            user = User.objects.create_user(
+                email=f'user{i}@example.com', password='pw', name='User', credits=credits, is_active=i % 3 != 0,
+            )
+            User.objects.filter(pk=user.pk).update(created_at=now - timedelta(days=i * 4, hours=1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_single_query_matches_separate_counts(self):
+        """Test that one aggregate query reproduces the per-figure COUNT queries."""
+        from datetime import date
+        from django.utils import timezone
+        from .stats import CREDIT_BUCKETS, compute_user_stats
+
+        with self.assertNumQueries(1):
+            stats = compute_user_stats()
+
+        self.assertEqual(stats['total_users'], User.objects.count())
+        self.assertEqual(stats['active_users'], User.objects.filter(is_active=True).count())
+        self.assertEqual(stats['admin_users'], User.objects.filter(is_admin=True).count())
+        for day in stats['signups_per_day']:
+            expected = sum(
+                1 for created in User.objects.values_list('created_at', flat=True)
+                if timezone.localdate(created) == date.fromisoformat(day['date'])
+            )
+            self.assertEqual(day['count'], expected, day['date'])
+        for bucket, (_, low, high) in zip(stats['credit_buckets'], CREDIT_BUCKETS):
+            queryset = User.objects.all()
+            if low is not None:
+                queryset = queryset.filter(credits__gte=low)
+            if high is not None:
+                queryset = queryset.filter(credits__lte=high)
+            self.assertEqual(bucket['count'], queryset.count(), bucket['range'])
+
+    def test_admin_endpoints_share_cached_stats(self):
+        """Test that the dashboard reuses the stats computed for the users endpoint."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        stats = self.client.get('/api/auth/admin/users/stats/').json()
+        with CaptureQueriesContext(connection) as queries:
+            dashboard = self.client.get('/api/voices/admin/dashboard/').json()
+
+        self.assertEqual(dashboard['users'], stats)
+        self.assertEqual(stats['total_users'], 11)
+        self.assertFalse([q for q in queries if 'FROM "users"' in q['sql']])
+
+
+class TokenBucketThrottleTests(TestCase):
+    def send_otp(self, email, ip='10.0.0.1'):
+        return self.client.post('/api/auth/send-otp/', {
+            'email': email, 'name': 'New',
+            'password': 'Str0ng-passphrase', 'password_confirm': 'Str0ng-passphrase',
+        }, REMOTE_ADDR=ip)
+
+    @override_settings(THROTTLE_BUCKETS={'otp-send-ip': '10:10/hour', 'otp-send-email': '2:1/hour'})
+    def test_over_limit_requests_are_rejected_before_hashing(self):
+        """Test that an empty email bucket gets a 429 without hashing or writing anything."""
+        from unittest import mock
+        from django.contrib.auth.hashers import make_password as real_make_password
+        from .models import EmailOTP
+
+        self.assertEqual([self.send_otp('bot@example.com').status_code for _ in range(2)], [200, 200])
+        with mock.patch('django.contrib.auth.hashers.make_password', wraps=real_make_password) as make_password:
+            throttled = self.send_otp('Bot@Example.com')
+            other = self.send_otp('someone@example.com')
+
+        self.assertEqual(throttled.status_code, 429)
+        self.assertAlmostEqual(int(throttled['Retry-After']), 3600, delta=1)
+        self.assertEqual(other.status_code, 200)
+        self.assertEqual(make_password.call_count, 1)
+        self.assertEqual(EmailOTP.objects.count(), 2)
+
+    @override_settings(THROTTLE_BUCKETS={'text-mail-ip': '3:60/minute', 'text-mail-email': '5:60/minute'})
+    def test_buckets_refill_lazily_and_rejections_take_nothing(self):
+        """Test that tokens come back with time and a rejected request leaves every bucket as it was."""
+        import time
+        from unittest import mock
+
+        def mail(email, ip):
+            return self.client.post('/api/auth/text-mail/', {'email': email, 'message': 'hi'}, REMOTE_ADDR=ip).status_code
+
+        start = time.time()
+        with mock.patch('apps.users.throttling.time.time', return_value=start) as clock:
+            statuses = [mail('a@example.com', '10.0.0.1') for _ in range(4)]
+            # The IP bucket refused the fourth request, so a@example.com still has 2 tokens
+            statuses += [mail('a@example.com', '10.0.0.2') for _ in range(3)]
+            clock.return_value = start + 1
+            statuses.append(mail('b@example.com', '10.0.0.1'))
+
+        self.assertEqual(statuses, [200, 200, 200, 429, 200, 200, 429, 200])
@@ -0,0 +1,86 @@
+"""
+Token-bucket throttling for the unauthenticated OTP and mail endpoints.
+
+A view sets ``throttle_scope``; THROTTLE_BUCKETS maps ``<scope>-ip`` and
+``<scope>-email`` to ``"<capacity>:<tokens>/<period>"`` (e.g. ``"5:20/hour"``:
+bursts of 5, refilled at 20 per hour; an empty value disables the bucket).
+Each bucket is one cache entry ``(tokens, updated_at)`` that is refilled
+lazily when read, so a check is O(1) and an idle bucket simply expires.
+
+Buckets live in the ``throttle`` cache alias, shared by all workers
+(DatabaseCache, or Redis when REDIS_URL is set). A request is admitted only
+if every bucket of its scope has the tokens; nothing is taken otherwise.
+The check runs in APIView.initial(), before the view parses a serializer,
+hashes a password or writes a row. Reads and writes are not one atomic
+operation, so concurrent requests can overshoot a bucket by about the
+number of workers.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+CACHE_ALIAS = 'throttle'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_bucket(spec):
+    """``"5:20/hour"`` -> ``(5, 20 / 3600)``, i.e. capacity and tokens per second."""
+    if not spec:
+        return None
+    capacity, rate = spec.split(':')
+    tokens, period = rate.split('/')
+    return int(capacity), int(tokens) / PERIODS[period.strip()[0].lower()]
+
+
+def request_email(request):
+    """The normalized ``email`` field of the request body, if any (no DB or serializer work)."""
+    try:
+        email = request.data.get('email')
+    except AttributeError:
+        return None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle on the ``<scope>-ip`` and ``<scope>-email`` buckets of the view's ``throttle_scope``."""
+
+    def __init__(self):
+        self.retry_after = None
+
+    def idents(self, request):
+        return {'ip': self.get_ident(request), 'email': request_email(request)}
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+        buckets = getattr(settings, 'THROTTLE_BUCKETS', {})
+        cache = caches[CACHE_ALIAS]
+        now = time.time()
+
+        updates = {}
+        for kind, ident in self.idents(request).items():
+            bucket = parse_bucket(buckets.get(f'{scope}-{kind}'))
+            if bucket is None or not ident:
+                continue
+            capacity, rate = bucket
+            digest = hashlib.blake2b(ident.encode(), digest_size=16).hexdigest()
+            key = f'throttle:{scope}-{kind}:{digest}'
+            tokens, updated_at = cache.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                self.retry_after = (1 - tokens) / rate
+                return False
+            # The entry is back to a full bucket once it would expire
+            updates[key] = ((tokens - 1, now), (capacity - tokens + 1) / rate)
+
+        for key, (state, timeout) in updates.items():
+            cache.set(key, state, max(1, int(timeout) + 1))
+        return True
+
+    def wait(self):
+        return self.retry_after
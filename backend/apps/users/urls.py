@@ -11,6 +11,7 @@ from .views import (
     SendOTPView,
     VerifyOTPView,
     TextMailView,
+    BulkTextMailView,
     DebugCORSView,
 )
 
@@ -26,6 +27,8 @@ urlpatterns = [
     path('send-otp/', SendOTPView.as_view(), name='send-otp'),
     path('verify-otp/', VerifyOTPView.as_view(), name='verify-otp'),
     path('text-mail/', TextMailView.as_view(), name='text-mail'),
+    path('text-mail/bulk/', BulkTextMailView.as_view(), name='text-mail-bulk'),
+    path('text-mail/bulk/<str:batch>/', BulkTextMailView.as_view(), name='text-mail-bulk-status'),
     path('debug-cors/', DebugCORSView.as_view(), name='debug-cors'),
     path('', include(router.urls)),
 ]
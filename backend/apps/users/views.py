@@ -4,6 +4,9 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db import transaction
 
 from .serializers import (
     UserSerializer,
@@ -14,7 +17,11 @@ from .serializers import (
     SendOTPSerializer,
     VerifyOTPSerializer,
 )
-from .models import EmailOTP
+from .models import EmailOTP, OutgoingEmail
+from .otp import consume_otp, issue_otp
+from .outbox import enqueue_email, enqueue_messages
+from .stats import user_stats
+from .throttling import TokenBucketThrottle
 
 User = get_user_model()
 
@@ -50,7 +57,8 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # Fresh row: request.user may come from the auth cache and credits must be current
+        return User.objects.get(pk=self.request.user.pk)
 
 
 class ChangePasswordView(generics.UpdateAPIView):
@@ -66,7 +74,8 @@ class ChangePasswordView(generics.UpdateAPIView):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.request.user.set_password(serializer.validated_data['new_password'])
-        self.request.user.save()
+        # Only the password: other fields of request.user may be cached
+        self.request.user.save(update_fields=['password'])
         return Response({'message': 'Password updated successfully'})
 
 
@@ -76,13 +85,11 @@ class SendOTPView(generics.CreateAPIView):
     serializer_class = SendOTPSerializer
     permission_classes = [AllowAny]
     authentication_classes = []  # Bypass default auth (and thus CSRF if SessionAuth is default)
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'otp-send'
     
     def create(self, request, *args, **kwargs):
         import random
-        from django.utils import timezone
-        from datetime import timedelta
-        from django.core.mail import send_mail
-        from django.conf import settings
         from django.contrib.auth.hashers import make_password
         
         serializer = self.get_serializer(data=request.data)
@@ -95,35 +102,16 @@ class SendOTPView(generics.CreateAPIView):
         # Generate 6-digit OTP
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         
-        # Delete any existing OTPs for this email
-        EmailOTP.objects.filter(email=email).delete()
+        # Replace any earlier OTP for this email (store hashed password)
+        issue_otp(email, otp, name, make_password(password))
         
-        # Create new OTP record (store hashed password)
-        EmailOTP.objects.create(
-            email=email,
-            otp=otp,
-            name=name,
-            password=make_password(password),
-            expires_at=timezone.now() + timedelta(minutes=10)
+        # Queued; delivered by the outbox sender after this request commits
+        enqueue_email(
+            subject='VoiceAI - Email Verification OTP',
+            body=f'Your OTP for VoiceAI registration is: {otp}\n\nThis code expires in 10 minutes.',
+            recipients=[email],
         )
         
-        # Send email
-        try:
-            send_mail(
-                subject='VoiceAI - Email Verification OTP',
-                message=f'Your OTP for VoiceAI registration is: {otp}\n\nThis code expires in 10 minutes.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,  # We catch exceptions below to prevent crash
-            )
-        except Exception as e:
-            print("EMAIL ERROR:", e)
-            # We do NOT raise here to avoid 500 error on client side if email fails
-            # This mimics fail_silently=True but with logging
-            # return Response({'error': 'Email failed'}, status=500) # Optional: return error
-            # For now, we proceed as if sent, or strict:
-            return Response({'error': 'Failed to send email. Check logs.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
         return Response({'message': 'OTP sent to your email'}, status=status.HTTP_200_OK)
 
 
@@ -131,30 +119,27 @@ class TextMailView(generics.CreateAPIView):
     """Send text email via API."""
     permission_classes = [AllowAny]
     authentication_classes = []
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'text-mail'
 
     def create(self, request, *args, **kwargs):
-        from django.core.mail import send_mail
-        from django.conf import settings
-
         email = request.data.get('email')
         message = request.data.get('message')
 
         if not email or not message:
             return Response({'error': 'Email and message are required.'}, status=status.HTTP_400_BAD_REQUEST)
-
         try:
-            send_mail(
-                subject='VoiceAI - Text Mail Message',
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[email],
-                fail_silently=False,
-            )
-        except Exception as e:
-            print("TEXTMAIL ERROR:", e)
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            validate_email(email)
+        except DjangoValidationError:
+            return Response({'error': 'Enter a valid email address.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        enqueue_email(
+            subject='VoiceAI - Text Mail Message',
+            body=message,
+            recipients=[email],
+        )
 
-        return Response({'message': 'Mail sent successfully'}, status=status.HTTP_200_OK)
+        return Response({'message': 'Mail queued for delivery'}, status=status.HTTP_200_OK)
 
     def options(self, request, *args, **kwargs):
         """Handle preflight OPTIONS request explicitly."""
@@ -171,6 +156,8 @@ class VerifyOTPView(generics.CreateAPIView):
     serializer_class = VerifyOTPSerializer
     permission_classes = [AllowAny]
     authentication_classes = []  # Bypass default auth
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'otp-verify'
     
     def create(self, request, *args, **kwargs):
         from django.contrib.auth.hashers import check_password
@@ -181,7 +168,7 @@ class VerifyOTPView(generics.CreateAPIView):
         email = serializer.validated_data['email']
         otp = serializer.validated_data['otp']
         
-        # Find OTP record
+        # Find OTP record (unique per email)
         try:
             otp_record = EmailOTP.objects.get(email=email, is_used=False)
         except EmailOTP.DoesNotExist:
@@ -205,16 +192,19 @@ class VerifyOTPView(generics.CreateAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create user
-        user = User.objects.create(
-            email=otp_record.email,
-            name=otp_record.name,
-            password=otp_record.password,  # Already hashed
-        )
-        
-        # Mark OTP as used
-        otp_record.is_used = True
-        otp_record.save()
+        # Mark OTP as used and create the user together; a concurrent
+        # request with the same code loses the conditional update
+        with transaction.atomic():
+            if not consume_otp(otp_record):
+                return Response(
+                    {'error': 'No OTP found for this email. Please request a new one.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            user = User.objects.create(
+                email=otp_record.email,
+                name=otp_record.name,
+                password=otp_record.password,  # Already hashed
+            )
         
         return Response({
             'message': 'Account created successfully',
@@ -229,6 +219,69 @@ class IsAdminPermission(IsAdminUser):
         return request.user and request.user.is_authenticated and request.user.is_administrator
 
 
+class BulkTextMailView(generics.GenericAPIView):
+    """
+    Queue many text emails in one request (admin only, for notification campaigns).
+    POST {"subject": optional, "messages": [{"email": ..., "message": ...}, ...]}
+    returns a batch id and a per-recipient status; GET <batch>/ reports delivery.
+    """
+    permission_classes = [IsAdminPermission]
+
+    def post(self, request, *args, **kwargs):
+        import uuid
+        from django.conf import settings
+
+        items = request.data.get('messages')
+        subject = request.data.get('subject') or 'VoiceAI - Text Mail Message'
+        limit = getattr(settings, 'TEXT_MAIL_BULK_MAX_MESSAGES', 1000)
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'messages must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > limit:
+            return Response({'error': f'At most {limit} messages per request.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        accepted = []
+        for item in items:
+            email = item.get('email') if isinstance(item, dict) else None
+            message = item.get('message') if isinstance(item, dict) else None
+            if not email or not message:
+                results.append({'email': email, 'status': 'rejected', 'error': 'Email and message are required.'})
+                continue
+            try:
+                validate_email(email)
+            except DjangoValidationError:
+                results.append({'email': email, 'status': 'rejected', 'error': 'Enter a valid email address.'})
+                continue
+            accepted.append((subject, message, email))
+            results.append({'email': email, 'status': 'queued'})
+
+        batch = uuid.uuid4().hex if accepted else None
+        if accepted:
+            enqueue_messages(accepted, batch=batch)
+        return Response({'batch': batch, 'queued': len(accepted), 'results': results}, status=status.HTTP_200_OK)
+
+    def get(self, request, batch=None, *args, **kwargs):
+        rows = OutgoingEmail.objects.filter(batch=batch).order_by('id').values(
+            'recipient', 'status', 'attempts', 'sent_at', 'last_error',
+        ) if batch else []
+        results = [
+            {
+                'email': row['recipient'],
+                'status': row['status'],
+                'attempts': row['attempts'],
+                'sent_at': row['sent_at'],
+                'error': row['last_error'] or None,
+            }
+            for row in rows
+        ]
+        if not results:
+            return Response({'error': 'Unknown batch.'}, status=status.HTTP_404_NOT_FOUND)
+        counts = {}
+        for result in results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+        return Response({'batch': batch, 'counts': counts, 'results': results})
+
+
 class AdminUserViewSet(viewsets.ModelViewSet):
     """Admin CRUD operations for users."""
     
@@ -241,16 +294,8 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get user statistics for admin dashboard."""
-        total_users = User.objects.count()
-        active_users = User.objects.filter(is_active=True).count()
-        admin_users = User.objects.filter(is_admin=True).count()
-        
-        return Response({
-            'total_users': total_users,
-            'active_users': active_users,
-            'admin_users': admin_users,
-        })
+        """Get user statistics for admin dashboard (cached, shared with AdminDashboardView)."""
+        return Response(user_stats())
 
 
 class DebugCORSView(generics.GenericAPIView):
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import VoiceProfile, VoiceClone, GeneratedSpeech
+from .models import VoiceProfile, VoiceClone, ReferenceVoice, GeneratedSpeech
 
 
 @admin.register(VoiceProfile)
@@ -12,13 +12,23 @@ class VoiceProfileAdmin(admin.ModelAdmin):
 
 @admin.register(VoiceClone)
 class VoiceCloneAdmin(admin.ModelAdmin):
-    list_display = ['name', 'user', 'status', 'is_active', 'created_at']
+    list_display = [
+        'name', 'user', 'status', 'failure_reason', 'voice_shortname', 'is_active', 'created_at', 'processed_at'
+    ]
     list_filter = ['status', 'is_active']
     search_fields = ['name', 'user__email']
     ordering = ['-created_at']
     raw_id_fields = ['user']
 
 
+@admin.register(ReferenceVoice)
+class ReferenceVoiceAdmin(admin.ModelAdmin):
+    list_display = ['shortname', 'language', 'gender', 'pitch_hz', 'spectral_centroid_hz', 'analyzed_at']
+    list_filter = ['language', 'gender']
+    search_fields = ['shortname']
+    ordering = ['shortname']
+
+
 @admin.register(GeneratedSpeech)
 class GeneratedSpeechAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'get_voice', 'duration_seconds', 'created_at']
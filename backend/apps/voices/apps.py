@@ -1,7 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class VoicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.voices'
     verbose_name = 'Voices'
+
+    def ready(self):
+        from django.db.models.signals import post_save
+
+        from . import image_variants, response_cache, usage
+        from .models import GeneratedSpeech
+        image_variants.connect_signals()
+        response_cache.connect_signals()
+        post_save.connect(usage.record_generation, sender=GeneratedSpeech, dispatch_uid='daily-usage-generation')
+
+        if getattr(settings, 'TRANSLITERATION_PREWARM', False):
+            from .translation import prewarm_transliteration
+            prewarm_transliteration()
@@ -0,0 +1,543 @@
+"""
+Background processing pipeline for uploaded voice clone samples.
+
+At upload time `ingest_sample` only runs the cheap checks (size, type and
+the duration from the container header, one small read), so the API returns
+at once; decoding, analysis, transcoding and voice matching all happen in
+the queued pipeline, which fails a clone with a reason instead.
+
+Pending clones are claimed with a conditional UPDATE (pending -> processing),
+so the in-process thread pool and any number of `process_voice_clones`
+workers can drain the same queue without double-processing. In 'thread'
+mode a pool lives only as long as its process, so each web process also
+runs start_recovery(): stale 'processing' clones are requeued and pending
+ones resubmitted at startup and every CLONE_RECOVERY_INTERVAL seconds. Each clone runs
+through validation, decoding, analysis and transcoding and ends up `ready`
+or `failed` with a reason.
+
+Every sample is analyzed at TARGET_SAMPLE_RATE (WAVs are resampled when
+decoded, ffmpeg decodes to it), so features are comparable across formats
+and with the reference voices, and analysis walks the frames in fixed-size
+chunks so its memory does not grow with the sample length.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import VoiceClone
+from .voice_matching import match_voice
+
+ALLOWED_EXTENSIONS = {'.wav', '.mp3', '.ogg', '.oga', '.webm', '.m4a', '.flac', '.aac'}
+# Canonical format clone samples are transcoded to
+TARGET_SAMPLE_RATE = 16000
+
+# Analysis parameters
+ANALYSIS_FRAME_SECONDS = 0.04
+SILENCE_THRESHOLD_DBFS = -45.0
+CLIPPING_LEVEL = 0.999
+PITCH_MIN_HZ = 60.0
+PITCH_MAX_HZ = 400.0
+# Minimum normalized autocorrelation peak for a frame to count as voiced
+VOICING_THRESHOLD = 0.3
+# Frames analyzed per FFT batch, and output samples per resampling block
+ANALYSIS_CHUNK_FRAMES = 512
+RESAMPLE_BLOCK = 1 << 16
+
+
+class CloneProcessingError(Exception):
+    """A clone sample failed a pipeline stage; the message is the user-facing reason."""
+
+
+class CloneJob:
+    """State passed between pipeline stages for one clone."""
+
+    def __init__(self, clone):
+        self.clone = clone
+        self.path = clone.audio_sample.path if clone.audio_sample else None
+        self.extension = os.path.splitext(clone.audio_sample.name)[1].lower() if clone.audio_sample else ''
+        self.samples = None        # mono float32 in [-1, 1], or None if not decodable here
+        self.sample_rate = None
+        self.duration = None
+        self.clipping_ratio = None  # measured before resampling, which smooths clipped peaks
+
+
+def validate_sample(job):
+    """Check the uploaded file exists, is non-empty, and has a supported type."""
+    if not job.path or not os.path.exists(job.path):
+        raise CloneProcessingError('Audio sample file is missing')
+    size = os.path.getsize(job.path)
+    if size == 0:
+        raise CloneProcessingError('Audio sample is empty')
+    max_size = getattr(settings, 'CLONE_SAMPLE_MAX_BYTES', 50 * 1024 * 1024)
+    if size > max_size:
+        raise CloneProcessingError(f'Audio sample exceeds {max_size // (1024 * 1024)} MB')
+    if job.extension not in ALLOWED_EXTENSIONS:
+        raise CloneProcessingError(f'Unsupported audio format: {job.extension or "unknown"}')
+
+
+def _decode_wav(path):
+    with wave.open(path, 'rb') as wav:
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                | (raw[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise CloneProcessingError(f'Unsupported WAV sample width: {width * 8} bits')
+
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def clipped_ratio(samples):
+    """Share of samples at full scale, counted block by block."""
+    if not len(samples):
+        return None
+    clipped = 0
+    for start in range(0, len(samples), RESAMPLE_BLOCK):
+        clipped += int(np.count_nonzero(np.abs(samples[start:start + RESAMPLE_BLOCK]) >= CLIPPING_LEVEL))
+    return clipped / len(samples)
+
+
+def resample(samples, rate, target=TARGET_SAMPLE_RATE):
+    """
+    Linearly resample mono float32 samples to ``target`` in fixed-size blocks.
+    When downsampling, a moving average over one output period is applied
+    first to keep content above the new Nyquist frequency from aliasing.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if rate == target or not len(samples):
+        return samples
+    step = rate / target
+    width = max(1, int(round(step)))
+    kernel = np.full(width, 1 / width, dtype=np.float32)
+    out = np.empty(int(len(samples) / step), dtype=np.float32)
+    for start in range(0, len(out), RESAMPLE_BLOCK):
+        positions = np.arange(start, min(len(out), start + RESAMPLE_BLOCK)) * step
+        low = max(0, int(positions[0]) - width)
+        high = min(len(samples), int(positions[-1]) + 2 + width)
+        segment = samples[low:high]
+        if width > 1:
+            segment = np.convolve(segment, kernel, mode='same')
+        out[start:start + len(positions)] = np.interp(positions - low, np.arange(len(segment)), segment)
+    return out
+
+
+def _decode_with_ffmpeg(path):
+    """Decode any container ffmpeg understands to mono float32 at TARGET_SAMPLE_RATE."""
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-i', path, '-f', 'f32le', '-ac', '1', '-ar', str(TARGET_SAMPLE_RATE), '-'],
+        capture_output=True,
+        timeout=getattr(settings, 'CLONE_DECODE_TIMEOUT', 60),
+    )
+    if result.returncode != 0:
+        raise CloneProcessingError('Audio sample could not be decoded')
+    return np.frombuffer(result.stdout, dtype='<f4').copy(), TARGET_SAMPLE_RATE
+
+
+def probe_duration(job):
+    """
+    Duration from the container header alone: WAV natively, other formats
+    via mutagen. None when the header does not tell (left to the pipeline).
+    """
+    if job.extension == '.wav':
+        try:
+            with wave.open(job.path, 'rb') as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            raise CloneProcessingError('Audio sample could not be decoded')
+    try:
+        import mutagen
+        metadata = mutagen.File(job.path)
+    except Exception:
+        return None
+    if metadata is None or not getattr(metadata, 'info', None):
+        return None
+    return metadata.info.length
+
+
+def check_duration(seconds):
+    min_seconds = getattr(settings, 'CLONE_SAMPLE_MIN_SECONDS', 3)
+    max_seconds = getattr(settings, 'CLONE_SAMPLE_MAX_SECONDS', 600)
+    if not seconds or seconds < min_seconds:
+        raise CloneProcessingError(f'Audio sample must be at least {min_seconds} seconds long')
+    if seconds > max_seconds:
+        raise CloneProcessingError(f'Audio sample must be at most {max_seconds} seconds long')
+
+
+def decode_sample(job):
+    """
+    Decode the sample to mono PCM at TARGET_SAMPLE_RATE. WAV is decoded
+    natively; other formats need ffmpeg, and without it only container
+    metadata is read.
+    """
+    try:
+        if job.extension == '.wav':
+            samples, rate = _decode_wav(job.path)
+            job.clipping_ratio = clipped_ratio(samples)
+            job.samples, job.sample_rate = resample(samples, rate), TARGET_SAMPLE_RATE
+        elif shutil.which('ffmpeg'):
+            job.samples, job.sample_rate = _decode_with_ffmpeg(job.path)
+        else:
+            import mutagen
+            metadata = mutagen.File(job.path)
+            if metadata is None or not getattr(metadata, 'info', None):
+                raise CloneProcessingError('Audio sample could not be decoded')
+            job.duration = metadata.info.length
+            job.sample_rate = getattr(metadata.info, 'sample_rate', None)
+    except CloneProcessingError:
+        raise
+    except Exception as e:
+        raise CloneProcessingError(f'Audio sample could not be decoded: {e}')
+
+    if job.samples is not None:
+        job.duration = len(job.samples) / job.sample_rate if job.sample_rate else 0
+
+
+def analyze_audio(samples, rate):
+    """
+    Compute sample features with vectorized NumPy operations, in batches of
+    ANALYSIS_CHUNK_FRAMES frames.
+
+    Returns duration, overall RMS loudness (dBFS), the share of clipped
+    samples, the share of silent frames, a median autocorrelation pitch
+    estimate over voiced frames (None when nothing is voiced) and the median
+    spectral centroid of non-silent frames.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    duration = len(samples) / rate if rate else 0.0
+    if not len(samples):
+        return {'duration_seconds': duration, 'rms_dbfs': None, 'clipping_ratio': None,
+                'silence_ratio': None, 'pitch_hz': None, 'spectral_centroid_hz': None}
+
+    frame = max(1, int(rate * ANALYSIS_FRAME_SECONDS))
+    count = len(samples) // frame
+    block = ANALYSIS_CHUNK_FRAMES * frame
+    energy_sum = 0.0
+    for start in range(0, len(samples), block):
+        chunk = samples[start:start + block].astype(np.float64)
+        energy_sum += float(np.dot(chunk, chunk))
+    rms = float(np.sqrt(energy_sum / len(samples)))
+    clipping_ratio = clipped_ratio(samples)
+
+    pitch_hz = None
+    centroid_hz = None
+    silence_ratio = 1.0 if rms == 0 else 0.0
+    if count:
+        frames = samples[:count * frame].reshape(count, frame)
+        min_lag = max(1, int(rate / PITCH_MAX_HZ))
+        max_lag = min(frame - 1, int(rate / PITCH_MIN_HZ))
+        window = np.hanning(frame)
+        freqs = np.fft.rfftfreq(2 * frame, 1 / rate)
+        silent_frames = 0
+        centroids = []
+        pitches = []
+        for start in range(0, count, ANALYSIS_CHUNK_FRAMES):
+            chunk = frames[start:start + ANALYSIS_CHUNK_FRAMES]
+            frame_rms = np.sqrt(np.mean(np.square(chunk, dtype=np.float64), axis=1))
+            silent = frame_rms < 10 ** (SILENCE_THRESHOLD_DBFS / 20)
+            silent_frames += int(np.count_nonzero(silent))
+
+            voiced = chunk[~silent]
+            if not len(voiced) or max_lag <= min_lag:
+                continue
+            # Autocorrelation of the chunk's voiced frames at once via FFT
+            centered = (voiced - voiced.mean(axis=1, keepdims=True)) * window
+            spectrum = np.fft.rfft(centered, n=2 * frame, axis=1)
+            magnitudes = np.abs(spectrum)
+            autocorr = np.fft.irfft(magnitudes ** 2, axis=1)[:, :frame]
+            centroids.append((magnitudes @ freqs) / np.maximum(magnitudes.sum(axis=1), 1e-12))
+            energy = autocorr[:, 0]
+            lags = np.argmax(autocorr[:, min_lag:max_lag], axis=1) + min_lag
+            peaks = autocorr[np.arange(len(lags)), lags]
+            strong = (energy > 0) & (peaks > VOICING_THRESHOLD * np.where(energy > 0, energy, 1))
+            pitches.append(rate / lags[strong])
+
+        silence_ratio = silent_frames / count
+        if centroids:
+            centroid_hz = float(np.median(np.concatenate(centroids)))
+        pitches = np.concatenate(pitches) if pitches else []
+        if len(pitches):
+            pitch_hz = float(np.median(pitches))
+
+    return {
+        'duration_seconds': duration,
+        'rms_dbfs': 20 * float(np.log10(max(rms, 1e-10))),
+        'clipping_ratio': clipping_ratio,
+        'silence_ratio': silence_ratio,
+        'pitch_hz': pitch_hz,
+        'spectral_centroid_hz': centroid_hz,
+    }
+
+
+ANALYSIS_FIELDS = [
+    'duration_seconds', 'rms_dbfs', 'clipping_ratio', 'silence_ratio', 'pitch_hz', 'spectral_centroid_hz'
+]
+
+
+def analyze_sample(job):
+    """Store the sample features on the clone and reject samples unfit for cloning."""
+    clone = job.clone
+    if job.samples is not None:
+        features = analyze_audio(job.samples, job.sample_rate)
+        if job.clipping_ratio is not None:
+            features['clipping_ratio'] = job.clipping_ratio
+    else:
+        features = {'duration_seconds': job.duration or 0.0}
+    for field, value in features.items():
+        setattr(clone, field, value)
+
+    check_duration(clone.duration_seconds)
+
+    min_dbfs = getattr(settings, 'CLONE_SAMPLE_MIN_RMS_DBFS', -50.0)
+    max_clipping = getattr(settings, 'CLONE_SAMPLE_MAX_CLIPPING_RATIO', 0.01)
+    max_silence = getattr(settings, 'CLONE_SAMPLE_MAX_SILENCE_RATIO', 0.8)
+    if clone.rms_dbfs is not None and clone.rms_dbfs < min_dbfs:
+        raise CloneProcessingError('Audio sample is silent or too quiet')
+    if clone.clipping_ratio is not None and clone.clipping_ratio > max_clipping:
+        raise CloneProcessingError('Audio sample is clipped; record at a lower input level')
+    if clone.silence_ratio is not None and clone.silence_ratio > max_silence:
+        raise CloneProcessingError('Audio sample is mostly silence')
+
+
+def transcode_sample(job):
+    """Store a canonical mono 16-bit WAV at TARGET_SAMPLE_RATE next to the upload."""
+    if job.samples is None or job.clone.processed_audio:
+        return
+
+    samples = resample(job.samples, job.sample_rate)
+    pcm = (np.clip(samples, -1, 1) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(TARGET_SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+
+    job.clone.processed_audio.save(f'{job.clone.id}.wav', ContentFile(buffer.getvalue()), save=False)
+
+
+def assign_voice(job):
+    """Match the sample to the nearest Edge voice of its language."""
+    if not job.clone.voice_shortname:
+        job.clone.voice_shortname = match_voice(job.clone)
+
+
+PIPELINE_STAGES = [validate_sample, decode_sample, analyze_sample, transcode_sample, assign_voice]
+
+
+def run_pipeline(clone):
+    """Run every stage on a claimed clone and record the outcome."""
+    job = CloneJob(clone)
+    try:
+        for stage in PIPELINE_STAGES:
+            stage(job)
+    except CloneProcessingError as e:
+        clone.status = 'failed'
+        clone.failure_reason = str(e)
+    except Exception as e:
+        print(f"Clone processing error for clone {clone.id}: {e}")
+        clone.status = 'failed'
+        clone.failure_reason = 'Internal processing error'
+    else:
+        clone.status = 'ready'
+        clone.failure_reason = ''
+    clone.processed_at = timezone.now()
+    clone.save(update_fields=[
+        'status', 'failure_reason', 'processed_audio', 'voice_shortname', 'processed_at', 'updated_at',
+        *ANALYSIS_FIELDS
+    ])
+    return clone
+
+
+def ingest_sample(clone):
+    """
+    Cheap checks on a freshly uploaded sample before it is queued: size,
+    type and the header duration. Raises CloneProcessingError; nothing is
+    decoded or stored here.
+    """
+    job = CloneJob(clone)
+    validate_sample(job)
+    duration = probe_duration(job)
+    if duration is not None:
+        check_duration(duration)
+    return clone
+
+
+def discard_clone(clone):
+    """Delete a rejected clone together with its files."""
+    for field in (clone.audio_sample, clone.processed_audio):
+        if field:
+            field.delete(save=False)
+    clone.delete()
+
+
+def claim_clone(clone_id):
+    """Atomically move one pending clone to processing; returns it or None."""
+    claimed = VoiceClone.objects.filter(id=clone_id, status='pending').update(
+        status='processing',
+        processing_started_at=timezone.now(),
+    )
+    if not claimed:
+        return None
+    return VoiceClone.objects.get(id=clone_id)
+
+
+def claim_next_clone():
+    """Claim the oldest pending clone, skipping ones taken by other workers."""
+    while True:
+        candidates = list(
+            VoiceClone.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)[:10]
+        )
+        if not candidates:
+            return None
+        for clone_id in candidates:
+            clone = claim_clone(clone_id)
+            if clone:
+                return clone
+
+
+def requeue_stale_clones(stale_after):
+    """Return clones stuck in processing (crashed worker) to the queue."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return VoiceClone.objects.filter(status='processing', processing_started_at__lt=cutoff).update(status='pending')
+
+
+def process_clone(clone_id):
+    """Claim and process one clone by id; no-op if someone else claimed it."""
+    close_old_connections()
+    try:
+        clone = claim_clone(clone_id)
+        if clone:
+            started = time.monotonic()
+            run_pipeline(clone)
+            queue_latency = (clone.processing_started_at - clone.created_at).total_seconds()
+            print(
+                f"Clone {clone.id} -> {clone.status} "
+                f"(queued {queue_latency:.2f}s, processed {time.monotonic() - started:.2f}s)"
+            )
+        return clone
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+# Clone ids submitted to this process's pool and not finished yet
+_submitted = set()
+_recovery_started = False
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CLONE_PROCESSING_THREADS', 2),
+                thread_name_prefix='clone-processing',
+            )
+        return _executor
+
+
+def _run_submitted(clone_id):
+    try:
+        process_clone(clone_id)
+    except Exception as e:
+        print(f"Clone {clone_id} processing failed: {e}")
+    finally:
+        with _executor_lock:
+            _submitted.discard(clone_id)
+
+
+def _submit(clone_id):
+    """Queue a clone on this process's pool unless it is already queued here."""
+    with _executor_lock:
+        if clone_id in _submitted:
+            return False
+        _submitted.add(clone_id)
+    _get_executor().submit(_run_submitted, clone_id)
+    return True
+
+
+def enqueue_clone(clone):
+    """
+    Hand a freshly created clone to the background pipeline.
+    In 'thread' mode it is processed by this process's pool; in 'worker'
+    mode it stays pending for the process_voice_clones command.
+    """
+    if getattr(settings, 'CLONE_PROCESSING_MODE', 'thread') == 'thread':
+        _submit(clone.id)
+
+
+def recover_clones(stale_after=None, limit=100):
+    """
+    Requeue clones stuck in processing and submit up to ``limit`` pending
+    ones to this process's pool. Returns (requeued, submitted).
+    """
+    if stale_after is None:
+        stale_after = getattr(settings, 'CLONE_PROCESSING_STALE_AFTER', 600)
+    requeued = requeue_stale_clones(stale_after)
+    pending = VoiceClone.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)
+    submitted = sum(1 for clone_id in pending[:limit] if _submit(clone_id))
+    return requeued, submitted
+
+
+def start_recovery():
+    """
+    In 'thread' mode, recover orphaned clones now and every
+    CLONE_RECOVERY_INTERVAL seconds (once only if it is 0) in a daemon
+    thread. Called once per web process from the WSGI entry point.
+    """
+    global _recovery_started
+    if getattr(settings, 'CLONE_PROCESSING_MODE', 'thread') != 'thread':
+        return None
+    with _executor_lock:
+        if _recovery_started:
+            return None
+        _recovery_started = True
+    interval = getattr(settings, 'CLONE_RECOVERY_INTERVAL', 300)
+
+    def loop():
+        while True:
+            close_old_connections()
+            try:
+                requeued, submitted = recover_clones()
+                if requeued or submitted:
+                    print(f"Clone recovery: {requeued} stale clone(s) requeued, {submitted} submitted")
+            except Exception as e:
+                print(f"Clone recovery failed: {e}")
+            finally:
+                close_old_connections()
+            if interval <= 0:
+                return
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='clone-recovery', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,199 @@
+"""
+Size- and format-optimized variants of uploaded images.
+
+For every image in IMAGE_FIELDS, Pillow renders a thumbnail, a medium-size
+copy and a medium-size WebP. Variants are cached on disk next to each other
+under ``variants/<source name>/<variant>.<ext>``, so they are derived from
+the source name alone and the garbage collector can map them back to it.
+
+Rendering happens after the upload is committed, in a background thread,
+and again lazily for any variant a serializer finds missing. It is
+idempotent: variants newer than their source are left alone, and files are
+written to a temporary name and renamed into place.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import post_save
+from rest_framework import serializers
+
+VARIANT_DIR = 'variants'
+
+# name -> (max size, format); None keeps JPEG, or PNG for images with alpha
+VARIANTS = {
+    'thumbnail': (200, None),
+    'medium': (800, None),
+    'webp': (800, 'WEBP'),
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+EXTENSIONS_FORMAT = {extension: image_format for image_format, extension in EXTENSIONS.items()}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 82, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 80, 'method': 4},
+}
+
+IMAGE_FIELDS = [
+    ('voices.VoiceProfile', 'preview_image'),
+    ('users.User', 'avatar'),
+    ('payments.Transaction', 'screenshot'),
+]
+
+_executor = None
+_executor_lock = threading.Lock()
+# Sources already queued in this process, to avoid piling up duplicate work
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _has_alpha(name):
+    return os.path.splitext(name)[1].lower() in ('.png', '.webp', '.gif')
+
+
+def variant_name(source_name, variant):
+    """Storage name of a variant; the format follows the source's alpha support."""
+    image_format = VARIANTS[variant][1] or ('PNG' if _has_alpha(source_name) else 'JPEG')
+    return f'{VARIANT_DIR}/{source_name}/{variant}{EXTENSIONS[image_format]}'
+
+
+def source_name_of(variant_path):
+    """Inverse of variant_name for paths under VARIANT_DIR, else None."""
+    if not variant_path.startswith(f'{VARIANT_DIR}/'):
+        return None
+    return os.path.dirname(variant_path[len(VARIANT_DIR) + 1:]) or None
+
+
+def _is_fresh(source_path, target_path):
+    try:
+        return os.stat(target_path).st_mtime >= os.stat(source_path).st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def generate_variants(source_name):
+    """Render missing or stale variants of a stored image. Returns the variant names written."""
+    from PIL import Image, ImageOps
+
+    source_path = default_storage.path(source_name)
+    targets = {variant: variant_name(source_name, variant) for variant in VARIANTS}
+    stale = {variant: name for variant, name in targets.items()
+             if not _is_fresh(source_path, default_storage.path(name))}
+    if not stale or not os.path.exists(source_path):
+        return []
+
+    written = []
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    for variant, name in stale.items():
+        max_size, _ = VARIANTS[variant]
+        image_format = EXTENSIONS_FORMAT[os.path.splitext(name)[1]]
+        copy = image.copy()
+        copy.thumbnail((max_size, max_size), Image.LANCZOS)
+        if image_format == 'JPEG' and copy.mode not in ('RGB', 'L'):
+            copy = copy.convert('RGB')
+        elif copy.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            copy = copy.convert('RGBA')
+
+        target = default_storage.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temporary = f'{target}.{threading.get_ident()}.tmp'
+        copy.save(temporary, image_format, **SAVE_OPTIONS[image_format])
+        os.replace(temporary, target)
+        written.append(name)
+    return written
+
+
+def _run(source_name):
+    try:
+        generate_variants(source_name)
+    except Exception as e:
+        print(f"Image variant generation failed for {source_name}: {e}")
+    finally:
+        with _pending_lock:
+            _pending.discard(source_name)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_THREADS', 1),
+                thread_name_prefix='image-variants',
+            )
+        return _executor
+
+
+def schedule_variants(source_name):
+    """Render variants after the current transaction commits, off the request thread."""
+    def submit():
+        with _pending_lock:
+            if source_name in _pending:
+                return
+            _pending.add(source_name)
+        if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+            _get_executor().submit(_run, source_name)
+        else:
+            _run(source_name)
+
+    transaction.on_commit(submit)
+
+
+def variant_urls(field_file):
+    """
+    URLs of the variants of an image field, or None without an image.
+    Missing variants are scheduled and fall back to the original's URL.
+    """
+    if not field_file:
+        return None
+    urls = {}
+    missing = False
+    for variant in VARIANTS:
+        name = variant_name(field_file.name, variant)
+        if default_storage.exists(name):
+            urls[variant] = default_storage.url(name)
+        else:
+            urls[variant] = field_file.url
+            missing = True
+    if missing:
+        schedule_variants(field_file.name)
+    return urls
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Read-only ``{'thumbnail': url, 'medium': url, 'webp': url}`` for an image field."""
+
+    def to_representation(self, value):
+        urls = variant_urls(value)
+        request = self.context.get('request')
+        if urls and request:
+            urls = {variant: request.build_absolute_uri(url) for variant, url in urls.items()}
+        return urls
+
+
+def _image_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    for model_label, field_name in IMAGE_FIELDS:
+        if sender._meta.label != model_label:
+            continue
+        if update_fields is not None and field_name not in update_fields:
+            continue
+        field_file = getattr(instance, field_name)
+        if field_file and not _is_fresh(
+            default_storage.path(field_file.name),
+            default_storage.path(variant_name(field_file.name, 'thumbnail')),
+        ):
+            schedule_variants(field_file.name)
+
+
+def connect_signals():
+    from django.apps import apps
+
+    for model_label, _ in IMAGE_FIELDS:
+        post_save.connect(_image_saved, sender=apps.get_model(model_label),
+                          dispatch_uid=f'image-variants-{model_label}')
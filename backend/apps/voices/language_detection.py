@@ -0,0 +1,240 @@
+"""
+Local script and language identification for translation requests.
+Resolves source_language='auto' in-process so most requests skip the
+provider's detection, and lets the translator short-circuit no-op requests.
+
+Detection is two-stage: the dominant Unicode script decides the language
+outright for single-language scripts (Tamil, Hangul, Thai, ...). Scripts
+shared by several languages (Latin, Cyrillic, Devanagari, Arabic) are
+disambiguated with distinctive characters and common-word profiles; when
+neither gives a single winner the result is None, never a per-script guess,
+so Marathi is not taken for Hindi or Bulgarian for Russian.
+"""
+
+import re
+from bisect import bisect_right
+
+# (start, end, script) code point ranges, sorted by start
+SCRIPT_RANGES = sorted([
+    (0x0041, 0x005A, 'Latin'), (0x0061, 0x007A, 'Latin'),
+    (0x00C0, 0x024F, 'Latin'), (0x1E00, 0x1EFF, 'Latin'),
+    (0x0370, 0x03FF, 'Greek'), (0x1F00, 0x1FFF, 'Greek'),
+    (0x0400, 0x04FF, 'Cyrillic'),
+    (0x0590, 0x05FF, 'Hebrew'),
+    (0x0600, 0x06FF, 'Arabic'), (0x0750, 0x077F, 'Arabic'),
+    (0xFB50, 0xFDFF, 'Arabic'), (0xFE70, 0xFEFF, 'Arabic'),
+    (0x0900, 0x097F, 'Devanagari'),
+    (0x0980, 0x09FF, 'Bengali'),
+    (0x0A00, 0x0A7F, 'Gurmukhi'),
+    (0x0A80, 0x0AFF, 'Gujarati'),
+    (0x0B00, 0x0B7F, 'Oriya'),
+    (0x0B80, 0x0BFF, 'Tamil'),
+    (0x0C00, 0x0C7F, 'Telugu'),
+    (0x0C80, 0x0CFF, 'Kannada'),
+    (0x0D00, 0x0D7F, 'Malayalam'),
+    (0x0D80, 0x0DFF, 'Sinhala'),
+    (0x0E00, 0x0E7F, 'Thai'),
+    (0x1000, 0x109F, 'Myanmar'),
+    (0x1100, 0x11FF, 'Hangul'), (0x3130, 0x318F, 'Hangul'), (0xAC00, 0xD7AF, 'Hangul'),
+    (0x1200, 0x137F, 'Ethiopic'),
+    (0x3040, 0x309F, 'Kana'), (0x30A0, 0x30FF, 'Kana'),
+    (0x3400, 0x4DBF, 'Han'), (0x4E00, 0x9FFF, 'Han'),
+])
+_RANGE_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+
+# Scripts used by exactly one of our languages
+SCRIPT_LANGUAGE = {
+    'Greek': 'el',
+    'Hebrew': 'he',
+    'Bengali': 'bn',
+    'Gurmukhi': 'pa',
+    'Gujarati': 'gu',
+    'Oriya': 'or',
+    'Tamil': 'ta',
+    'Telugu': 'te',
+    'Kannada': 'kn',
+    'Malayalam': 'ml',
+    'Sinhala': 'si',
+    'Thai': 'th',
+    'Myanmar': 'my',
+    'Hangul': 'ko',
+    'Ethiopic': 'am',
+    'Kana': 'ja',
+    'Han': 'zh',
+}
+
+# Characters that only (or almost only) occur in one language of a shared script
+DISTINCTIVE_CHARS = {
+    'Arabic': {
+        'ur': 'ےںٹڈڑھۓ',
+        'fa': 'ژ',
+        'ar': 'ةىيك',
+    },
+    'Cyrillic': {
+        'uk': 'іїєґ',
+        'ru': 'ыэё',
+        'sr': 'јљњћђџ',
+    },
+    'Devanagari': {
+        'mr': 'ळ',
+    },
+    'Latin': {
+        'vi': 'ăâđêôơưạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ',
+        'de': 'ß',
+        'es': 'ñ¿¡',
+        'fr': 'œ',
+        'pt': 'ãõ',
+        'pl': 'łąęśźżń',
+        'cs': 'ěřůť',
+        'sk': 'ľĺŕ',
+        'hu': 'őű',
+        'ro': 'șțş',
+        'tr': 'ğı',
+        'da': 'æ',
+        'no': 'ø',
+        'sv': 'å',
+        'lt': 'ėįųū',
+        'lv': 'ģķļņ',
+        'hr': 'đć',
+        'et': 'õ',
+    },
+}
+
+# Letters a language shares with one other language of its script: they
+# count for it only when none of that language's distinctive characters occur
+# (Persian and Urdu both write پ چ گ ی ک, which Arabic does not)
+SHARED_CHARS = {
+    'Arabic': {'fa': ('پچگیک', 'ur')},
+}
+
+# Most frequent function words per language
+COMMON_WORDS = {
+    'Latin': {
+        'en': 'the and is are was of to in that it you for with on this have not be',
+        'es': 'el la los las de que y en es un una por con para no se del al',
+        'fr': 'le la les de des et est un une que pour dans pas en du sur au avec',
+        'de': 'der die das und ist nicht ein eine zu den mit von sich auf für ich',
+        'pt': 'o os a as de que e em um uma não para com do da dos das é',
+        'it': 'il lo la gli le di che e è un una per non in con del della sono',
+        'nl': 'de het een en van is dat niet op te zijn voor met ik je',
+        'pl': 'i w nie na się jest to że z do jak co ale po tak',
+        'sv': 'och att det är som en på för inte med jag har av till',
+        'da': 'og at det er en på for ikke med jeg har af til den som',
+        'no': 'og å det er en på for ikke med jeg har av til som',
+        'fi': 'ja on ei se että oli hän mutta kun niin tämä ovat myös',
+        'cs': 'a je se na že to v jsem není jak ale by',
+        'hu': 'a az és hogy nem is egy van meg ez de már',
+        'ro': 'și în este nu că o un de la cu pe care',
+        'tr': 've bir bu da de için ile ne değil çok ben sen',
+        'id': 'dan yang di ini itu dengan untuk tidak dari ada saya akan',
+        'ms': 'dan yang di ini itu dengan untuk tidak dari ada saya akan boleh',
+        'vi': 'và là của có không một những các được cho này người tôi',
+        'fil': 'ang ng sa mga at na ay ako ko hindi siya',
+        'sw': 'na ya wa kwa ni la katika za hii kama',
+    },
+    'Cyrillic': {
+        'ru': 'и в не на что я с он как это по но из',
+        'uk': 'і в не на що я з він як це та але',
+        'bg': 'и в не на че аз с той как това да за',
+    },
+    'Devanagari': {
+        'hi': 'है हैं का की के में और से को यह नहीं ने पर भी था',
+        'mr': 'आहे आणि च्या ला मध्ये हे नाही होते आहेत या',
+        'ne': 'छ छन् र मा हो गर्न पनि थियो भने',
+    },
+    'Arabic': {
+        'ar': 'في من على إلى أن هذا كان التي الذي هو هي أنا',
+        'fa': 'است و در به از که این را با من شما هست',
+        'ur': 'ہے ہیں کے کی کا میں اور سے کو یہ نہیں',
+    },
+}
+COMMON_WORDS = {
+    script: {language: frozenset(words.split()) for language, words in profiles.items()}
+    for script, profiles in COMMON_WORDS.items()
+}
+
+# Words are runs of non-space, non-punctuation characters (\w would split
+# Indic words at their combining vowel signs)
+WORD_RE = re.compile(r'[^\s\d.,;:!?¿¡"\'()\[\]{}«»“”‘’।॥،؛؟-]+')
+
+# Minimum share of letters in the dominant script to trust it
+MIN_SCRIPT_SHARE = 0.6
+# Minimum words matched before a common-word profile decides a Latin language
+MIN_PROFILE_HITS = 2
+
+
+def script_of(char):
+    """Return the script name of a character, or None if not covered."""
+    i = bisect_right(_RANGE_STARTS, ord(char)) - 1
+    if i >= 0:
+        start, end, script = SCRIPT_RANGES[i]
+        if start <= ord(char) <= end:
+            return script
+    return None
+
+
+def script_counts(text):
+    """Count letters per script."""
+    counts = {}
+    for char in text:
+        if char.isalpha():
+            script = script_of(char)
+            if script:
+                counts[script] = counts.get(script, 0) + 1
+    return counts
+
+
+def _profile_scores(text, script):
+    """Score languages of a shared script by distinctive chars and common words."""
+    scores = {}
+    lowered = text.lower()
+    for language, chars in DISTINCTIVE_CHARS.get(script, {}).items():
+        hits = sum(lowered.count(char) for char in chars)
+        if hits:
+            scores[language] = scores.get(language, 0) + hits
+    for language, (chars, other) in SHARED_CHARS.get(script, {}).items():
+        if other in scores:
+            continue
+        hits = sum(lowered.count(char) for char in chars)
+        if hits:
+            scores[language] = scores.get(language, 0) + hits
+    words = WORD_RE.findall(lowered)
+    for language, profile in COMMON_WORDS.get(script, {}).items():
+        hits = sum(1 for word in words if word in profile)
+        if hits:
+            scores[language] = scores.get(language, 0) + hits
+    return scores
+
+
+def detect_language(text):
+    """
+    Identify the language of text locally.
+
+    Returns a language code from VoiceProfile.LANGUAGE_CHOICES (plus the
+    extra AKSHARAMUKHA_SCRIPT_MAP codes), or None when the text is too short
+    or ambiguous, in which case the caller should defer to the provider.
+    """
+    counts = script_counts(text)
+    if not counts:
+        return None
+
+    total = sum(counts.values())
+    script, letters = max(counts.items(), key=lambda item: item[1])
+    if letters / total < MIN_SCRIPT_SHARE:
+        return None
+
+    # Any kana means Japanese even when kanji dominate
+    if script == 'Han' and counts.get('Kana'):
+        return 'ja'
+    if script in SCRIPT_LANGUAGE:
+        return SCRIPT_LANGUAGE[script]
+
+    scores = _profile_scores(text, script)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if ranked and (len(ranked) == 1 or ranked[0][1] > ranked[1][1]):
+        language, hits = ranked[0]
+        if script != 'Latin' or hits >= MIN_PROFILE_HITS:
+            return language
+    # No evidence or a tie: the script alone does not identify the language
+    return None
+
@@ -0,0 +1,28 @@
+"""
+Management command that builds the daily usage table from existing data:
+python manage.py backfill_daily_usage [--batch-size 500]
+
+Counters are recomputed from GeneratedSpeech and the credit ledger and
+upserted, so it can be re-run at any time. Run it while generation traffic
+is low: an increment landing in the middle of a batch may be overwritten.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.voices.usage import backfill_daily_usage
+
+
+class Command(BaseCommand):
+    help = 'Rebuild per-user daily usage counters from generated speeches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per batch')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = backfill_daily_usage(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} daily usage row(s) in {time.monotonic() - started:.2f}s'
+        ))
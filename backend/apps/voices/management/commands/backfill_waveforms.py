@@ -0,0 +1,55 @@
+"""
+Management command that computes waveform peaks for existing generated speech.
+Run with: python manage.py backfill_waveforms [--workers 4] [--batch-size 200]
+
+Rows without peaks are processed in primary-key batches; each batch is
+decoded in parallel by a thread pool (decoding runs in ffmpeg subprocesses
+and NumPy, both outside the GIL) and written back with one bulk update.
+Rows whose audio cannot be decoded are skipped and reported.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from apps.voices.models import GeneratedSpeech
+from apps.voices.waveform import fill_missing_peaks
+
+
+class Command(BaseCommand):
+    help = 'Compute waveform peaks for generated speech that has none'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Parallel decoders')
+        parser.add_argument('--batch-size', type=int, default=200, help='Rows per bulk update')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        pending = (
+            GeneratedSpeech.objects.filter(waveform_peaks__isnull=True)
+            .exclude(audio_file='')
+            .order_by('pk')
+            .only('pk', 'audio_file', 'output_format', 'waveform_peaks')
+        )
+        done = skipped = 0
+        last_pk = 0
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            while True:
+                batch = list(pending.filter(pk__gt=last_pk)[:batch_size])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                updated, failed = fill_missing_peaks(batch, executor=executor)
+                done += updated
+                skipped += failed
+                self.stdout.write(f'Processed up to id {last_pk}: {done} done, {skipped} skipped')
+
+        elapsed = time.monotonic() - started
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Computed peaks for {done} row(s), skipped {skipped}, in {elapsed:.1f}s ({rate:.1f} rows/s)'
+        ))
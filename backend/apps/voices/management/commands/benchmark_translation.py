@@ -0,0 +1,101 @@
+"""
+Management command to compare remote translation calls for name-heavy text.
+Run with: python manage.py benchmark_translation [--target ta] [--latency-ms 150]
+
+The Google provider is replaced by a stub with a fixed latency, so the numbers
+reflect the number of round trips rather than network conditions.
+"""
+
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+
+from apps.voices import translation
+from apps.voices.translation import TranslationService
+
+
+# Greetings, announcements and dialogue lines typical of Indic-target
+# requests: a limited set of message templates filled with many names.
+TEMPLATES = [
+    '{0}',
+    '{0} {1}',
+    '{0}, {1} and {2}',
+    'Welcome to Chennai, {0}.',
+    'Happy birthday {0}!',
+    '{0} and {1} are getting married in Madurai.',
+    'Please call {0} before you leave for Bangalore.',
+    '{0} met {1} at the Coimbatore station.',
+    'Our guest today is Doctor {0} from Hyderabad.',
+    'Thank you {0}, {1} and {2} for joining us.',
+    '{0} will present the results after lunch.',
+    'Good morning everyone, this is {0} speaking.',
+    'Congratulations {0} on your promotion.',
+    'The weather is nice today.',
+]
+
+NAMES = [
+    'Ramesh', 'Priya', 'Suresh', 'Anand', 'Meena', 'Lakshmi', 'Arjun', 'Kavya',
+    'Rahul', 'Sneha', 'Vikram', 'Deepa', 'Karthik', 'Venkatesh', 'Sanjay',
+    'Pooja', 'Harish', 'Nandini', 'Radhika', 'Gopal', 'Mohan', 'Ganesh',
+]
+
+
+def build_corpus(size):
+    """Fill the templates round-robin with rotating names."""
+    corpus = []
+    for i in range(size):
+        names = [NAMES[(i * 3 + k) % len(NAMES)] for k in range(3)]
+        corpus.append(TEMPLATES[i % len(TEMPLATES)].format(*names))
+    return corpus
+
+
+class Command(BaseCommand):
+    help = 'Benchmark remote calls of whole-text vs name-placeholder translation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='ta', help='Target language code')
+        parser.add_argument('--latency-ms', type=float, default=150.0, help='Simulated provider latency')
+        parser.add_argument('--size', type=int, default=200, help='Number of corpus lines')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        latency = options['latency_ms'] / 1000.0
+        corpus = build_corpus(options['size'])
+
+        def run(label, translate_one):
+            calls = []
+
+            def fake_google(service, text, source, target):
+                calls.append(text)
+                time.sleep(latency)
+                return f'<{target}>{text}'
+
+            translation._cached_transliterate.cache_clear()
+            translation._prose_cache.clear()
+            service = TranslationService()
+            with mock.patch.object(TranslationService, '_translate_with_google', fake_google):
+                started = time.perf_counter()
+                for text in corpus:
+                    translate_one(service, text)
+                elapsed = time.perf_counter() - started
+
+            requests = len(corpus)
+            self.stdout.write(
+                f'{label:<10} remote calls: {len(calls):>4} / {requests} requests  '
+                f'total: {elapsed:6.2f}s  mean: {elapsed / requests * 1000:7.1f} ms'
+            )
+
+        def legacy(service, text):
+            # Whole-input heuristic that predates the span planner
+            if service._is_likely_name(text):
+                if service._transliterate_with_aksharamukha(text.strip(), target):
+                    return
+            service._translate_with_google(text, 'auto', target)
+
+        def planned(service, text):
+            service.translate(text, target)
+
+        self.stdout.write(f'Corpus: {len(corpus)} lines, target={target}, latency={latency * 1000:.0f} ms')
+        run('whole-text', legacy)
+        run('planned', planned)
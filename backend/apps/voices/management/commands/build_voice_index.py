@@ -0,0 +1,76 @@
+"""
+Management command that measures every Edge voice in VOICE_MAP for clone matching.
+Run with: python manage.py build_voice_index [--missing-only] [--concurrency 4]
+
+Each voice renders a short reference clip once; its pitch and spectral
+centroid are stored in ReferenceVoice. Requires ffmpeg to decode the MP3s.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+
+import edge_tts
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.voices.clone_processing import CloneProcessingError, _decode_with_ffmpeg, analyze_audio
+from apps.voices.models import ReferenceVoice
+from apps.voices.voice_matching import reset_index, voice_catalog
+
+# Digits are read in each voice's own language
+REFERENCE_TEXT = '1, 2, 3, 4, 5, 6, 7, 8, 9, 10. 11, 12, 13, 14, 15, 16, 17, 18, 19, 20.'
+
+
+class Command(BaseCommand):
+    help = 'Analyze reference renders of all Edge voices for clone voice matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true', help='Skip voices that were already analyzed')
+        parser.add_argument('--concurrency', type=int, default=4, help='Parallel renders')
+
+    def handle(self, *args, **options):
+        if not shutil.which('ffmpeg'):
+            raise CommandError('ffmpeg is required to decode reference renders')
+
+        catalog = voice_catalog()
+        if options['missing_only']:
+            done = set(ReferenceVoice.objects.exclude(pitch_hz=None).values_list('shortname', flat=True))
+            catalog = [voice for voice in catalog if voice[0] not in done]
+        self.stdout.write(f'Analyzing {len(catalog)} voice(s)')
+
+        with tempfile.TemporaryDirectory() as workdir:
+            results = asyncio.run(self._render_all(catalog, workdir, max(1, options['concurrency'])))
+
+        analyzed = 0
+        for (shortname, language, gender), features in zip(catalog, results):
+            if isinstance(features, Exception):
+                self.stderr.write(f'{shortname}: {features}')
+                continue
+            ReferenceVoice.objects.update_or_create(
+                shortname=shortname,
+                defaults={
+                    'language': language,
+                    'gender': gender,
+                    'pitch_hz': features['pitch_hz'],
+                    'spectral_centroid_hz': features['spectral_centroid_hz'],
+                },
+            )
+            analyzed += 1
+        reset_index()
+        self.stdout.write(self.style.SUCCESS(f'Analyzed {analyzed}/{len(catalog)} voice(s)'))
+
+    async def _render_all(self, catalog, workdir, concurrency):
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def render(shortname):
+            path = os.path.join(workdir, f'{shortname}.mp3')
+            async with semaphore:
+                await edge_tts.Communicate(REFERENCE_TEXT, shortname).save(path)
+            samples, rate = await loop.run_in_executor(None, _decode_with_ffmpeg, path)
+            if not len(samples):
+                raise CloneProcessingError('Empty reference render')
+            return analyze_audio(samples, rate)
+
+        return await asyncio.gather(*(render(voice[0]) for voice in catalog), return_exceptions=True)
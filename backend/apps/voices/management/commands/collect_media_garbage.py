@@ -0,0 +1,64 @@
+"""
+Management command that deletes media files no database row references.
+Run with: python manage.py collect_media_garbage [--grace-hours 24] [--retention] [--dry-run]
+
+With --retention, generated speech older than the owner's tier retention
+(AUDIO_RETENTION_DAYS) is deleted first so its files are swept in the same run.
+Resumable clone uploads idle for CLONE_UPLOAD_EXPIRY_HOURS are aborted and
+their part directories deleted. Zero-byte audio left by failed syntheses is deleted
+and its GeneratedSpeech reference cleared.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.voices.media_gc import clear_empty_speech_audio, expire_generated_speech, referenced_keys, sweep
+from apps.voices.uploads import expire_stale_uploads
+
+
+class Command(BaseCommand):
+    help = 'Mark-and-sweep garbage collection of unreferenced media files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=None,
+                            help='Keep unreferenced files younger than this (default MEDIA_GC_GRACE_HOURS)')
+        parser.add_argument('--retention', action='store_true', help='Apply per-tier audio retention first')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows/files per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Report without deleting')
+
+    def handle(self, *args, **options):
+        grace_hours = options['grace_hours']
+        if grace_hours is None:
+            grace_hours = getattr(settings, 'MEDIA_GC_GRACE_HOURS', 24)
+        batch_size = max(1, options['batch_size'])
+        prefix = '[dry run] ' if options['dry_run'] else ''
+
+        if options['retention']:
+            expired = expire_generated_speech(batch_size=batch_size, dry_run=options['dry_run'])
+            for tier, count in expired.items():
+                self.stdout.write(f'{prefix}Expired {count} {tier} generation(s)')
+
+        aborted, parts, part_bytes = expire_stale_uploads(batch_size=batch_size, dry_run=options['dry_run'])
+        self.stdout.write(f'{prefix}Expired {aborted} stale upload(s), deleted {parts} part(s) '
+                          f'({part_bytes / 1024 / 1024:.1f} MiB)')
+
+        cleared = clear_empty_speech_audio(grace_seconds=grace_hours * 3600, batch_size=batch_size,
+                                           dry_run=options['dry_run'])
+        self.stdout.write(f'{prefix}Cleared {cleared} empty generated audio file(s)')
+
+        started = time.monotonic()
+        keys = referenced_keys(batch_size=batch_size)
+        marked = time.monotonic()
+        self.stdout.write(f'Marked {len(keys)} referenced file(s) in {marked - started:.1f}s '
+                          f'({keys.nbytes / 1024:.0f} KiB)')
+
+        stats = sweep(keys, grace_seconds=grace_hours * 3600, dry_run=options['dry_run'], batch_size=batch_size)
+        elapsed = time.monotonic() - marked
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Scanned {stats['scanned']} file(s) in {elapsed:.1f}s: "
+            f"deleted {stats['deleted']} ({stats['deleted_bytes'] / 1024 / 1024:.1f} MiB, "
+            f"{stats['empty_deleted']} empty), kept {stats['referenced']} referenced "
+            f"and {stats['too_recent']} within the grace period"
+        ))
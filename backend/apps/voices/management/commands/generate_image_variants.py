@@ -0,0 +1,38 @@
+"""
+Management command that renders missing image variants for existing uploads.
+Run with: python manage.py generate_image_variants [--workers 2]
+
+Safe to rerun: variants that are newer than their source are skipped.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from apps.voices.image_variants import IMAGE_FIELDS, generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail, medium and WebP variants of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Parallel renders')
+
+    def handle(self, *args, **options):
+        def render(name):
+            try:
+                return len(generate_variants(name))
+            except Exception as e:
+                self.stderr.write(f'{name}: {e}')
+                return 0
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            for model_label, field_name in IMAGE_FIELDS:
+                model = apps.get_model(model_label)
+                names = (
+                    model.objects.exclude(**{field_name: ''}).exclude(**{field_name: None})
+                    .values_list(field_name, flat=True).iterator(chunk_size=1000)
+                )
+                written = sum(executor.map(render, names))
+                self.stdout.write(f'{model_label}.{field_name}: {written} variant(s) written')
@@ -0,0 +1,87 @@
+"""
+Management command that drains the voice clone processing queue.
+Run with: python manage.py process_voice_clones [--workers 2] [--once]
+
+Use with CLONE_PROCESSING_MODE=worker so uploads are left pending for this
+process instead of the web workers' thread pool.
+"""
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.voices.clone_processing import claim_next_clone, requeue_stale_clones, run_pipeline
+
+
+class Command(BaseCommand):
+    help = 'Process pending voice clones with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Worker threads')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Requeue clones stuck in processing for this many seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_clones(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale clone(s)')
+
+        stats_lock = threading.Lock()
+        stats = {'processed': 0, 'ready': 0, 'failed': 0, 'queue_latency': 0.0, 'busy_time': 0.0}
+        stop = threading.Event()
+        started = time.monotonic()
+
+        def worker():
+            while not stop.is_set():
+                close_old_connections()
+                clone = claim_next_clone()
+                if clone is None:
+                    if options['once']:
+                        return
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                began = time.monotonic()
+                run_pipeline(clone)
+                elapsed = time.monotonic() - began
+                queue_latency = (clone.processing_started_at - clone.created_at).total_seconds()
+                with stats_lock:
+                    stats['processed'] += 1
+                    stats[clone.status] = stats.get(clone.status, 0) + 1
+                    stats['queue_latency'] += queue_latency
+                    stats['busy_time'] += elapsed
+                self.stdout.write(
+                    f'Clone {clone.id} -> {clone.status} '
+                    f'(queued {queue_latency:.2f}s, processed {elapsed:.2f}s)'
+                    + (f': {clone.failure_reason}' if clone.failure_reason else '')
+                )
+            close_old_connections()
+
+        threads = [
+            threading.Thread(target=worker, name=f'clone-worker-{i}', daemon=True)
+            for i in range(max(1, options['workers']))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        processed = stats['processed']
+        wall = time.monotonic() - started
+        if processed:
+            self.stdout.write(self.style.SUCCESS(
+                f"Processed {processed} clone(s) ({stats['ready']} ready, {stats['failed']} failed) in {wall:.2f}s; "
+                f"throughput {processed / stats['busy_time'] if stats['busy_time'] else 0:.2f}/s per worker, "
+                f"mean queue latency {stats['queue_latency'] / processed:.2f}s"
+            ))
+        else:
+            self.stdout.write('No pending clones')
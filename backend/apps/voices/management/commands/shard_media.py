@@ -0,0 +1,84 @@
+"""
+Management command that moves media files from flat directories into the sharded layout.
+Run with: python manage.py shard_media [--batch-size 1000] [--dry-run]
+
+Rows are processed in primary-key batches: files are moved with os.replace
+and each batch's paths are rewritten with one bulk UPDATE. Progress lives in
+the database (rows already pointing at a sharded path are skipped) and moves
+are idempotent, so an interrupted run can simply be started again.
+"""
+
+import os
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.voices.storage import ShardedUpload, is_sharded, resharded_name
+
+
+def sharded_fields():
+    """(model, field name, prefix) for every FileField using ShardedUpload."""
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            upload_to = getattr(field, 'upload_to', None)
+            if isinstance(upload_to, ShardedUpload):
+                yield model, field.name, upload_to.prefix
+
+
+class Command(BaseCommand):
+    help = 'Relocate media files into the hash-prefix sharded layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk update')
+        parser.add_argument('--dry-run', action='store_true', help='Only count rows that would move')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        started = time.monotonic()
+        for model, field_name, prefix in sharded_fields():
+            rewritten, missing = self.migrate_field(model, field_name, prefix, batch_size, options['dry_run'])
+            if rewritten:
+                self.stdout.write(
+                    f'{model._meta.label}.{field_name}: {rewritten} rewritten ({missing} missing on disk)'
+                )
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s'))
+
+    def migrate_field(self, model, field_name, prefix, batch_size, dry_run):
+        rewritten = missing = 0
+        last_pk = None
+        queryset = model.objects.exclude(**{field_name: ''}).exclude(**{field_name: None}).order_by('pk')
+        while True:
+            batch_query = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(batch_query.values_list('pk', field_name)[:batch_size])
+            if not rows:
+                return rewritten, missing
+            last_pk = rows[-1][0]
+
+            updates = {}
+            for pk, name in rows:
+                if is_sharded(name, prefix):
+                    continue
+                new_name = resharded_name(name, prefix)
+                if not dry_run:
+                    source = default_storage.path(name)
+                    target = default_storage.path(new_name)
+                    if os.path.exists(source):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(source, target)
+                    elif not os.path.exists(target):
+                        # File is gone; rewrite the path anyway so the row is not retried
+                        missing += 1
+                updates[pk] = new_name
+
+            if updates and not dry_run:
+                objects = []
+                for pk, new_name in updates.items():
+                    instance = model(pk=pk)
+                    setattr(instance, field_name, new_name)
+                    objects.append(instance)
+                with transaction.atomic():
+                    model.objects.bulk_update(objects, [field_name], batch_size=batch_size)
+            rewritten += len(updates)
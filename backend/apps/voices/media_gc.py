@@ -0,0 +1,208 @@
+"""
+Mark-and-sweep garbage collection for MEDIA_ROOT.
+
+Mark: every path referenced by a FileField is streamed from the database
+and reduced to a 64-bit key, kept as one sorted NumPy array (8 bytes per
+reference). Sweep: the media tree is walked with os.scandir and files are
+checked against the array in fixed-size batches with np.searchsorted.
+Memory is therefore bounded by the number of references, never by the
+number of files on disk.
+
+Unreferenced files are deleted once they are older than the grace period,
+which protects files written by requests whose rows are not committed yet.
+Failed syntheses used to save GeneratedSpeech rows pointing at zero-byte
+files; clear_empty_speech_audio() deletes those files and clears the
+reference so they are not kept forever.
+"""
+
+import hashlib
+import os
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .image_variants import source_name_of
+
+# Directories under MEDIA_ROOT that are not owned by FileFields (clone_uploads
+# part directories are expired by uploads.expire_stale_uploads)
+EXCLUDED_DIRS = {'clone_uploads'}
+SWEEP_BATCH_SIZE = 10000
+
+
+def path_key(name):
+    """64-bit key of a storage name (relative to MEDIA_ROOT, '/'-separated)."""
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), 'little')
+
+
+def file_fields():
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                yield model, field.name
+
+
+def referenced_keys(batch_size=10000):
+    """Sorted unique uint64 keys of every file referenced in the database."""
+    chunks = []
+    buffer = []
+    for model, field_name in file_fields():
+        names = model.objects.exclude(**{field_name: ''}).values_list(field_name, flat=True)
+        for name in names.iterator(chunk_size=batch_size):
+            if name:
+                buffer.append(path_key(name))
+            if len(buffer) >= batch_size:
+                chunks.append(np.unique(np.array(buffer, dtype=np.uint64)))
+                buffer = []
+    chunks.append(np.array(buffer, dtype=np.uint64))
+    return np.unique(np.concatenate(chunks))
+
+
+def iter_media_files(root, excluded=EXCLUDED_DIRS):
+    """Yield (relative name, DirEntry) for every file below root, depth first."""
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(root, relative_dir)) as entries:
+                for entry in entries:
+                    name = f'{relative_dir}/{entry.name}' if relative_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if name not in excluded:
+                            stack.append(name)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield name, entry
+        except FileNotFoundError:
+            continue
+
+
+def _is_referenced(keys, candidates):
+    if not len(keys):
+        return np.zeros(len(candidates), dtype=bool)
+    positions = np.searchsorted(keys, candidates)
+    return keys[np.minimum(positions, len(keys) - 1)] == candidates
+
+
+def sweep(keys, root=None, grace_seconds=86400, dry_run=False, batch_size=SWEEP_BATCH_SIZE, now=None):
+    """Delete unreferenced files older than the grace period. Returns counters."""
+    root = root or settings.MEDIA_ROOT
+    cutoff = (now or time.time()) - grace_seconds
+    stats = {'scanned': 0, 'referenced': 0, 'too_recent': 0, 'deleted': 0, 'deleted_bytes': 0, 'empty_deleted': 0}
+
+    batch = []
+
+    def flush():
+        # Image variants live as long as the image they were rendered from
+        candidates = np.array([path_key(source_name_of(name) or name) for name, _ in batch], dtype=np.uint64)
+        referenced = _is_referenced(keys, candidates)
+        stats['referenced'] += int(referenced.sum())
+        for (name, entry), is_referenced in zip(batch, referenced):
+            if is_referenced:
+                continue
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if info.st_mtime > cutoff:
+                stats['too_recent'] += 1
+                continue
+            if not dry_run:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+            stats['deleted'] += 1
+            stats['deleted_bytes'] += info.st_size
+            if info.st_size == 0:
+                stats['empty_deleted'] += 1
+        batch.clear()
+
+    for item in iter_media_files(root):
+        stats['scanned'] += 1
+        batch.append(item)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return stats
+
+
+def clear_empty_speech_audio(grace_seconds=86400, batch_size=1000, dry_run=False):
+    """
+    Delete zero-byte audio files of GeneratedSpeech rows older than the grace
+    period and clear the rows' audio_file. Only rows with no duration (what a
+    failed synthesis stored) are checked. Returns the number of rows cleared.
+    """
+    from .models import GeneratedSpeech
+
+    candidates = (
+        GeneratedSpeech.objects.filter(
+            models.Q(duration_seconds=0) | models.Q(duration_seconds__isnull=True),
+            created_at__lt=timezone.now() - timedelta(seconds=grace_seconds),
+        )
+        .exclude(audio_file='')
+        .order_by('pk')
+        .values_list('pk', 'audio_file')
+    )
+    cleared = 0
+    last_pk = 0
+    while True:
+        rows = list(candidates.filter(pk__gt=last_pk)[:batch_size])
+        if not rows:
+            return cleared
+        last_pk = rows[-1][0]
+        empty = []
+        for pk, name in rows:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            try:
+                if os.path.getsize(path):
+                    continue
+                if not dry_run:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            empty.append(pk)
+        if not dry_run:
+            GeneratedSpeech.objects.filter(pk__in=empty).update(audio_file='')
+        cleared += len(empty)
+
+
+def expire_generated_speech(retention_days=None, batch_size=1000, dry_run=False):
+    """
+    Delete GeneratedSpeech rows older than their owner's tier retention
+    (AUDIO_RETENTION_DAYS, e.g. {'free': 30, 'paid': 365}; tiers without a
+    value keep audio forever). Users with an approved purchase are 'paid',
+    admins are never expired. Files are reclaimed by the next sweep.
+    Returns the number of rows deleted per tier.
+    """
+    from apps.payments.models import Transaction
+    from .models import GeneratedSpeech
+
+    retention_days = retention_days if retention_days is not None else getattr(settings, 'AUDIO_RETENTION_DAYS', {})
+    paid_users = Transaction.objects.filter(status='approved').values('user_id')
+    tiers = {
+        'free': GeneratedSpeech.objects.filter(user__is_admin=False).exclude(user_id__in=paid_users),
+        'paid': GeneratedSpeech.objects.filter(user__is_admin=False, user_id__in=paid_users),
+    }
+
+    deleted = {}
+    for tier, queryset in tiers.items():
+        days = retention_days.get(tier)
+        if not days:
+            continue
+        expired = queryset.filter(created_at__lt=timezone.now() - timedelta(days=days)).order_by('pk')
+        deleted[tier] = 0
+        while True:
+            pks = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            if dry_run:
+                deleted[tier] = expired.count()
+                break
+            GeneratedSpeech.objects.filter(pk__in=pks).delete()
+            deleted[tier] += len(pks)
+    return deleted
@@ -0,0 +1,180 @@
+"""
+Authenticated serving of media files.
+
+Access is checked by the calling view, either by ownership (JWT) or with a
+short-lived signed URL from media_url(): audio players (``new Audio(url)``,
+``<audio src>``) cannot send an Authorization header, so the signature over
+(kind, object id, owner id) stands in for it until MEDIA_URL_MAX_AGE runs
+out. This module also turns a FieldFile into an efficient response. Conditional requests (ETag / If-None-Match,
+Last-Modified / If-Modified-Since) are answered with 304 without touching
+the file. When MEDIA_ACCEL_MODE is set, the byte transfer is delegated to
+the front proxy (nginx X-Accel-Redirect or Apache/lighttpd X-Sendfile),
+which also handles Range. Otherwise a FileResponse streams the file, using
+the server's sendfile path for whole files and open-ended ranges.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import renderers
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_BLOCK_SIZE = 64 * 1024
+MEDIA_SIGNING_SALT = 'apps.voices.media'
+
+
+class MediaPassthroughRenderer(renderers.BaseRenderer):
+    """Lets media actions bypass content negotiation (players send Accept: audio/*)."""
+
+    media_type = '*/*'
+    format = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return renderers.JSONRenderer().render(data)
+
+
+def media_url(request, url_name, obj):
+    """URL of a media action for ``obj`` carrying a signed token for its owner."""
+    token = signing.TimestampSigner(salt=MEDIA_SIGNING_SALT).sign(f'{url_name}:{obj.pk}:{obj.user_id}')
+    url = f"{reverse(url_name, args=[obj.pk])}?token={quote(token)}"
+    return request.build_absolute_uri(url) if request else url
+
+
+def signed_owner_id(token, url_name, pk):
+    """Owner id from a valid, unexpired token for (url_name, pk); None otherwise."""
+    try:
+        value = signing.TimestampSigner(salt=MEDIA_SIGNING_SALT).unsign(
+            token, max_age=getattr(settings, 'MEDIA_URL_MAX_AGE', 3600),
+        )
+    except signing.BadSignature:  # Includes SignatureExpired
+        return None
+    signed_name, signed_pk, user_id = value.rsplit(':', 2)
+    if signed_name != url_name or signed_pk != str(pk):
+        return None
+    return int(user_id)
+
+
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        return if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and int(mtime) <= if_modified_since
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single satisfiable byte range,
+    None to serve the whole file, or 'unsatisfiable'.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        return None  # Multiple or malformed ranges: full response
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if not length:
+            return 'unsatisfiable'
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def serve_media(request, field_file, content_type=None):
+    """Build the response for a FieldFile the requesting user may access."""
+    if not field_file:
+        raise Http404('No file')
+    path = field_file.path
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404('File not found')
+
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    etag = file_etag(stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': 'private, max-age=3600',
+        'Accept-Ranges': 'bytes',
+    }
+
+    if _not_modified(request, etag, stat.st_mtime):
+        response = HttpResponse(status=304)
+    else:
+        response = _accel_response(field_file.name, content_type) or _file_response(request, path, stat, etag,
+                                                                                    content_type)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _accel_response(name, content_type):
+    mode = getattr(settings, 'MEDIA_ACCEL_MODE', '')
+    if not mode:
+        return None
+    response = HttpResponse(content_type=content_type)
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+    else:
+        response['X-Sendfile'] = os.path.join(str(settings.MEDIA_ROOT), name)
+    return response
+
+
+def _file_response(request, path, stat, etag, content_type):
+    size = stat.st_size
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if range_header and (not if_range or if_range.strip() in (etag, http_date(stat.st_mtime))):
+        byte_range = parse_range(range_header, size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    if end == size - 1:
+        # Open-ended: FileResponse from the offset keeps the sendfile path
+        f = open(path, 'rb')
+        f.seek(start)
+        response = FileResponse(f, content_type=content_type, status=206)
+    else:
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1),
+                                         content_type=content_type, status=206)
+        response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0004_generatedspeech_balance_after_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voiceclone',
+            name='failure_reason',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='processed_audio',
+            field=models.FileField(blank=True, null=True, upload_to='clone_samples/processed/'),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='processing_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='voiceclone',
+            index=models.Index(fields=['status', 'created_at'], name='voice_clone_status_created'),
+        ),
+    ]
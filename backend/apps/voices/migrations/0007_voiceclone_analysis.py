@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0006_cloneupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voiceclone',
+            name='clipping_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='pitch_hz',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='rms_dbfs',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='silence_ratio',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
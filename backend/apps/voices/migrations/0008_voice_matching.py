@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0007_voiceclone_analysis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceVoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shortname', models.CharField(max_length=100, unique=True)),
+                ('language', models.CharField(db_index=True, max_length=10)),
+                ('gender', models.CharField(blank=True, max_length=20)),
+                ('pitch_hz', models.FloatField(blank=True, null=True)),
+                ('spectral_centroid_hz', models.FloatField(blank=True, null=True)),
+                ('analyzed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'reference_voices',
+                'ordering': ['shortname'],
+            },
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='spectral_centroid_hz',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='voiceclone',
+            name='voice_shortname',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
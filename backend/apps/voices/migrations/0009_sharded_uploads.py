@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:28
+
+import apps.voices.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0008_voice_matching'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generatedspeech',
+            name='audio_file',
+            field=models.FileField(upload_to=apps.voices.storage.ShardedUpload('generated_audio')),
+        ),
+        migrations.AlterField(
+            model_name='voiceclone',
+            name='audio_sample',
+            field=models.FileField(upload_to=apps.voices.storage.ShardedUpload('clone_samples')),
+        ),
+        migrations.AlterField(
+            model_name='voiceclone',
+            name='processed_audio',
+            field=models.FileField(blank=True, null=True, upload_to=apps.voices.storage.ShardedUpload('clone_samples/processed')),
+        ),
+        migrations.AlterField(
+            model_name='voiceprofile',
+            name='preview_image',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.voices.storage.ShardedUpload('voice_previews')),
+        ),
+        migrations.AlterField(
+            model_name='voiceprofile',
+            name='sample_audio',
+            field=models.FileField(blank=True, null=True, upload_to=apps.voices.storage.ShardedUpload('voice_samples')),
+        ),
+    ]
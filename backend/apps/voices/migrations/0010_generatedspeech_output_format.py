@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0009_sharded_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedspeech',
+            name='output_format',
+            field=models.CharField(default='audio-24khz-48kbitrate-mono-mp3', max_length=50),
+        ),
+    ]
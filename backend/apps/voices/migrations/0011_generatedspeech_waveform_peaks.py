@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0010_generatedspeech_output_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedspeech',
+            name='waveform_peaks',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0011_generatedspeech_waveform_peaks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('generations', models.IntegerField(default=0)),
+                ('characters', models.BigIntegerField(default=0)),
+                ('audio_seconds', models.FloatField(default=0)),
+                ('credits_spent', models.IntegerField(default=0)),
+                ('credits_refunded', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'daily_usage',
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='daily_usage_user_date')],
+            },
+        ),
+    ]
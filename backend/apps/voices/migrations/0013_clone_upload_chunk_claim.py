@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voices', '0012_daily_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cloneupload',
+            name='claim_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AlterField(
+            model_name='cloneupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('receiving', 'Receiving chunk'), ('complete', 'Complete'), ('aborted', 'Aborted')], default='uploading', max_length=20),
+        ),
+    ]
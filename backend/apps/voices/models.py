@@ -1,6 +1,10 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 
+from .storage import ShardedUpload
+
 
 class VoiceProfile(models.Model):
     """System voice profiles for speech generation."""
@@ -88,8 +92,8 @@ class VoiceProfile(models.Model):
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
     emotion = models.CharField(max_length=20, choices=EMOTION_CHOICES, default='neutral')
     language = models.CharField(max_length=10, choices=LANGUAGE_CHOICES, default='en')
-    sample_audio = models.FileField(upload_to='voice_samples/', null=True, blank=True)
-    preview_image = models.ImageField(upload_to='voice_previews/', null=True, blank=True)
+    sample_audio = models.FileField(upload_to=ShardedUpload('voice_samples'), null=True, blank=True)
+    preview_image = models.ImageField(upload_to=ShardedUpload('voice_previews'), null=True, blank=True)
     is_active = models.BooleanField(default=True)
     is_premium = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -114,7 +118,7 @@ class VoiceClone(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     language = models.CharField(max_length=10, choices=VoiceProfile.LANGUAGE_CHOICES, default='en')
-    audio_sample = models.FileField(upload_to='clone_samples/')
+    audio_sample = models.FileField(upload_to=ShardedUpload('clone_samples'))
     status = models.CharField(
         max_length=20,
         choices=[
@@ -125,6 +129,20 @@ class VoiceClone(models.Model):
         ],
         default='pending'
     )
+    failure_reason = models.TextField(blank=True)
+    sample_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    # Analysis of the sample, filled in by the processing pipeline
+    duration_seconds = models.FloatField(null=True, blank=True)
+    rms_dbfs = models.FloatField(null=True, blank=True)
+    clipping_ratio = models.FloatField(null=True, blank=True)
+    silence_ratio = models.FloatField(null=True, blank=True)
+    pitch_hz = models.FloatField(null=True, blank=True)
+    spectral_centroid_hz = models.FloatField(null=True, blank=True)
+    # Edge TTS voice matched to the sample, cached after the first lookup
+    voice_shortname = models.CharField(max_length=100, blank=True)
+    processed_audio = models.FileField(upload_to=ShardedUpload('clone_samples/processed'), null=True, blank=True)
+    processing_started_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -132,11 +150,77 @@ class VoiceClone(models.Model):
     class Meta:
         db_table = 'voice_clones'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='voice_clone_status_created'),
+        ]
     
     def __str__(self):
         return f"{self.name} (by {self.user.email})"
 
 
+class CloneUpload(models.Model):
+    """Resumable chunked upload session for a voice clone sample."""
+    
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('receiving', 'Receiving chunk'),
+        ('complete', 'Complete'),
+        ('aborted', 'Aborted'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='clone_uploads'
+    )
+    name = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    language = models.CharField(max_length=10, choices=VoiceProfile.LANGUAGE_CHOICES, default='en')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    checksum = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 (hex), optional")
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    # Token of the request currently writing a chunk (status 'receiving')
+    claim_token = models.CharField(max_length=32, blank=True)
+    voice_clone = models.OneToOneField(
+        VoiceClone,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'clone_uploads'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Upload {self.filename} ({self.received_bytes}/{self.total_size})"
+
+
+class ReferenceVoice(models.Model):
+    """Acoustic features of an Edge TTS voice, measured from a reference render."""
+    
+    shortname = models.CharField(max_length=100, unique=True)
+    language = models.CharField(max_length=10, db_index=True)
+    gender = models.CharField(max_length=20, blank=True)
+    pitch_hz = models.FloatField(null=True, blank=True)
+    spectral_centroid_hz = models.FloatField(null=True, blank=True)
+    analyzed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'reference_voices'
+        ordering = ['shortname']
+    
+    def __str__(self):
+        return self.shortname
+
+
 class GeneratedSpeech(models.Model):
     """Generated speech records."""
     
@@ -160,7 +244,10 @@ class GeneratedSpeech(models.Model):
         related_name='generated_speeches'
     )
     input_text = models.TextField()
-    audio_file = models.FileField(upload_to='generated_audio/')
+    audio_file = models.FileField(upload_to=ShardedUpload('generated_audio'))
+    output_format = models.CharField(max_length=50, default='audio-24khz-48kbitrate-mono-mp3')
+    # Interleaved int8 (min, max) pairs, see apps.voices.waveform
+    waveform_peaks = models.BinaryField(null=True, blank=True)
     duration_seconds = models.FloatField(null=True, blank=True)
     credits_used = models.IntegerField(default=5)
     balance_after = models.IntegerField(null=True, blank=True)
@@ -172,3 +259,29 @@ class GeneratedSpeech(models.Model):
     
     def __str__(self):
         return f"Speech by {self.user.email} - {self.created_at}"
+
+
+class DailyUsage(models.Model):
+    """Per-user, per-day usage counters, maintained by apps.voices.usage."""
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='daily_usage'
+    )
+    date = models.DateField()
+    generations = models.IntegerField(default=0)
+    characters = models.BigIntegerField(default=0)
+    audio_seconds = models.FloatField(default=0)
+    credits_spent = models.IntegerField(default=0)
+    credits_refunded = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'daily_usage'
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='daily_usage_user_date'),
+        ]
+    
+    def __str__(self):
+        return f"Usage of {self.user_id} on {self.date}"
@@ -0,0 +1,165 @@
+"""
+Resilience helpers for calls to external providers.
+Bounded retries with jittered exponential backoff, and a per-process
+circuit breaker that fails fast while a provider keeps failing.
+"""
+
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider while its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``recovery_timeout`` seconds. The first call after
+    that is let through as a trial (half-open): success closes the circuit,
+    failure re-opens it. State is per process, so each gunicorn worker trips
+    independently.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.metrics = {
+            'calls': 0,
+            'successes': 0,
+            'failures': 0,
+            'rejected': 0,
+            'retries': 0,
+            'transitions': {},
+        }
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.recovery_timeout:
+            self._transition(self.HALF_OPEN)
+        return self._state
+
+    def _transition(self, new_state):
+        if new_state == self._state:
+            return
+        key = f'{self._state}->{new_state}'
+        self.metrics['transitions'][key] = self.metrics['transitions'].get(key, 0) + 1
+        print(f"Circuit '{self.name}': {key}")
+        self._state = new_state
+        if new_state == self.OPEN:
+            self._opened_at = self._clock()
+        elif new_state == self.CLOSED:
+            self._failures = 0
+            self._opened_at = None
+        if new_state != self.HALF_OPEN:
+            self._trial_in_flight = False
+
+    def before_call(self):
+        """Reserve a call slot or raise CircuitOpenError."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.OPEN or (state == self.HALF_OPEN and self._trial_in_flight):
+                self.metrics['rejected'] += 1
+                raise CircuitOpenError(f"Circuit '{self.name}' is open")
+            if state == self.HALF_OPEN:
+                self._trial_in_flight = True
+            self.metrics['calls'] += 1
+
+    def record_success(self):
+        with self._lock:
+            self.metrics['successes'] += 1
+            self._failures = 0
+            if self._state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.metrics['failures'] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._transition(self.OPEN)
+
+    def release(self):
+        """End a call that proved nothing about the provider without counting it."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_retry(self):
+        with self._lock:
+            self.metrics['retries'] += 1
+
+    def snapshot(self):
+        """Current state and counters, for health endpoints."""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'metrics': {
+                    **{key: value for key, value in self.metrics.items() if key != 'transitions'},
+                    'transitions': dict(self.metrics['transitions']),
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._transition(self.CLOSED)
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def call_with_resilience(func, breaker, retryable, max_retries=2, backoff_base=0.25,
+                         backoff_cap=2.0, sleep=time.sleep, deadline=None, clock=time.monotonic):
+    """
+    Call ``func()`` through ``breaker``, retrying exceptions in ``retryable``.
+
+    Non-retryable exceptions are re-raised immediately and are left out of the
+    breaker (they are caused by the request, not the provider); a half-open
+    trial they used is released for the next call. ``deadline`` is a
+    ``clock()`` value: no retry is started whose backoff would end past it.
+    Raises CircuitOpenError without calling ``func`` while the circuit is open.
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = func()
+        except retryable:
+            breaker.record_failure()
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, backoff_base, backoff_cap)
+            if deadline is not None and clock() + delay >= deadline:
+                raise
+            breaker.record_retry()
+            sleep(delay)
+            attempt += 1
+            continue
+        except Exception:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
@@ -0,0 +1,96 @@
+"""
+Versioned cache of rendered JSON for read-mostly endpoints.
+
+Each cached endpoint has a name and a version token. Responses are stored
+as rendered JSON bytes plus an ETag (a hash of the bytes) under a key that
+includes the version, so a save or delete of any model in CACHED_RESPONSES
+only has to replace the version token; old entries are never served again
+and expire on their own. A request whose If-None-Match matches the ETag gets
+a 304 without a body.
+
+Version tokens live in the 'shared' cache alias (Redis or a database table),
+so a change made through any worker invalidates every worker's entries at
+once; the rendered entries themselves stay in each process's default cache.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+KEY_PREFIX = 'response-cache'
+VERSION_CACHE_ALIAS = 'shared'
+
+# Endpoint name -> models whose changes invalidate it
+CACHED_RESPONSES = {
+    'voice-profiles': ['voices.VoiceProfile'],
+    'payment-settings': ['payments.PaymentSettings'],
+}
+
+
+def _version_key(name):
+    return f'{KEY_PREFIX}:version:{name}'
+
+
+def get_version(name):
+    """Current version token of ``name``, created on first use or after eviction."""
+    versions = caches[VERSION_CACHE_ALIAS]
+    version = versions.get(_version_key(name))
+    if version is None:
+        versions.add(_version_key(name), uuid.uuid4().hex, None)
+        version = versions.get(_version_key(name))
+    return version
+
+
+def invalidate(name):
+    caches[VERSION_CACHE_ALIAS].set(_version_key(name), uuid.uuid4().hex, None)
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return header.strip() == '*' or etag in [tag.strip().removeprefix('W/') for tag in header.split(',')]
+
+
+def cached_json_response(request, name, build, vary=(), cache_control=None):
+    """
+    Serve ``build()`` (serializable data) as cached JSON bytes with an ETag.
+    ``vary`` lists whatever else the data depends on (host, query string).
+    """
+    version = get_version(name)
+    variant = hashlib.blake2b(repr(tuple(vary)).encode(), digest_size=8).hexdigest()
+    key = f'{KEY_PREFIX}:{name}:{version}:{variant}'
+    entry = cache.get(key)
+    if entry is None:
+        body = JSONRenderer().render(build())
+        entry = (body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        cache.set(key, entry, getattr(settings, 'RESPONSE_CACHE_TTL', 300))
+    body, etag = entry
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control or (
+        f"public, max-age={getattr(settings, 'RESPONSE_CACHE_MAX_AGE', 60)}"
+    )
+    return response
+
+
+def _model_changed(sender, **kwargs):
+    for name, model_labels in CACHED_RESPONSES.items():
+        if sender._meta.label in model_labels:
+            invalidate(name)
+
+
+def connect_signals():
+    from django.apps import apps
+
+    for model_label in {label for labels in CACHED_RESPONSES.values() for label in labels}:
+        model = apps.get_model(model_label)
+        post_save.connect(_model_changed, sender=model, dispatch_uid=f'response-cache-save-{model_label}')
+        post_delete.connect(_model_changed, sender=model, dispatch_uid=f'response-cache-delete-{model_label}')
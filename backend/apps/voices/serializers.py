@@ -1,15 +1,24 @@
 from rest_framework import serializers
-from .models import VoiceProfile, VoiceClone, GeneratedSpeech
+import base64
+import os
+
+from django.conf import settings
+from .models import VoiceProfile, VoiceClone, GeneratedSpeech, CloneUpload
+from .image_variants import ImageVariantsField
+from .media_serving import media_url
+from .services import DEFAULT_OUTPUT_FORMAT, OUTPUT_FORMATS, output_format_available
 
 
 class VoiceProfileSerializer(serializers.ModelSerializer):
     """Serializer for voice profiles."""
     
+    preview_image_variants = ImageVariantsField(source='preview_image')
+    
     class Meta:
         model = VoiceProfile
         fields = [
             'id', 'name', 'description', 'gender', 'emotion', 'language',
-            'sample_audio', 'preview_image', 'is_active', 'is_premium', 'created_at'
+            'sample_audio', 'preview_image', 'preview_image_variants', 'is_active', 'is_premium', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
 
@@ -17,13 +26,27 @@ class VoiceProfileSerializer(serializers.ModelSerializer):
 class VoiceCloneSerializer(serializers.ModelSerializer):
     """Serializer for voice clones."""
     
+    sample_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = VoiceClone
         fields = [
-            'id', 'name', 'description', 'language', 'audio_sample', 'status',
-            'is_active', 'created_at', 'updated_at'
+            'id', 'name', 'description', 'language', 'audio_sample', 'sample_url', 'status',
+            'failure_reason', 'is_active', 'created_at', 'updated_at', 'processed_at',
+            'duration_seconds', 'rms_dbfs', 'clipping_ratio', 'silence_ratio', 'pitch_hz',
+            'spectral_centroid_hz', 'voice_shortname'
         ]
-        read_only_fields = ['id', 'status', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'status', 'failure_reason', 'created_at', 'updated_at', 'processed_at',
+            'duration_seconds', 'rms_dbfs', 'clipping_ratio', 'silence_ratio', 'pitch_hz',
+            'spectral_centroid_hz', 'voice_shortname'
+        ]
+    
+    def get_sample_url(self, obj):
+        """Short-lived signed URL of the uploaded sample (usable without an auth header)."""
+        if not obj.audio_sample:
+            return None
+        return media_url(self.context.get('request'), 'voice-clones-sample', obj)
 
 
 class VoiceCloneCreateSerializer(serializers.ModelSerializer):
@@ -38,20 +61,59 @@ class VoiceCloneCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class CloneUploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable clone sample uploads."""
+    
+    class Meta:
+        model = CloneUpload
+        fields = [
+            'id', 'name', 'description', 'language', 'filename', 'total_size',
+            'received_bytes', 'checksum', 'sha256', 'status', 'voice_clone', 'created_at'
+        ]
+        read_only_fields = ['id', 'received_bytes', 'sha256', 'status', 'voice_clone', 'created_at']
+    
+    def validate_filename(self, value):
+        from .clone_processing import ALLOWED_EXTENSIONS
+        extension = os.path.splitext(value)[1].lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            raise serializers.ValidationError(f'Unsupported audio format: {extension or "unknown"}')
+        return os.path.basename(value)
+    
+    def validate_total_size(self, value):
+        max_size = getattr(settings, 'CLONE_SAMPLE_MAX_BYTES', 50 * 1024 * 1024)
+        if value <= 0:
+            raise serializers.ValidationError('total_size must be positive')
+        if value > max_size:
+            raise serializers.ValidationError(f'Audio sample exceeds {max_size // (1024 * 1024)} MB')
+        return value
+
+
 class GeneratedSpeechSerializer(serializers.ModelSerializer):
     """Serializer for generated speech."""
     
     voice_profile_name = serializers.CharField(source='voice_profile.name', read_only=True)
     voice_clone_name = serializers.CharField(source='voice_clone.name', read_only=True)
+    audio_url = serializers.SerializerMethodField()
+    waveform = serializers.SerializerMethodField()
     
     class Meta:
         model = GeneratedSpeech
         fields = [
             'id', 'voice_profile', 'voice_profile_name', 'voice_clone',
-            'voice_clone_name', 'input_text', 'audio_file',
+            'voice_clone_name', 'input_text', 'audio_file', 'audio_url', 'output_format', 'waveform',
             'duration_seconds', 'credits_used', 'balance_after', 'created_at'
         ]
-        read_only_fields = ['id', 'audio_file', 'duration_seconds', 'created_at']
+        read_only_fields = ['id', 'audio_file', 'output_format', 'duration_seconds', 'created_at']
+    
+    def get_audio_url(self, obj):
+        """Short-lived signed URL of the streaming endpoint (usable without an auth header)."""
+        return media_url(self.context.get('request'), 'speech-history-audio', obj)
+    
+    def get_waveform(self, obj):
+        """Base64 of interleaved int8 (min, max) peak pairs, or None if not computed."""
+        if not obj.waveform_peaks:
+            return None
+        return base64.b64encode(bytes(obj.waveform_peaks)).decode('ascii')
 
 
 class GenerateSpeechSerializer(serializers.Serializer):
@@ -61,6 +123,14 @@ class GenerateSpeechSerializer(serializers.Serializer):
     voice_profile_id = serializers.IntegerField(required=False, allow_null=True)
     voice_clone_id = serializers.IntegerField(required=False, allow_null=True)
     is_preview = serializers.BooleanField(required=False, default=False)
+    output_format = serializers.ChoiceField(
+        choices=list(OUTPUT_FORMATS), required=False, default=DEFAULT_OUTPUT_FORMAT
+    )
+    
+    def validate_output_format(self, value):
+        if not output_format_available(value):
+            raise serializers.ValidationError('This output format is not available on this server')
+        return value
     
     def validate(self, attrs):
         if not attrs.get('voice_profile_id') and not attrs.get('voice_clone_id'):
@@ -72,6 +142,13 @@ class GenerateSpeechSerializer(serializers.Serializer):
         return attrs
 
 
+class TranslateAndGenerateSerializer(GenerateSpeechSerializer):
+    """Serializer for the fused translate-and-speak request."""
+    
+    target_language = serializers.CharField(max_length=10)
+    source_language = serializers.CharField(max_length=10, default='auto', required=False)
+
+
 class TranslateTextSerializer(serializers.Serializer):
     """Serializer for text translation request."""
     
@@ -84,6 +161,7 @@ class AdminVoiceProfileSerializer(serializers.ModelSerializer):
     """Admin serializer for voice profiles (full CRUD)."""
     
     usage_count = serializers.SerializerMethodField()
+    preview_image_variants = ImageVariantsField(source='preview_image')
     
     class Meta:
         model = VoiceProfile
@@ -4,11 +4,14 @@ Provides high-quality neural voices with support for multiple genders and langua
 """
 
 import os
-import uuid
+import shutil
 import asyncio
+import subprocess
 import edge_tts
 from django.conf import settings
 
+from .storage import reserve_path, sharded_name
+
 # Mapping of Voice Profile attributes to Edge TTS ShortNames
 # Format: (Gender, Language, Emotion) -> Voice ShortName
 # Emotion support is limited in free API, so we map to specific character voices where possible.
@@ -262,6 +265,42 @@ LANGUAGE_FALLBACKS = {
     'zu': 'zu-ZA-ThandoNeural',
 }
 
+# Output formats, named after the Azure/Edge TTS format identifiers.
+# The Edge endpoint used by edge-tts only returns 24 kHz 48 kbps MP3, so the
+# other formats are transcoded from it with ffmpeg.
+DEFAULT_OUTPUT_FORMAT = 'audio-24khz-48kbitrate-mono-mp3'
+OUTPUT_FORMATS = {
+    'audio-24khz-48kbitrate-mono-mp3': {
+        'extension': '.mp3', 'content_type': 'audio/mpeg', 'ffmpeg': None,
+    },
+    'audio-16khz-32kbitrate-mono-mp3': {
+        'extension': '.mp3', 'content_type': 'audio/mpeg',
+        'ffmpeg': ['-ar', '16000', '-ac', '1', '-c:a', 'libmp3lame', '-b:a', '32k', '-f', 'mp3'],
+    },
+    'webm-24khz-16bit-24kbps-mono-opus': {
+        'extension': '.webm', 'content_type': 'audio/webm',
+        'ffmpeg': ['-ar', '24000', '-ac', '1', '-c:a', 'libopus', '-b:a', '24k', '-f', 'webm'],
+    },
+    'ogg-16khz-16bit-mono-opus': {
+        'extension': '.ogg', 'content_type': 'audio/ogg',
+        'ffmpeg': ['-ar', '16000', '-ac', '1', '-c:a', 'libopus', '-b:a', '16k', '-f', 'ogg'],
+    },
+    'raw-16khz-16bit-mono-pcm': {
+        'extension': '.pcm', 'content_type': 'audio/L16;rate=16000;channels=1',
+        'ffmpeg': ['-ar', '16000', '-ac', '1', '-f', 's16le'],
+    },
+    'raw-8khz-16bit-mono-pcm': {
+        'extension': '.pcm', 'content_type': 'audio/L16;rate=8000;channels=1',
+        'ffmpeg': ['-ar', '8000', '-ac', '1', '-f', 's16le'],
+    },
+}
+
+
+def output_format_available(output_format):
+    """Formats other than the native MP3 need ffmpeg."""
+    return OUTPUT_FORMATS[output_format]['ffmpeg'] is None or shutil.which('ffmpeg') is not None
+
+
 class VoiceGenerationService:
     """Service for generating speech using edge-tts."""
     
@@ -272,16 +311,15 @@ class VoiceGenerationService:
     
     def get_voice_shortname(self, profile=None, clone=None):
         """Determine the best Edge TTS voice based on profile or clone."""
-        # If it's a clone, allow a deterministic random voice from the available list
+        # Clones use the Edge voice nearest to their sample, matched once and cached
         if clone:
-            # Create a list of all available voices
-            available_voices = list(set(VOICE_MAP.values()))
-            available_voices.sort() # Ensure consistent order
-            
-            # Use clone ID to deterministically pick a voice
-            # This ensures the same clone always gets the same voice
-            idx = clone.id % len(available_voices)
-            return available_voices[idx]
+            if not clone.voice_shortname:
+                from .models import VoiceClone
+                from .voice_matching import match_voice
+                clone.voice_shortname = match_voice(clone)
+                if clone.pk:
+                    VoiceClone.objects.filter(pk=clone.pk).update(voice_shortname=clone.voice_shortname)
+            return clone.voice_shortname
 
         if not profile:
             return 'en-US-AriaNeural' # Default fallback
@@ -306,15 +344,50 @@ class VoiceGenerationService:
         
         return 'en-US-AriaNeural' # Ultimate fallback
 
-    def generate_speech(self, text, voice_profile=None, voice_clone=None):
+    def _estimate_duration(self, filepath, text):
+        """Read the MP3 duration, falling back to a speaking-rate estimate."""
+        duration = len(text) / (150 * 5 / 60) # Fallback estimate
+        try:
+            from mutagen.mp3 import MP3
+            audio = MP3(filepath)
+            duration = audio.info.length
+        except:
+            pass
+        return duration
+
+    def _require_audio(self, filepath):
+        """Raise if synthesis produced no audio at ``filepath``."""
+        if not os.path.exists(filepath) or not os.path.getsize(filepath):
+            raise RuntimeError('Speech synthesis produced no audio')
+
+    def _convert_output(self, filepath, output_format):
+        """
+        Transcode the edge-tts MP3 at ``filepath`` into ``output_format``.
+        Returns the storage name of the result.
+        """
+        spec = OUTPUT_FORMATS[output_format]
+        audio_path = sharded_name('generated_audio', spec['extension'])
+        target = reserve_path(audio_path)
+        try:
+            subprocess.run(
+                ['ffmpeg', '-v', 'error', '-y', '-i', filepath, *spec['ffmpeg'], target],
+                check=True,
+                capture_output=True,
+                timeout=getattr(settings, 'OUTPUT_TRANSCODE_TIMEOUT', 60),
+            )
+        finally:
+            os.remove(filepath)
+        return audio_path
+
+    def generate_speech(self, text, voice_profile=None, voice_clone=None, output_format=DEFAULT_OUTPUT_FORMAT):
         """
         Generate speech from text using edge-tts.
         """
         voice_shortname = self.get_voice_shortname(voice_profile, voice_clone)
         
-        # Generate unique filename
-        filename = f"{uuid.uuid4().hex}.mp3"
-        filepath = os.path.join(self.output_dir, filename)
+        # Generate unique sharded filename
+        audio_path = sharded_name('generated_audio', '.mp3')
+        filepath = reserve_path(audio_path)
         
         try:
             # edge-tts is async, so we need to run it in an event loop
@@ -323,34 +396,90 @@ class VoiceGenerationService:
                 await communicate.save(filepath)
             
             asyncio.run(_generate())
+            self._require_audio(filepath)
             
             # Get actual duration (optional)
-            duration = len(text) / (150 * 5 / 60) # Fallback estimate
-            try:
-                from mutagen.mp3 import MP3
-                audio = MP3(filepath)
-                duration = audio.info.length
-            except:
-                pass
+            duration = self._estimate_duration(filepath, text)
+            
+            if OUTPUT_FORMATS[output_format]['ffmpeg']:
+                audio_path = self._convert_output(filepath, output_format)
                 
         except Exception as e:
             print(f"EdgeTTS Error: {e}")
-            import traceback
-            traceback.print_exc()
-            # If fail, try to create empty file or generic error handling
-            with open(filepath, 'wb') as f:
-                f.write(b'')
-            duration = 0
+            # Never leave an empty output behind; the caller refunds the request
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            raise
             
         return {
-            'audio_path': f'generated_audio/{filename}',
+            'audio_path': audio_path,
             'duration': round(duration, 2)
         }
+
+    def generate_translated_speech(self, sentences, translate, voice_profile=None, voice_clone=None,
+                                   output_format=DEFAULT_OUTPUT_FORMAT):
+        """
+        Translate and synthesize sentence by sentence with overlap.
+
+        Each sentence is translated in a worker thread (``translate`` is a
+        blocking callable returning ``(translated_text, error)``) and handed to
+        edge-tts as soon as it is ready, while later sentences are still being
+        translated. The MP3 segments are concatenated in the original order.
+        """
+        voice_shortname = self.get_voice_shortname(voice_profile, voice_clone)
+        concurrency = max(1, getattr(settings, 'TTS_PIPELINE_CONCURRENCY', 4))
+
+        audio_path = sharded_name('generated_audio', '.mp3')
+        filepath = reserve_path(audio_path)
+
+        async def _synthesize(sentence):
+            audio = bytearray()
+            communicate = edge_tts.Communicate(sentence, voice_shortname)
+            async for chunk in communicate.stream():
+                if chunk['type'] == 'audio':
+                    audio.extend(chunk['data'])
+            return bytes(audio)
+
+        async def _pipeline():
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def _process(sentence):
+                async with semaphore:
+                    translated, error = await loop.run_in_executor(None, translate, sentence)
+                    translated = translated or sentence
+                    return translated, error, await _synthesize(translated)
+
+            return await asyncio.gather(*(_process(sentence) for sentence in sentences))
+
+        segments = asyncio.run(_pipeline())
+
+        with open(filepath, 'wb') as f:
+            for _, _, audio in segments:
+                f.write(audio)
+        try:
+            self._require_audio(filepath)
+        except RuntimeError:
+            os.remove(filepath)
+            raise
+
+        translated_text = ' '.join(translated for translated, _, _ in segments)
+        errors = [error for _, error, _ in segments if error]
+        duration = self._estimate_duration(filepath, translated_text)
+        if OUTPUT_FORMATS[output_format]['ffmpeg']:
+            audio_path = self._convert_output(filepath, output_format)
+
+        return {
+            'audio_path': audio_path,
+            'duration': round(duration, 2),
+            'translated_text': translated_text,
+            'translation_error': errors[0] if errors else None,
+        }
     
     def process_voice_clone(self, voice_clone):
-        # ... existing code ...
-        voice_clone.status = 'ready'
-        voice_clone.save()
+        """Queue a pending clone for validation, decoding, analysis and transcoding."""
+        from .clone_processing import enqueue_clone
+        enqueue_clone(voice_clone)
         return voice_clone
 
 voice_service = VoiceGenerationService()
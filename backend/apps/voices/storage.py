@@ -0,0 +1,59 @@
+"""
+Hash-prefix sharded media layout.
+
+Files are stored as ``<prefix>/ab/cd/<hash><ext>`` instead of one flat
+directory per prefix, which keeps every directory small (at most 256
+subdirectories per level) no matter how many files accumulate.
+"""
+
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import default_storage
+from django.utils.deconstruct import deconstructible
+
+HEX_NAME_RE = re.compile(r'^[0-9a-f]{32,64}$')
+SHARD_RE = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/')
+
+
+def sharded_name(prefix, extension, digest=None):
+    """Return a storage name like ``prefix/ab/cd/<digest><extension>`` (random digest by default)."""
+    digest = digest or uuid.uuid4().hex
+    return f'{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_sharded(name, prefix):
+    return name.startswith(f'{prefix}/') and bool(SHARD_RE.match(name[len(prefix) + 1:]))
+
+
+def resharded_name(name, prefix):
+    """
+    Deterministic sharded name for a legacy flat name. Hex stems (uuid4
+    filenames) are kept, other stems are hashed so reruns agree.
+    """
+    stem, extension = os.path.splitext(os.path.basename(name))
+    digest = stem if HEX_NAME_RE.match(stem) else hashlib.md5(name.encode()).hexdigest()
+    return sharded_name(prefix, extension, digest)
+
+
+def reserve_path(name):
+    """Absolute path for a storage name, with its shard directories created."""
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+@deconstructible
+class ShardedUpload:
+    """``upload_to`` callable placing uploads in a sharded layout under ``prefix``."""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+
+    def __call__(self, instance, filename):
+        return sharded_name(self.prefix, os.path.splitext(filename)[1])
+
+    def __eq__(self, other):
+        return isinstance(other, ShardedUpload) and other.prefix == self.prefix
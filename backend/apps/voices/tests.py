@@ -1,5 +1,5 @@
 from django.test import TestCase
-from .models import VoiceProfile
+from .models import VoiceProfile, VoiceClone
 
 class VoiceProfileTests(TestCase):
     def test_create_voice_profile(self):
@@ -21,3 +21,1621 @@ class VoiceProfileTests(TestCase):
         self.assertEqual(profile.language, 'en')
         self.assertEqual(profile.emotion, 'neutral')
         self.assertFalse(profile.is_premium)
+
+
+class TransliterationCacheTests(TestCase):
+    def setUp(self):
+        from . import translation
+        translation._cached_transliterate.cache_clear()
+        self.addCleanup(translation._cached_transliterate.cache_clear)
+
+    def test_recurring_names_are_memoized(self):
+        """Test that the IAST attempt and autodetect retry run once per (text, script)."""
+        from unittest import mock
+        from . import translation
+
+        engine = mock.Mock()
+        engine.process.side_effect = [ValueError('bad IAST'), 'ரமேஷ்']
+
+        with mock.patch.object(translation, '_load_aksharamukha', return_value=engine):
+            service = translation.TranslationService()
+            first = service._transliterate_with_aksharamukha('Ramesh', 'ta')
+            second = service._transliterate_with_aksharamukha('Ramesh', 'ta')
+
+        self.assertEqual(first, 'ரமேஷ்')
+        self.assertEqual(second, 'ரமேஷ்')
+        self.assertEqual(engine.process.call_count, 2)
+
+    def test_unknown_target_skips_engine(self):
+        """Test that non-Indic targets never load the transliteration engine."""
+        from unittest import mock
+        from . import translation
+
+        with mock.patch.object(translation, '_load_aksharamukha') as loader:
+            result = translation.TranslationService()._transliterate_with_aksharamukha('Ramesh', 'fr')
+
+        self.assertIsNone(result)
+        loader.assert_not_called()
+
+
+class TranslateAndGeneratePipelineTests(TestCase):
+    def test_split_sentences(self):
+        """Test sentence splitting across scripts."""
+        from .translation import split_sentences
+
+        self.assertEqual(
+            split_sentences('Hello there. How are you? नमस्ते। 你好。再见'),
+            ['Hello there.', 'How are you?', 'नमस्ते।', '你好。', '再见'],
+        )
+
+    def test_segments_are_assembled_in_order(self):
+        """Test that slower early sentences still come first in the audio."""
+        import asyncio
+        import tempfile
+        import time
+        from unittest import mock
+        from django.test import override_settings
+        from .services import VoiceGenerationService
+
+        class FakeCommunicate:
+            def __init__(self, text, voice):
+                self.text = text
+
+            async def stream(self):
+                # First sentence synthesizes slowest
+                await asyncio.sleep(0.05 if self.text.startswith('A') else 0.01)
+                yield {'type': 'audio', 'data': self.text.encode()}
+
+        def translate(sentence):
+            time.sleep(0.05)
+            return sentence.upper(), None
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root), \
+                mock.patch('apps.voices.services.edge_tts.Communicate', FakeCommunicate):
+            service = VoiceGenerationService()
+            started = time.perf_counter()
+            result = service.generate_translated_speech(['a.', 'b.', 'c.'], translate)
+            elapsed = time.perf_counter() - started
+
+            with open(f"{media_root}/{result['audio_path']}", 'rb') as f:
+                audio = f.read()
+
+        self.assertEqual(audio, b'A.B.C.')
+        self.assertEqual(result['translated_text'], 'A. B. C.')
+        self.assertIsNone(result['translation_error'])
+        # Sentences overlap instead of running serially (~0.3s)
+        self.assertLess(elapsed, 0.25)
+
+    def test_endpoint_charges_credits_once(self):
+        """Test that the fused endpoint deducts a single generation cost."""
+        from unittest import mock
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+
+        user = get_user_model().objects.create_user(email='pipe@example.com', password='pw', name='Pipe', credits=20)
+        profile = VoiceProfile.objects.create(name='Voice', gender='female', language='hi')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        fake_result = {
+            'audio_path': 'generated_audio/x.mp3',
+            'duration': 1.5,
+            'translated_text': 'नमस्ते। आप कैसे हैं?',
+            'translation_error': None,
+        }
+        with mock.patch('apps.voices.views.voice_service.generate_translated_speech', return_value=fake_result) as pipeline:
+            response = client.post('/api/voices/translate-generate/', {
+                'text': 'Hello. How are you?',
+                'target_language': 'hi',
+                'voice_profile_id': profile.id,
+            }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(pipeline.call_args.kwargs['sentences'], ['Hello.', 'How are you?'])
+        self.assertEqual(response.data['translated_text'], fake_result['translated_text'])
+        self.assertEqual(response.data['original_text'], 'Hello. How are you?')
+        user.refresh_from_db()
+        self.assertEqual(user.credits, 15)
+
+
+class MixedTranslationPlannerTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+        from . import translation
+
+        translation._cached_transliterate.cache_clear()
+        translation._prose_cache.clear()
+        self.addCleanup(translation._cached_transliterate.cache_clear)
+        self.addCleanup(translation._prose_cache.clear)
+
+        engine = mock.Mock()
+        engine.process.side_effect = lambda source, script, text: f'[{text}]'
+        patcher = mock.patch.object(translation, '_load_aksharamukha', return_value=engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = translation.TranslationService()
+        self.remote_calls = []
+
+        def fake_google(text, source, target):
+            self.remote_calls.append(text)
+            return text.upper()
+
+        self.service._translate_with_google = fake_google
+
+    def test_names_are_local_and_sentence_is_translated_whole(self):
+        """Test that names become placeholders inside a single remote request."""
+        result = self.service.translate('I love India and Tamil food. Ramesh met Priya Kumar.', 'ta')
+
+        self.assertEqual(result['method'], 'mixed')
+        self.assertEqual(self.remote_calls, ['I love ZQX0XQZ and ZQX1XQZ food. Ramesh met ZQX2XQZ.'])
+        self.assertEqual(result['translated_text'], 'I LOVE [India] AND [Tamil] FOOD. RAMESH MET [Priya Kumar].')
+
+    def test_sentence_initial_words_are_not_names(self):
+        """Test that capitalized sentence starters (verbs, nouns) are translated, not transliterated."""
+        for text in ['Call me when you arrive.', 'Dinner is ready. Bring plates.', 'Traffic was bad today.']:
+            self.remote_calls.clear()
+            result = self.service.translate(text, 'ta')
+
+            self.assertEqual(result['method'], 'google')
+            self.assertEqual(self.remote_calls, [text])
+            self.assertNotIn('[', result['translated_text'])
+
+    def test_multi_word_names_at_sentence_start_are_kept(self):
+        """Test that a sentence-initial multi-word proper noun is protected as one name."""
+        result = self.service.translate('Priya Kumar will call you.', 'ta')
+
+        self.assertEqual(self.remote_calls, ['ZQX0XQZ will call you.'])
+        self.assertEqual(result['translated_text'], '[Priya Kumar] WILL CALL YOU.')
+
+    def test_name_lists_stay_local(self):
+        """Test that inputs made only of names never call the provider."""
+        result = self.service.translate('Ramesh, Suresh', 'hi')
+
+        self.assertEqual(result['method'], 'transliteration')
+        self.assertEqual(result['translated_text'], '[Ramesh], [Suresh]')
+        self.assertEqual(self.remote_calls, [])
+
+    def test_recurring_templates_are_cached(self):
+        """Test that templated messages with different names reuse one translation."""
+        self.service.translate('Happy birthday Kavya!', 'ta')
+        result = self.service.translate('Happy birthday Arjun!', 'ta')
+
+        self.assertEqual(result['translated_text'], 'HAPPY BIRTHDAY [Arjun]!')
+        self.assertEqual(self.remote_calls, ['Happy birthday ZQX0XQZ!'])
+
+    def test_lost_placeholder_falls_back_to_whole_text(self):
+        """Test that a provider reply without every placeholder is discarded."""
+        self.service._translate_with_google = lambda text, source, target: (
+            self.remote_calls.append(text) or text.replace('ZQX0XQZ', 'Chennai').upper()
+        )
+        result = self.service.translate('We drove to Chennai.', 'ta')
+
+        self.assertEqual(result['method'], 'google')
+        self.assertEqual(self.remote_calls, ['We drove to ZQX0XQZ.', 'We drove to Chennai.'])
+
+    def test_text_without_names_is_translated_whole(self):
+        """Test that plain prose keeps a single whole-text translation."""
+        result = self.service.translate('The weather is nice today.', 'ta')
+
+        self.assertEqual(result['method'], 'google')
+        self.assertEqual(self.remote_calls, ['The weather is nice today.'])
+
+
+class LanguageDetectionTests(TestCase):
+    def test_detects_scripts_and_shared_script_languages(self):
+        """Test local detection across unique and shared scripts."""
+        from .language_detection import detect_language
+
+        samples = {
+            'வணக்கம், எப்படி இருக்கிறீர்கள்?': 'ta',
+            'こんにちは世界': 'ja',
+            '你好世界': 'zh',
+            'यह मेरा घर है और मैं यहाँ हूँ': 'hi',
+            'मी घरी आहे आणि तो शाळेत आहे': 'mr',
+            'Привіт, як справи? Це добре': 'uk',
+            'آپ کیسے ہیں؟ میں ٹھیک ہوں': 'ur',
+            'Hello, this is the best day of the year': 'en',
+            'Hola, estoy en la casa con los niños': 'es',
+        }
+        for text, language in samples.items():
+            self.assertEqual(detect_language(text), language, text)
+
+    def test_ambiguous_text_is_left_to_provider(self):
+        """Test that short Latin text is not guessed."""
+        from .language_detection import detect_language
+
+        self.assertIsNone(detect_language('Ramesh'))
+        self.assertIsNone(detect_language('12345 !!'))
+
+    def test_noop_translation_skips_provider(self):
+        """Test that text already in the target language is returned as-is."""
+        from unittest import mock
+        from .translation import TranslationService
+
+        service = TranslationService()
+        with mock.patch.object(service, '_translate_with_google') as remote:
+            result = service.translate('வணக்கம், எப்படி இருக்கிறீர்கள்?', 'ta')
+            same = service.translate('Bonjour', 'fr', source_language='fr')
+
+        remote.assert_not_called()
+        self.assertEqual(result['method'], 'noop')
+        self.assertEqual(result['detected_language'], 'ta')
+        self.assertEqual(same['translated_text'], 'Bonjour')
+
+    def test_auto_source_is_resolved_locally(self):
+        """Test that the provider receives the detected source language."""
+        from unittest import mock
+        from .translation import TranslationService
+
+        service = TranslationService()
+        with mock.patch.object(service, '_translate_with_google', return_value='Hello world') as remote:
+            result = service.translate('Hola, estoy en la casa con los niños', 'en')
+
+        remote.assert_called_once_with('Hola, estoy en la casa con los niños', 'es', 'en')
+        self.assertEqual(result['source_language'], 'es')
+        self.assertEqual(result['detected_language'], 'es')
+
+    def test_every_detected_language_is_accepted_by_provider(self):
+        """Test that each language the detector can return maps to a Google code."""
+        from .language_detection import COMMON_WORDS, DISTINCTIVE_CHARS, SCRIPT_LANGUAGE, SHARED_CHARS
+        from .translation import TranslationService
+
+        service = TranslationService()
+        languages = set(SCRIPT_LANGUAGE.values())
+        for profiles in [*DISTINCTIVE_CHARS.values(), *SHARED_CHARS.values(), *COMMON_WORDS.values()]:
+            languages |= set(profiles)
+        for language in sorted(languages):
+            self.assertTrue(service._is_provider_language(language), language)
+
+    def test_script_alone_is_not_a_detection(self):
+        """Test that shared-script text without evidence is neither skipped nor forced to the script default."""
+        from unittest import mock
+        from .translation import TranslationService
+
+        cases = [
+            # text, target, source the provider should receive
+            ('तुम्ही कसे आहात', 'hi', 'auto'),
+            ('سپاس گزارم', 'ar', 'fa'),
+            ('Здравей, приятелю', 'en', 'auto'),
+            ('Добро јутро', 'en', 'sr'),
+        ]
+        service = TranslationService()
+        for text, target, source in cases:
+            with mock.patch.object(service, '_translate_with_google', return_value='translated') as remote:
+                result = service.translate(text, target)
+
+            remote.assert_called_once_with(text, source, target)
+            self.assertEqual(result['method'], 'google', text)
+            self.assertEqual(result['translated_text'], 'translated', text)
+
+    def test_hebrew_source_uses_provider_code(self):
+        """Test that auto-detected Hebrew reaches the provider as 'iw'."""
+        from unittest import mock
+        from .translation import TimeoutGoogleTranslator, TranslationService
+
+        with mock.patch.object(TimeoutGoogleTranslator, 'translate', autospec=True,
+                               return_value='Hello world, how are you') as translate:
+            result = TranslationService().translate('שלום עולם, מה שלומך', 'en')
+
+        self.assertTrue(result['success'], result['error'])
+        self.assertEqual(result['source_language'], 'he')
+        self.assertEqual(translate.call_args.args[0]._source, 'iw')
+
+
+class TranslationResilienceTests(TestCase):
+    def test_retries_transient_errors_then_succeeds(self):
+        """Test that retryable errors are retried with backoff."""
+        from unittest import mock
+        from .resilience import CircuitBreaker, call_with_resilience
+
+        breaker = CircuitBreaker('test', failure_threshold=5)
+        func = mock.Mock(side_effect=[TimeoutError(), TimeoutError(), 'ok'])
+        sleep = mock.Mock()
+
+        result = call_with_resilience(func, breaker, (TimeoutError,), max_retries=2, sleep=sleep)
+
+        self.assertEqual(result, 'ok')
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+        self.assertEqual(breaker.metrics['retries'], 2)
+
+    def test_non_retryable_errors_are_not_retried(self):
+        """Test that request errors propagate immediately."""
+        from unittest import mock
+        from .resilience import CircuitBreaker, call_with_resilience
+
+        breaker = CircuitBreaker('test')
+        func = mock.Mock(side_effect=ValueError('bad language'))
+
+        with self.assertRaises(ValueError):
+            call_with_resilience(func, breaker, (TimeoutError,), sleep=mock.Mock())
+        self.assertEqual(func.call_count, 1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_fails_fast_and_recovers(self):
+        """Test closed -> open -> half-open -> closed transitions."""
+        from unittest import mock
+        from .resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+        now = [0.0]
+        breaker = CircuitBreaker('test', failure_threshold=2, recovery_timeout=30, clock=lambda: now[0])
+        failing = mock.Mock(side_effect=TimeoutError())
+
+        with self.assertRaises(CircuitOpenError):
+            call_with_resilience(failing, breaker, (TimeoutError,), max_retries=5, sleep=mock.Mock())
+        self.assertEqual(failing.call_count, 2)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpenError):
+            call_with_resilience(failing, breaker, (TimeoutError,), sleep=mock.Mock())
+        self.assertEqual(failing.call_count, 2)
+
+        now[0] = 31.0
+        self.assertEqual(call_with_resilience(lambda: 'ok', breaker, (TimeoutError,)), 'ok')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.snapshot()['metrics']['transitions'], {
+            'closed->open': 1,
+            'open->half_open': 1,
+            'half_open->closed': 1,
+        })
+
+    def test_open_circuit_returns_original_text(self):
+        """Test that translate() falls back to the original text while the circuit is open."""
+        from unittest import mock
+        from . import translation
+
+        with mock.patch.object(translation.google_circuit_breaker, 'before_call',
+                               side_effect=translation.CircuitOpenError()):
+            result = translation.TranslationService().translate('Good morning everyone', 'fr', 'en')
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['translated_text'], 'Good morning everyone')
+        self.assertEqual(result['error'], 'Translation provider temporarily unavailable')
+
+    def test_non_retryable_errors_are_left_out_of_the_breaker(self):
+        """Test that request errors neither close nor trip the circuit."""
+        from unittest import mock
+        from .resilience import CircuitBreaker, call_with_resilience
+
+        now = [0.0]
+        breaker = CircuitBreaker('test', failure_threshold=1, recovery_timeout=30, clock=lambda: now[0])
+        with self.assertRaises(TimeoutError):
+            call_with_resilience(mock.Mock(side_effect=TimeoutError()), breaker, (TimeoutError,),
+                                 max_retries=0)
+        now[0] = 31.0
+
+        with self.assertRaises(ValueError):
+            call_with_resilience(mock.Mock(side_effect=ValueError()), breaker, (TimeoutError,))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(breaker.metrics['successes'], 0)
+        self.assertEqual(breaker.metrics['failures'], 1)
+
+        # The trial slot was released, so the next call is let through
+        self.assertEqual(call_with_resilience(lambda: 'ok', breaker, (TimeoutError,)), 'ok')
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_retries_stop_at_the_deadline(self):
+        """Test that no retry is started whose backoff ends past the deadline."""
+        from unittest import mock
+        from .resilience import CircuitBreaker, call_with_resilience
+
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        func = mock.Mock(side_effect=TimeoutError())
+        with mock.patch('apps.voices.resilience.random.uniform', side_effect=lambda low, high: high):
+            with self.assertRaises(TimeoutError):
+                call_with_resilience(func, CircuitBreaker('test', failure_threshold=10), (TimeoutError,),
+                                     max_retries=5, backoff_base=1.0, backoff_cap=8.0, sleep=sleep,
+                                     deadline=4.0, clock=lambda: now[0])
+
+        # Backoffs of 1 and 2 fit before the deadline, the next 4 would not
+        self.assertEqual(func.call_count, 3)
+        self.assertEqual(now[0], 3.0)
+
+    def _provider_response(self, status, text=''):
+        from unittest import mock
+        return mock.Mock(status_code=status, text=text)
+
+    def test_provider_requests_carry_timeouts_capped_by_deadline(self):
+        """Test that Google requests get our timeouts, without patching deep_translator."""
+        from unittest import mock
+        import deep_translator.google
+        from django.test import override_settings
+        from . import translation
+
+        response = self._provider_response(200, '<div class="result-container">Bonjour</div>')
+        with override_settings(TRANSLATION_CONNECT_TIMEOUT=1.5, TRANSLATION_READ_TIMEOUT=4), \
+                mock.patch.object(translation.requests.Session, 'get', return_value=response) as get:
+            translator = translation.TimeoutGoogleTranslator('en', 'fr', deadline=12.0, clock=lambda: 10.0)
+            self.assertEqual(translator.translate('Hello'), 'Bonjour')
+            self.assertEqual(get.call_args.kwargs['timeout'], (1.5, 2.0))
+
+            translator = translation.TimeoutGoogleTranslator('en', 'fr', deadline=12.0, clock=lambda: 12.0)
+            with self.assertRaises(translation.requests.Timeout):
+                translator.translate('Hello')
+        self.assertIs(deep_translator.google.requests, translation.requests)
+
+    def test_client_errors_are_not_retried(self):
+        """Test that a 4xx reply fails at once while 429 and 5xx are retried."""
+        from unittest import mock
+        from . import translation
+
+        translation.google_circuit_breaker.reset()
+        self.addCleanup(translation.google_circuit_breaker.reset)
+        service = translation.TranslationService()
+        failures = translation.google_circuit_breaker.metrics['failures']
+        with mock.patch.object(translation.requests.Session, 'get',
+                               return_value=self._provider_response(400)) as get:
+            with self.assertRaises(translation.ProviderClientError):
+                service._translate_with_google('Hello', 'en', 'fr')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(translation.google_circuit_breaker.metrics['failures'], failures)
+
+        for status in (429, 503):
+            with mock.patch.object(translation.requests.Session, 'get',
+                                   return_value=self._provider_response(status)) as get, \
+                    mock.patch.object(translation.google_circuit_breaker, 'failure_threshold', 100), \
+                    mock.patch('apps.voices.resilience.time.sleep'):
+                with self.assertRaises(translation.RETRYABLE_PROVIDER_ERRORS):
+                    service._translate_with_google('Hello', 'en', 'fr')
+            self.assertGreater(get.call_count, 1)
+            translation.google_circuit_breaker.reset()
+
+
+def make_wav_bytes(seconds=4.0, rate=22050, frequency=220.0, channels=1, amplitude=0.5):
+    """Build a 16-bit PCM WAV sine tone for clone sample tests."""
+    import io
+    import wave
+    import numpy as np
+
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (amplitude * np.sin(2 * np.pi * frequency * t) * 32767).astype('<i2')
+    if channels > 1:
+        tone = np.repeat(tone, channels)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(tone.tobytes())
+    return buffer.getvalue()
+
+
+class CloneProcessingPipelineTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrider = override_settings(MEDIA_ROOT=media_root, CLONE_PROCESSING_MODE='worker')
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+        self.user = get_user_model().objects.create_user(email='clone@example.com', password='pw', name='Clone')
+
+    def make_clone(self, content, name='sample.wav'):
+        from django.core.files.base import ContentFile
+
+        return VoiceClone.objects.create(
+            user=self.user, name='My Voice', audio_sample=ContentFile(content, name=name)
+        )
+
+    def test_valid_sample_becomes_ready_with_transcoded_audio(self):
+        """Test pending -> processing -> ready with a canonical 16 kHz WAV."""
+        import wave
+        from .clone_processing import claim_next_clone, run_pipeline, TARGET_SAMPLE_RATE
+
+        clone = self.make_clone(make_wav_bytes(channels=2))
+        claimed = claim_next_clone()
+        self.assertEqual(claimed.id, clone.id)
+        self.assertEqual(claimed.status, 'processing')
+        self.assertIsNone(claim_next_clone())
+
+        run_pipeline(claimed)
+        clone.refresh_from_db()
+
+        self.assertEqual(clone.status, 'ready')
+        self.assertEqual(clone.failure_reason, '')
+        self.assertIsNotNone(clone.processed_at)
+        with wave.open(clone.processed_audio.path, 'rb') as wav:
+            self.assertEqual(wav.getframerate(), TARGET_SAMPLE_RATE)
+            self.assertEqual(wav.getnchannels(), 1)
+
+    def test_bad_samples_fail_with_reason(self):
+        """Test that undecodable and too-short samples are marked failed."""
+        from .clone_processing import process_clone
+
+        garbage = self.make_clone(b'not audio at all', name='sample.wav')
+        short = self.make_clone(make_wav_bytes(seconds=0.5))
+
+        process_clone(garbage.id)
+        process_clone(short.id)
+        garbage.refresh_from_db()
+        short.refresh_from_db()
+
+        self.assertEqual(garbage.status, 'failed')
+        self.assertIn('could not be decoded', garbage.failure_reason)
+        self.assertEqual(short.status, 'failed')
+        self.assertIn('at least', short.failure_reason)
+
+    def test_upload_returns_pending_immediately(self):
+        """Test that the create endpoint does not process inline."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from rest_framework.test import APIClient
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/voices/clones/', {
+                'name': 'Upload',
+                'language': 'en',
+                'audio_sample': SimpleUploadedFile('voice.wav', make_wav_bytes(), content_type='audio/wav'),
+            }, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        clone = VoiceClone.objects.get(name='Upload')
+        self.assertEqual(clone.status, 'pending')
+        # Decoding, analysis and transcoding are left to the queue
+        self.assertIsNone(clone.duration_seconds)
+        self.assertFalse(clone.processed_audio)
+
+    def test_audio_analysis_features(self):
+        """Test vectorized loudness, clipping, silence and pitch estimates."""
+        import numpy as np
+        from .clone_processing import analyze_audio
+
+        rate = 16000
+        t = np.arange(rate * 2) / rate
+        tone = 0.5 * np.sin(2 * np.pi * 220 * t)
+        features = analyze_audio(np.concatenate([tone, np.zeros(rate * 2)]), rate)
+
+        self.assertAlmostEqual(features['duration_seconds'], 4.0)
+        self.assertAlmostEqual(features['pitch_hz'], 220, delta=5)
+        self.assertAlmostEqual(features['silence_ratio'], 0.5, delta=0.02)
+        self.assertEqual(features['clipping_ratio'], 0.0)
+        # 0.5 amplitude sine over half the sample: 20*log10(0.5/sqrt(2)/sqrt(2)) = -12 dBFS
+        self.assertAlmostEqual(features['rms_dbfs'], -12.04, delta=0.1)
+
+        clipped = analyze_audio(np.clip(3 * tone, -1, 1), rate)
+        self.assertGreater(clipped['clipping_ratio'], 0.5)
+
+    def test_analysis_is_rate_independent_and_chunked(self):
+        """Test that WAVs are analyzed at 16 kHz whatever their rate, in bounded frame batches."""
+        from unittest import mock
+        import numpy as np
+        from . import clone_processing
+        from .clone_processing import TARGET_SAMPLE_RATE, analyze_audio, resample
+
+        features = {}
+        for rate in (16000, 48000):
+            t = np.arange(rate * 3) / rate
+            tone = 0.5 * np.sin(2 * np.pi * 220 * t) + 0.1 * np.sin(2 * np.pi * 1500 * t)
+            samples = resample(tone, rate)
+            self.assertEqual(len(samples), 3 * TARGET_SAMPLE_RATE)
+            features[rate] = analyze_audio(samples, TARGET_SAMPLE_RATE)
+        self.assertAlmostEqual(features[48000]['pitch_hz'], features[16000]['pitch_hz'], delta=2)
+        self.assertAlmostEqual(
+            features[48000]['spectral_centroid_hz'], features[16000]['spectral_centroid_hz'], delta=25
+        )
+
+        with mock.patch.object(clone_processing, 'ANALYSIS_CHUNK_FRAMES', 7):
+            chunked = analyze_audio(samples, TARGET_SAMPLE_RATE)
+        for field, value in features[48000].items():
+            self.assertAlmostEqual(chunked[field], value, places=4)
+
+    def test_header_checks_reject_at_upload_and_analysis_fails_in_queue(self):
+        """Test that bad headers or durations get a 400 while clipped or silent audio fails when processed."""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from rest_framework.test import APIClient
+        from .clone_processing import process_clone
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        def upload(name, content):
+            return client.post('/api/voices/clones/', {
+                'name': name,
+                'language': 'en',
+                'audio_sample': SimpleUploadedFile('voice.wav', content, content_type='audio/wav'),
+            }, format='multipart')
+
+        for name, content in [('short', make_wav_bytes(seconds=0.5)), ('garbage', b'RIFF not a wave file')]:
+            response = upload(name, content)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('audio_sample', response.data)
+        self.assertFalse(VoiceClone.objects.filter(user=self.user).exists())
+
+        for name, content in [('clipped', make_wav_bytes(amplitude=3.0)), ('silent', make_wav_bytes(amplitude=0))]:
+            self.assertEqual(upload(name, content).status_code, 201)
+            clone = process_clone(VoiceClone.objects.get(name=name).id)
+            self.assertEqual(clone.status, 'failed')
+
+    def test_stale_processing_clones_are_requeued(self):
+        """Test that clones abandoned by a crashed worker go back to pending."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .clone_processing import requeue_stale_clones
+
+        clone = self.make_clone(make_wav_bytes())
+        VoiceClone.objects.filter(id=clone.id).update(
+            status='processing', processing_started_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(requeue_stale_clones(600), 1)
+        clone.refresh_from_db()
+        self.assertEqual(clone.status, 'pending')
+
+    def test_thread_mode_recovers_orphaned_clones(self):
+        """Test that a web process resubmits pending and stale clones left by a restarted process."""
+        from datetime import timedelta
+        from unittest import mock
+        from django.utils import timezone
+        from . import clone_processing
+
+        pending = self.make_clone(make_wav_bytes())
+        stale = self.make_clone(make_wav_bytes())
+        busy = self.make_clone(make_wav_bytes())
+        VoiceClone.objects.filter(id=stale.id).update(
+            status='processing', processing_started_at=timezone.now() - timedelta(hours=1)
+        )
+        VoiceClone.objects.filter(id=busy.id).update(status='processing', processing_started_at=timezone.now())
+
+        executor = mock.Mock()
+        with mock.patch.object(clone_processing, '_get_executor', return_value=executor), \
+                mock.patch.object(clone_processing, '_submitted', set()):
+            self.assertEqual(clone_processing.recover_clones(), (1, 2))
+            # Clones still queued in this process are not submitted twice
+            self.assertEqual(clone_processing.recover_clones(), (0, 0))
+
+        submitted = {call.args[1] for call in executor.submit.call_args_list}
+        self.assertEqual(submitted, {pending.id, stale.id})
+
+
+class ResumableCloneUploadTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrider = override_settings(
+            MEDIA_ROOT=media_root, CLONE_PROCESSING_MODE='worker', CLONE_SAMPLE_MAX_SECONDS=10
+        )
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+        self.user = get_user_model().objects.create_user(email='upload@example.com', password='pw', name='Up')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start(self, content, **extra):
+        response = self.client.post('/api/voices/clones/uploads/', {
+            'name': 'Chunked', 'language': 'en', 'filename': 'voice.wav', 'total_size': len(content), **extra,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"/api/voices/clones/uploads/{response.data['id']}/"
+
+    def send(self, url, chunk, offset):
+        return self.client.generic(
+            'PATCH', url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunked_upload_resumes_and_creates_clone(self):
+        """Test uploading in chunks, resuming from the reported offset, and hashing incrementally."""
+        import hashlib
+        from . import uploads
+
+        content = make_wav_bytes(seconds=4)
+        url = self.start(content, checksum=hashlib.sha256(content).hexdigest())
+
+        self.assertEqual(self.send(url, content[:50000], 0).status_code, 200)
+        # Simulate a resume on another worker: in-process hash state is gone
+        uploads._hashers.clear()
+        self.assertEqual(self.send(url, content[50000:60000], 0).status_code, 409)
+        offset = int(self.client.head(url)['Upload-Offset'])
+        self.assertEqual(offset, 50000)
+
+        response = self.send(url, content[offset:], offset)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'complete')
+
+        clone = VoiceClone.objects.get(id=response.data['voice_clone'])
+        self.assertEqual(clone.status, 'pending')
+        self.assertEqual(clone.sample_sha256, hashlib.sha256(content).hexdigest())
+        with open(clone.audio_sample.path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_chunks_beyond_declared_size_are_rejected(self):
+        """Test that the size cap is enforced while streaming."""
+        content = make_wav_bytes(seconds=4)
+        url = self.start(content)
+
+        response = self.send(url, content + b'extra', 0)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(int(self.client.head(url)['Upload-Offset']), 0)
+
+    def test_wav_duration_cap_is_enforced_from_header(self):
+        """Test that over-long WAVs are rejected once the header arrives."""
+        content = make_wav_bytes(seconds=12, rate=8000)
+        url = self.start(content)
+
+        response = self.send(url, content[:8192], 0)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('at most', response.data['error'])
+
+    def test_checksum_mismatch_aborts_upload(self):
+        """Test that a corrupted upload never becomes a clone."""
+        content = make_wav_bytes(seconds=4)
+        url = self.start(content, checksum='0' * 64)
+
+        response = self.send(url, content, 0)
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.client.get(url).data['status'], 'aborted')
+        self.assertFalse(VoiceClone.objects.filter(user=self.user).exists())
+
+    def test_chunk_in_progress_blocks_other_writers(self):
+        """Test that the offset is claimed without a lock and a stale claim is taken over."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import CloneUpload
+
+        content = make_wav_bytes(seconds=4)
+        url = self.start(content)
+        upload_id = url.rstrip('/').rsplit('/', 1)[1]
+        CloneUpload.objects.filter(id=upload_id).update(status='receiving', claim_token='other')
+
+        response = self.send(url, content[:1000], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('Another chunk', response.data['error'])
+
+        CloneUpload.objects.filter(id=upload_id).update(updated_at=timezone.now() - timedelta(hours=1))
+        response = self.send(url, content[:1000], 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'uploading')
+        self.assertEqual(response.data['received_bytes'], 1000)
+
+    def test_taken_over_writer_never_publishes(self):
+        """Test that a writer whose stale claim was taken over leaves the committed bytes alone."""
+        import io
+        import os
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import uploads
+        from .models import CloneUpload
+
+        content = make_wav_bytes(seconds=4)
+        url = self.start(content)
+        upload_id = url.rstrip('/').rsplit('/', 1)[1]
+
+        class StalledStream:
+            """Stalls past the chunk timeout, during which another writer takes over."""
+
+            def __init__(self, test):
+                self.test = test
+                self.calls = 0
+
+            def read(self, size):
+                self.calls += 1
+                if self.calls > 1:
+                    return b''
+                CloneUpload.objects.filter(id=upload_id).update(updated_at=timezone.now() - timedelta(hours=1))
+                upload = uploads.append_chunk(upload_id, self.test.user, 0, io.BytesIO(content[:1000]))
+                self.test.assertEqual(upload.received_bytes, 1000)
+                return b'\0' * 500
+
+        with self.assertRaises(uploads.UploadError) as raised:
+            uploads.append_chunk(upload_id, self.user, 0, StalledStream(self))
+        self.assertEqual(raised.exception.status_code, 409)
+
+        upload = CloneUpload.objects.get(id=upload_id)
+        self.assertEqual((upload.status, upload.received_bytes), ('uploading', 1000))
+        directory = uploads.part_path(upload)
+        self.assertEqual(os.listdir(directory), ['000000000000.seg'])
+        self.assertEqual(b''.join(uploads._read_committed(directory, 1000)), content[:1000])
+
+        response = self.send(url, content[1000:], 1000)
+        self.assertEqual(response.status_code, 201)
+        with open(VoiceClone.objects.get(id=response.data['voice_clone']).audio_sample.path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(os.path.exists(directory))
+
+    def test_hash_state_of_abandoned_uploads_is_bounded(self):
+        """Test that aborted uploads drop their hash state and the rest is evicted oldest first."""
+        from unittest import mock
+        from . import uploads
+
+        content = make_wav_bytes(seconds=4)
+        urls = [self.start(content) for _ in range(3)]
+        ids = [url.rstrip('/').rsplit('/', 1)[1] for url in urls]
+        with mock.patch.object(uploads, 'HASHER_CACHE_SIZE', 2):
+            for url in urls:
+                self.assertEqual(self.send(url, content[:1000], 0).status_code, 200)
+        self.assertEqual([str(upload_id) for upload_id in uploads._hashers], ids[1:])
+
+        self.assertEqual(self.client.delete(urls[2]).status_code, 204)
+        self.assertEqual([str(upload_id) for upload_id in uploads._hashers], ids[1:2])
+
+    def test_stale_uploads_and_part_files_expire(self):
+        """Test that the sweep aborts idle uploads and deletes their part files only."""
+        import os
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import CloneUpload
+        from .uploads import part_path
+
+        content = make_wav_bytes(seconds=4)
+        stale_url = self.start(content)
+        fresh_url = self.start(content)
+        self.send(stale_url, content[:1000], 0)
+        stale = CloneUpload.objects.get(id=stale_url.rstrip('/').rsplit('/', 1)[1])
+        fresh = CloneUpload.objects.get(id=fresh_url.rstrip('/').rsplit('/', 1)[1])
+        old = timezone.now() - timedelta(hours=48)
+        CloneUpload.objects.filter(id=stale.id).update(updated_at=old)
+        os.utime(part_path(stale), (old.timestamp(), old.timestamp()))
+        orphan = os.path.join(os.path.dirname(part_path(stale)), 'orphan.part')
+        open(orphan, 'wb').close()
+        os.utime(orphan, (old.timestamp(), old.timestamp()))
+
+        call_command('collect_media_garbage', stdout=open(os.devnull, 'w'))
+
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(stale.status, 'aborted')
+        self.assertEqual(fresh.status, 'uploading')
+        self.assertFalse(os.path.exists(part_path(stale)))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(part_path(fresh)))
+
+
+class CloneVoiceMatchingTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from .voice_matching import reset_index
+
+        reset_index()
+        self.addCleanup(reset_index)
+        self.user = get_user_model().objects.create_user(email='match@example.com', password='pw', name='Match')
+
+    def make_clone(self, language, pitch_hz, centroid_hz=None):
+        return VoiceClone.objects.create(
+            user=self.user, name='Clone', language=language, audio_sample='clone_samples/x.wav',
+            pitch_hz=pitch_hz, spectral_centroid_hz=centroid_hz,
+        )
+
+    def test_nearest_voice_respects_pitch_and_language(self):
+        """Test that low voices get male voices and high voices female ones, in the clone's language."""
+        from .services import VOICE_MAP
+        from .voice_matching import match_voice
+
+        genders = {shortname: gender for (gender, _, _), shortname in VOICE_MAP.items()}
+        for language in ('en', 'de', 'hi'):
+            low = match_voice(self.make_clone(language, 110))
+            high = match_voice(self.make_clone(language, 230))
+
+            self.assertTrue(low.startswith(f'{language}-'))
+            self.assertTrue(high.startswith(f'{language}-'))
+            self.assertEqual(genders[low], 'male')
+            self.assertEqual(genders[high], 'female')
+
+    def test_every_language_choice_has_a_voice(self):
+        """Test that clones in any selectable language match a voice of that language."""
+        from .voice_matching import match_voice, voice_catalog
+
+        languages = {language for _, language, _ in voice_catalog()}
+        for language, _ in VoiceProfile.LANGUAGE_CHOICES:
+            self.assertIn(language, languages)
+        self.assertTrue(match_voice(self.make_clone('no', 110)).startswith('nb-NO-'))
+
+    def test_reference_features_override_defaults(self):
+        """Test that analyzed reference renders steer the match."""
+        from .models import ReferenceVoice
+        from .voice_matching import match_voice
+
+        ReferenceVoice.objects.create(shortname='en-US-GuyNeural', language='en', gender='male',
+                                      pitch_hz=95, spectral_centroid_hz=900)
+        ReferenceVoice.objects.create(shortname='en-US-ChristopherNeural', language='en', gender='male',
+                                      pitch_hz=150, spectral_centroid_hz=2500)
+
+        self.assertEqual(match_voice(self.make_clone('en', 96, 950)), 'en-US-GuyNeural')
+
+    def test_shortname_is_cached_on_clone(self):
+        """Test that the match is stored and reused on later generations."""
+        from unittest.mock import patch
+        from .services import voice_service
+
+        clone = self.make_clone('fr', 120)
+        shortname = voice_service.get_voice_shortname(clone=clone)
+        clone.refresh_from_db()
+        self.assertEqual(clone.voice_shortname, shortname)
+
+        with patch('apps.voices.voice_matching.match_voice') as match:
+            self.assertEqual(voice_service.get_voice_shortname(clone=clone), shortname)
+        match.assert_not_called()
+
+
+class ShardedMediaTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrider = override_settings(MEDIA_ROOT=self.media_root)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+        self.user = get_user_model().objects.create_user(email='shard@example.com', password='pw', name='Shard')
+
+    def test_uploads_use_sharded_names(self):
+        """Test that FileFields store new files under <prefix>/ab/cd/<hash>."""
+        from django.core.files.base import ContentFile
+        from .storage import is_sharded
+
+        clone = VoiceClone.objects.create(
+            user=self.user, name='Clone', audio_sample=ContentFile(b'data', name='My Voice.wav')
+        )
+
+        self.assertTrue(is_sharded(clone.audio_sample.name, 'clone_samples'))
+        self.assertTrue(clone.audio_sample.name.endswith('.wav'))
+
+    def test_shard_media_relocates_files_and_is_resumable(self):
+        """Test that legacy flat files are moved and paths rewritten in bulk, idempotently."""
+        import os
+        from django.core.management import call_command
+        from .models import GeneratedSpeech
+
+        names = []
+        for i in range(3):
+            name = f'generated_audio/{i:032x}.mp3'
+            os.makedirs(os.path.join(self.media_root, 'generated_audio'), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(b'mp3')
+            names.append(name)
+        speeches = [GeneratedSpeech.objects.create(user=self.user, input_text='hi', audio_file=name) for name in names]
+
+        # A previous run moved the first file but crashed before its UPDATE
+        first_target = f'generated_audio/00/00/{0:032x}.mp3'
+        os.makedirs(os.path.join(self.media_root, 'generated_audio/00/00'))
+        os.replace(os.path.join(self.media_root, names[0]), os.path.join(self.media_root, first_target))
+
+        call_command('shard_media', batch_size=2, stdout=open(os.devnull, 'w'))
+        call_command('shard_media', batch_size=2, stdout=open(os.devnull, 'w'))
+
+        for speech in speeches:
+            speech.refresh_from_db()
+            self.assertRegex(speech.audio_file.name, r'^generated_audio/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{32}\.mp3$')
+            with open(speech.audio_file.path, 'rb') as f:
+                self.assertEqual(f.read(), b'mp3')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'generated_audio')), ['00'])
+
+
+class MediaGarbageCollectionTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrider = override_settings(MEDIA_ROOT=self.media_root)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+        self.user = get_user_model().objects.create_user(email='gc@example.com', password='pw', name='GC')
+
+    def write(self, name, content=b'mp3', age_hours=48):
+        import os
+        import time
+
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        stamp = time.time() - age_hours * 3600
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_sweep_deletes_only_old_unreferenced_files(self):
+        """Test mark-and-sweep with the grace period, zero-byte leftovers and excluded dirs."""
+        import os
+        from django.core.management import call_command
+        from .models import CloneUpload, GeneratedSpeech
+
+        kept = self.write('generated_audio/aa/bb/kept.mp3')
+        GeneratedSpeech.objects.create(user=self.user, input_text='hi', audio_file='generated_audio/aa/bb/kept.mp3')
+        orphan = self.write('generated_audio/aa/cc/orphan.mp3')
+        empty = self.write('generated_audio/ab/cd/failed.mp3', content=b'')
+        recent = self.write('generated_audio/ab/cd/recent.mp3', age_hours=1)
+        upload = CloneUpload.objects.create(user=self.user, name='Up', filename='a.wav', total_size=10)
+        part = self.write(f'clone_uploads/{upload.id}.part')
+
+        call_command('collect_media_garbage', batch_size=2, stdout=open(os.devnull, 'w'))
+
+        self.assertTrue(os.path.exists(kept))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(part))
+        self.assertFalse(os.path.exists(orphan))
+        self.assertFalse(os.path.exists(empty))
+
+    def test_empty_referenced_audio_is_cleared(self):
+        """Test that zero-byte audio of old failed generations is deleted and unreferenced."""
+        import os
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.utils import timezone
+        from .models import GeneratedSpeech
+
+        old_empty = self.write('generated_audio/ee/01/old.mp3', content=b'')
+        recent_empty = self.write('generated_audio/ee/02/recent.mp3', content=b'', age_hours=1)
+        failed = GeneratedSpeech.objects.create(
+            user=self.user, input_text='x', audio_file='generated_audio/ee/01/old.mp3', duration_seconds=0
+        )
+        GeneratedSpeech.objects.filter(pk=failed.pk).update(created_at=timezone.now() - timedelta(hours=48))
+        pending = GeneratedSpeech.objects.create(
+            user=self.user, input_text='x', audio_file='generated_audio/ee/02/recent.mp3', duration_seconds=0
+        )
+
+        call_command('collect_media_garbage', stdout=open(os.devnull, 'w'))
+
+        failed.refresh_from_db()
+        pending.refresh_from_db()
+        self.assertEqual(failed.audio_file.name, '')
+        self.assertFalse(os.path.exists(old_empty))
+        self.assertEqual(pending.audio_file.name, 'generated_audio/ee/02/recent.mp3')
+        self.assertTrue(os.path.exists(recent_empty))
+
+    def test_failed_synthesis_saves_no_empty_audio(self):
+        """Test that a failed synthesis is refunded and leaves neither a row nor a file."""
+        import os
+        from unittest import mock
+        from rest_framework.test import APIClient
+        from .models import GeneratedSpeech
+
+        class FailingCommunicate:
+            def __init__(self, text, voice):
+                pass
+
+            async def save(self, path):
+                open(path, 'wb').close()
+                raise ConnectionError('edge-tts unavailable')
+
+        profile = VoiceProfile.objects.create(name='Guy', gender='male', emotion='neutral', language='en')
+        self.user.credits = 20
+        self.user.save(update_fields=['credits'])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch('apps.voices.services.edge_tts.Communicate', FailingCommunicate):
+            response = client.post('/api/voices/generate/', {'text': 'Hello', 'voice_profile_id': profile.id},
+                                   format='json')
+
+        self.assertEqual(response.status_code, 500)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.credits, 20)
+        self.assertFalse(GeneratedSpeech.objects.exists())
+        leftovers = [files for _, _, files in os.walk(self.media_root) if files]
+        self.assertEqual(leftovers, [])
+
+    def test_retention_expires_by_tier(self):
+        """Test that retention only expires rows of tiers with a configured limit."""
+        from datetime import timedelta
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from apps.payments.models import Transaction
+        from .media_gc import expire_generated_speech
+        from .models import GeneratedSpeech
+
+        paid = get_user_model().objects.create_user(email='paid@example.com', password='pw', name='Paid')
+        Transaction.objects.create(user=paid, amount=10, credits=100, transaction_id='UTR1', status='approved')
+        old = timezone.now() - timedelta(days=40)
+        for user in (self.user, paid):
+            speech = GeneratedSpeech.objects.create(user=user, input_text='old', audio_file='generated_audio/x.mp3')
+            GeneratedSpeech.objects.filter(pk=speech.pk).update(created_at=old)
+            GeneratedSpeech.objects.create(user=user, input_text='new', audio_file='generated_audio/y.mp3')
+
+        deleted = expire_generated_speech({'free': 30})
+
+        self.assertEqual(deleted, {'free': 1})
+        self.assertEqual(GeneratedSpeech.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(GeneratedSpeech.objects.filter(user=paid).count(), 2)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        import os
+        import shutil
+        import tempfile
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .models import GeneratedSpeech
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrider = override_settings(MEDIA_ROOT=media_root, MEDIA_ACCEL_MODE='')
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+        self.content = bytes(range(256)) * 40
+        os.makedirs(os.path.join(media_root, 'generated_audio/ab/cd'))
+        with open(os.path.join(media_root, 'generated_audio/ab/cd/file.mp3'), 'wb') as f:
+            f.write(self.content)
+
+        User = get_user_model()
+        self.user = User.objects.create_user(email='media@example.com', password='pw', name='Media')
+        self.speech = GeneratedSpeech.objects.create(
+            user=self.user, input_text='hi', audio_file='generated_audio/ab/cd/file.mp3'
+        )
+        self.url = f'/api/voices/history/{self.speech.pk}/audio/'
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_and_range_responses(self):
+        """Test whole-file, open-ended and bounded byte ranges."""
+        response = self.client.get(self.url, HTTP_ACCEPT='audio/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10000-{len(self.content) - 1}/{len(self.content)}')
+        self.assertEqual(self.body(response), self.content[10000:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), self.content[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=99999-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_conditional_requests(self):
+        """Test ETag and Last-Modified revalidation."""
+        first = self.client.get(self.url)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_accel_redirect_and_access_checks(self):
+        """Test proxy offload headers and that other users get 404."""
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+
+        with override_settings(MEDIA_ACCEL_MODE='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/generated_audio/ab/cd/file.mp3')
+        self.assertEqual(response.content, b'')
+
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(email='o@example.com', password='pw', name='O'))
+        self.assertEqual(other.get(self.url).status_code, 404)
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+
+    def test_signed_urls_play_without_auth_header(self):
+        """Test that audio_url works for header-less players until it expires or is reused elsewhere."""
+        import time
+        from unittest import mock
+        from rest_framework.test import APIClient
+        from .models import GeneratedSpeech
+        from .serializers import GeneratedSpeechSerializer
+
+        audio_url = GeneratedSpeechSerializer(self.speech).data['audio_url']
+        other = GeneratedSpeech.objects.create(user=self.user, input_text='x', audio_file='generated_audio/ab/cd/file.mp3')
+        token = audio_url.split('token=')[1]
+        player = APIClient()
+
+        response = player.get(audio_url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual((response.status_code, self.body(response)), (206, self.content[:10]))
+        self.assertEqual(player.get(f'/api/voices/history/{other.pk}/audio/?token={token}').status_code, 403)
+        self.assertEqual(player.get(f'{self.url}?token=forged').status_code, 403)
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 3601):
+            self.assertEqual(player.get(audio_url).status_code, 403)
+
+
+class OutputFormatTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+
+        self.user = get_user_model().objects.create_user(email='fmt@example.com', password='pw', name='Fmt', credits=20)
+        self.profile = VoiceProfile.objects.create(name='Voice', gender='female', language='en')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generate(self, **extra):
+        return self.client.post('/api/voices/generate/', {
+            'text': 'Hello', 'voice_profile_id': self.profile.id, **extra,
+        }, format='json')
+
+    def test_format_is_passed_through_and_stored(self):
+        """Test that the requested format reaches the service and is stored on the record."""
+        from unittest import mock
+
+        result = {'audio_path': 'generated_audio/ab/cd/x.webm', 'duration': 1.0}
+        with mock.patch('apps.voices.serializers.output_format_available', return_value=True), \
+                mock.patch('apps.voices.views.voice_service.generate_speech', return_value=result) as generate:
+            response = self.generate(output_format='webm-24khz-16bit-24kbps-mono-opus')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(generate.call_args.kwargs['output_format'], 'webm-24khz-16bit-24kbps-mono-opus')
+        self.assertEqual(response.data['output_format'], 'webm-24khz-16bit-24kbps-mono-opus')
+
+        with mock.patch('apps.voices.views.voice_service.generate_speech', return_value=result):
+            self.assertEqual(self.generate().data['output_format'], 'audio-24khz-48kbitrate-mono-mp3')
+
+    def test_transcoded_formats_require_ffmpeg(self):
+        """Test that formats needing ffmpeg are rejected when it is missing."""
+        from unittest import mock
+
+        with mock.patch('apps.voices.services.shutil.which', return_value=None):
+            response = self.generate(output_format='raw-8khz-16bit-mono-pcm')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('output_format', response.data)
+            self.assertEqual(self.generate(output_format='unknown').status_code, 400)
+
+    def test_conversion_uses_ffmpeg_and_removes_mp3(self):
+        """Test the ffmpeg invocation for a transcoded format."""
+        import os
+        import shutil
+        import tempfile
+        from unittest import mock
+        from django.test import override_settings
+        from .services import voice_service
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        source = os.path.join(media_root, 'speech.mp3')
+        open(source, 'wb').close()
+
+        with override_settings(MEDIA_ROOT=media_root), mock.patch('apps.voices.services.subprocess.run') as run:
+            audio_path = voice_service._convert_output(source, 'raw-16khz-16bit-mono-pcm')
+
+        command = run.call_args.args[0]
+        self.assertEqual(command[:5], ['ffmpeg', '-v', 'error', '-y', '-i'])
+        self.assertIn('s16le', command)
+        self.assertTrue(command[-1].endswith(audio_path))
+        self.assertTrue(audio_path.startswith('generated_audio/') and audio_path.endswith('.pcm'))
+        self.assertFalse(os.path.exists(source))
+
+
+class WaveformPeaksTests(TestCase):
+    def test_compute_peaks(self):
+        """Test min/max reduction into int8 buckets."""
+        import numpy as np
+        from .waveform import compute_peaks, decode_peaks
+
+        samples = np.concatenate([np.full(500, 0.5), np.full(500, -1.0)])
+        peaks = decode_peaks(compute_peaks(samples, buckets=4))
+
+        self.assertEqual(peaks.shape, (4, 2))
+        self.assertEqual(peaks[0].tolist(), [64, 64])
+        self.assertEqual(peaks[3].tolist(), [-127, -127])
+        self.assertEqual(len(compute_peaks(np.zeros(10))), 20)
+
+    def test_backfill_and_history_listing(self):
+        """Test the parallel backfill and that history exposes peaks without audio."""
+        import base64
+        import os
+        import shutil
+        import tempfile
+        import numpy as np
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .models import GeneratedSpeech
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        user = get_user_model().objects.create_user(email='wave@example.com', password='pw', name='Wave')
+        os.makedirs(os.path.join(media_root, 'generated_audio'))
+        tone = (0.5 * np.sin(np.linspace(0, 200 * np.pi, 16000)) * 32767).astype('<i2')
+        for i in range(3):
+            name = f'generated_audio/{i}.pcm'
+            tone.tofile(os.path.join(media_root, name))
+            GeneratedSpeech.objects.create(
+                user=user, input_text='hi', audio_file=name, output_format='raw-16khz-16bit-mono-pcm'
+            )
+        GeneratedSpeech.objects.create(user=user, input_text='missing', audio_file='generated_audio/none.mp3')
+
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command('backfill_waveforms', workers=2, batch_size=2, stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(GeneratedSpeech.objects.filter(waveform_peaks__isnull=False).count(), 3)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        results = client.get('/api/voices/history/').data['results']
+        waveforms = [item['waveform'] for item in results if item['waveform']]
+        self.assertEqual(len(waveforms), 3)
+        peaks = np.frombuffer(base64.b64decode(waveforms[0]), dtype=np.int8).reshape(-1, 2)
+        self.assertEqual(peaks.shape, (1000, 2))
+        self.assertAlmostEqual(int(peaks[:, 1].max()), 64, delta=1)
+
+    def test_peaks_are_computed_after_commit_and_failures_marked(self):
+        """Test that generation schedules peaks after commit and undecodable audio is never retried."""
+        import os
+        import shutil
+        import tempfile
+        from unittest import mock
+        import numpy as np
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from rest_framework.test import APIClient
+        from .models import GeneratedSpeech
+        from .services import voice_service
+        from . import waveform
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        user = get_user_model().objects.create_user(email='async@example.com', password='pw', name='Async', credits=20)
+        profile = VoiceProfile.objects.create(name='Guy', gender='male', emotion='neutral', language='en')
+        os.makedirs(os.path.join(media_root, 'generated_audio'))
+        np.zeros(1600, dtype='<i2').tofile(os.path.join(media_root, 'generated_audio/a.pcm'))
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with override_settings(MEDIA_ROOT=media_root, WAVEFORM_ASYNC=False):
+            for audio_path in ('generated_audio/a.pcm', 'generated_audio/missing.pcm'):
+                result = {'audio_path': audio_path, 'duration': 0.1}
+                with mock.patch.object(voice_service, 'generate_speech', return_value=result), \
+                        mock.patch('apps.voices.services.shutil.which', return_value='/usr/bin/ffmpeg'), \
+                        self.captureOnCommitCallbacks(execute=True):
+                    response = client.post('/api/voices/generate/', {
+                        'text': 'Hello', 'voice_profile_id': profile.id, 'output_format': 'raw-16khz-16bit-mono-pcm',
+                    }, format='json')
+                self.assertEqual(response.status_code, 201)
+                # Nothing is decoded inside the request
+                self.assertIsNone(response.data['waveform'])
+
+            with mock.patch.object(waveform, 'peaks_for_file') as peaks_for_file:
+                results = client.get('/api/voices/history/').data['results']
+            peaks_for_file.assert_not_called()
+
+        decoded = GeneratedSpeech.objects.get(audio_file='generated_audio/a.pcm')
+        failed = GeneratedSpeech.objects.get(audio_file='generated_audio/missing.pcm')
+        self.assertEqual(len(bytes(decoded.waveform_peaks)), 2000)
+        self.assertEqual(bytes(failed.waveform_peaks), b'')
+        self.assertEqual(sorted(item['waveform'] is None for item in results), [False, True])
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrider = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANTS_ASYNC=False)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+    def make_image(self, size=(2400, 1600), image_format='PNG', mode='RGBA'):
+        import io
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 255) if mode == 'RGBA' else (200, 30, 30)).save(buffer, image_format)
+        extension = '.png' if image_format == 'PNG' else '.jpg'
+        return SimpleUploadedFile(f'shot{extension}', buffer.getvalue())
+
+    def test_variants_render_after_upload_and_are_idempotent(self):
+        """Test thumbnail/medium/WebP rendering on upload and skipping fresh variants."""
+        import os
+        from PIL import Image
+        from django.contrib.auth import get_user_model
+        from apps.payments.models import Transaction
+        from .image_variants import generate_variants, variant_name
+
+        user = get_user_model().objects.create_user(email='img@example.com', password='pw', name='Img')
+        with self.captureOnCommitCallbacks(execute=True):
+            transaction = Transaction.objects.create(
+                user=user, amount=10, credits=10, transaction_id='UTR-IMG',
+                screenshot=self.make_image(image_format='JPEG', mode='RGB'),
+            )
+
+        name = transaction.screenshot.name
+        with Image.open(os.path.join(self.media_root, variant_name(name, 'thumbnail'))) as thumbnail:
+            self.assertEqual(thumbnail.size, (200, 133))
+            self.assertEqual(thumbnail.format, 'JPEG')
+        with Image.open(os.path.join(self.media_root, variant_name(name, 'webp'))) as webp:
+            self.assertEqual(webp.size, (800, 533))
+            self.assertEqual(webp.format, 'WEBP')
+        self.assertEqual(generate_variants(name), [])
+
+    def test_serializer_exposes_variant_urls_lazily(self):
+        """Test that missing variants fall back to the original and get rendered."""
+        from .models import VoiceProfile
+        from .serializers import VoiceProfileSerializer
+
+        profile = VoiceProfile(name='Voice', gender='female', language='en')
+        profile.preview_image.save('preview.png', self.make_image(), save=False)
+        VoiceProfile.objects.bulk_create([profile])  # bypasses post_save
+        profile = VoiceProfile.objects.get(name='Voice')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first = VoiceProfileSerializer(profile).data['preview_image_variants']
+        self.assertEqual(first['thumbnail'], profile.preview_image.url)
+
+        second = VoiceProfileSerializer(profile).data['preview_image_variants']
+        self.assertTrue(second['thumbnail'].endswith('/thumbnail.png'))
+        self.assertTrue(second['webp'].endswith('/webp.webp'))
+
+    def test_garbage_collector_keeps_variants_of_referenced_images(self):
+        """Test that variants follow their source's lifetime."""
+        import os
+        import time
+        from .image_variants import variant_name
+        from .media_gc import referenced_keys, sweep
+        from .models import VoiceProfile
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = VoiceProfile.objects.create(
+                name='Voice', gender='female', language='en', preview_image=self.make_image()
+            )
+        kept = os.path.join(self.media_root, variant_name(profile.preview_image.name, 'medium'))
+        orphan = os.path.join(self.media_root, variant_name('voice_previews/aa/bb/gone.png', 'medium'))
+        os.makedirs(os.path.dirname(orphan))
+        open(orphan, 'wb').close()
+
+        sweep(referenced_keys(), grace_seconds=0, now=time.time() + 10)
+
+        self.assertTrue(os.path.exists(kept))
+        self.assertFalse(os.path.exists(orphan))
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from django.core.cache import cache, caches
+        from rest_framework.test import APIClient
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+        caches['shared'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(email='cache@example.com', password='pw', name='Cache')
+        )
+        VoiceProfile.objects.create(name='Aria', gender='female', language='en')
+
+    def test_profile_list_is_served_from_cache_and_revalidates(self):
+        """Test that repeated lists skip the query and a matching ETag gets a 304."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        first = self.client.get('/api/voices/profiles/')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/voices/profiles/')
+        not_modified = self.client.get('/api/voices/profiles/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(first.content, second.content)
+        self.assertFalse([q for q in queries if 'voice_profiles' in q['sql']])
+        self.assertEqual(second['Cache-Control'], 'private, no-cache')
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+    def test_saves_invalidate_and_query_strings_vary(self):
+        """Test that a profile save changes the ETag and filters are cached separately."""
+        first = self.client.get('/api/voices/profiles/')
+        VoiceProfile.objects.create(name='Guy', gender='male', language='en')
+        updated = self.client.get('/api/voices/profiles/', HTTP_IF_NONE_MATCH=first['ETag'])
+        filtered = self.client.get('/api/voices/profiles/?gender=male')
+
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(sorted(p['name'] for p in updated.json()), ['Aria', 'Guy'])
+        self.assertEqual([p['name'] for p in filtered.json()], ['Guy'])
+
+    def test_payment_settings_are_public_and_invalidated(self):
+        """Test the public payment settings cache headers and invalidation."""
+        from apps.payments.models import PaymentSettings
+
+        default = self.client.get('/api/payments/settings/')
+        PaymentSettings.objects.create(upi_id='shop@upi')
+        updated = self.client.get('/api/payments/settings/', HTTP_IF_NONE_MATCH=default['ETag'])
+
+        self.assertEqual(default['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(updated.json()['upi_id'], 'shop@upi')
+
+    def test_invalidation_reaches_other_workers(self):
+        """Test that a change made by another process is seen although this process cached the old list."""
+        from unittest import mock
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+        from . import response_cache
+
+        first = self.client.get('/api/voices/profiles/')
+        # Another worker: its own local cache, the same shared version tokens
+        other_worker = LocMemCache('other-worker', {})
+        with mock.patch.object(response_cache, 'cache', other_worker):
+            VoiceProfile.objects.create(name='Guy', gender='male', language='en')
+        updated = self.client.get('/api/voices/profiles/', HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(updated.status_code, 200)
+        self.assertEqual(sorted(p['name'] for p in updated.json()), ['Aria', 'Guy'])
+        self.assertIsNotNone(caches['shared'].get(response_cache._version_key('voice-profiles')))
+
+
+class DailyUsageTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIClient
+
+        self.user = get_user_model().objects.create_user(email='usage@example.com', password='pw', name='Usage')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def speak(self, text, seconds, credits):
+        from .models import GeneratedSpeech
+
+        return GeneratedSpeech.objects.create(
+            user=self.user, input_text=text, audio_file='generated_audio/u.mp3',
+            duration_seconds=seconds, credits_used=credits,
+        )
+
+    def test_generations_and_refunds_update_counters_served_by_endpoint(self):
+        """Test that each speech and refund increments today's row and idle days read as zero."""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .usage import refund_generation
+
+        self.speak('hello', 1.5, 5)
+        refund_generation(self.speak('world!', 2.0, 5))
+        today = timezone.localdate()
+
+        response = self.client.get(
+            f'/api/voices/usage/?start={today - timedelta(days=2)}&end={today}'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        days = response.json()['days']
+        self.assertEqual([d['generations'] for d in days], [0, 0, 2])
+        self.assertEqual(response.json()['totals'], {
+            'generations': 2, 'characters': 11, 'audio_seconds': 3.5,
+            'credits_spent': 10, 'credits_refunded': 5,
+        })
+        self.assertEqual(self.client.get('/api/voices/usage/?start=2020-01-01&end=2022-01-01').status_code, 400)
+
+    def test_backfill_rebuilds_counters_idempotently(self):
+        """Test that the backfill matches the live counters and can be re-run."""
+        import os
+        from django.core.management import call_command
+        from .models import DailyUsage
+        from .usage import refund_generation
+
+        self.speak('one', 1.0, 5)
+        refund_generation(self.speak('three', 2.0, 5))
+        live = list(DailyUsage.objects.values())
+        DailyUsage.objects.all().delete()
+
+        call_command('backfill_daily_usage', batch_size=1, stdout=open(os.devnull, 'w'))
+        call_command('backfill_daily_usage', batch_size=1, stdout=open(os.devnull, 'w'))
+
+        rebuilt = list(DailyUsage.objects.values())
+        for row in live + rebuilt:
+            row.pop('id')
+        self.assertEqual(rebuilt, live)
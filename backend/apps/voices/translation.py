@@ -4,33 +4,207 @@ Supports translation between 50+ languages using Google Translate.
 Uses Aksharamukha for accurate transliteration of names/proper nouns to Indian languages.
 """
 
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import requests
+from bs4 import BeautifulSoup
 from deep_translator import GoogleTranslator
+from deep_translator.constants import GOOGLE_LANGUAGES_TO_CODES
 from deep_translator.exceptions import (
     LanguageNotSupportedException,
     TranslationNotFound,
     RequestError,
+    TooManyRequests,
+)
+from deep_translator.validate import is_empty, is_input_valid, request_failed
+from django.conf import settings
+
+from .language_detection import detect_language
+from .resilience import CircuitBreaker, CircuitOpenError, call_with_resilience
+
+
+class ProviderClientError(Exception):
+    """The provider rejected the request itself (a 4xx other than 429)."""
+
+
+# Errors worth retrying: the provider stalled, dropped the connection,
+# throttled us or failed with a 5xx status
+RETRYABLE_PROVIDER_ERRORS = (
+    requests.Timeout,
+    requests.ConnectionError,
+    TooManyRequests,
+    RequestError,
 )
 
-# Try to import aksharamukha for transliteration
-try:
-    # Python 3.14 compatibility: ast.Str removed
-    import ast
-    if not hasattr(ast, 'Str'):
-        ast.Str = ast.Constant
+# One keep-alive session per thread; requests.Session is not thread-safe
+_sessions = threading.local()
+
+
+def _get_session():
+    session = getattr(_sessions, 'session', None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+    return session
+
+
+class TimeoutGoogleTranslator(GoogleTranslator):
+    """
+    GoogleTranslator that fetches through this module's session with the
+    configured (connect, read) timeouts, capped by the time left before
+    ``deadline`` (a time.monotonic() value). deep_translator itself calls
+    ``requests.get`` without a timeout.
+    """
+    
+    def __init__(self, source='auto', target='en', deadline=None, clock=time.monotonic, **kwargs):
+        super().__init__(source=source, target=target, **kwargs)
+        self.deadline = deadline
+        self._clock = clock
+    
+    def _timeouts(self):
+        connect = getattr(settings, 'TRANSLATION_CONNECT_TIMEOUT', 3.05)
+        read = getattr(settings, 'TRANSLATION_READ_TIMEOUT', 10)
+        if self.deadline is None:
+            return connect, read
+        remaining = self.deadline - self._clock()
+        if remaining <= 0:
+            raise requests.Timeout('Translation deadline exceeded')
+        return min(connect, remaining), min(read, remaining)
+    
+    def translate(self, text, **kwargs):
+        is_input_valid(text, max_chars=5000)
+        text = text.strip()
+        if self._same_source_target() or is_empty(text):
+            return text
+        self._url_params['tl'] = self._target
+        self._url_params['sl'] = self._source
+        self._url_params[self.payload_key] = text
+        
+        response = _get_session().get(
+            self._base_url, params=self._url_params, proxies=self.proxies, timeout=self._timeouts(),
+        )
+        try:
+            if response.status_code == 429:
+                raise TooManyRequests()
+            if 400 <= response.status_code < 500:
+                raise ProviderClientError(f'Provider rejected the request with HTTP {response.status_code}')
+            if request_failed(status_code=response.status_code):
+                raise RequestError()
+            soup = BeautifulSoup(response.text, 'html.parser')
+        finally:
+            response.close()
         
-    from aksharamukha import transliterate as akshara_transliterate
-    AKSHARAMUKHA_AVAILABLE = True
-except ImportError as e:
-    AKSHARAMUKHA_AVAILABLE = False
-    print(f"Aksharamukha not available, transliteration will use fallback. Error: {e}")
+        element = (
+            soup.find(self._element_tag, self._element_query)
+            or soup.find(self._element_tag, self._alt_element_query)
+        )
+        if not element:
+            raise TranslationNotFound(text)
+        translated = element.get_text(strip=True)
+        if translated == text and 'hl' in self._url_params:
+            # Unchanged output with an interface language set: retry without it
+            del self._url_params['hl']
+            return self.translate(text)
+        return translated
+
+
+google_circuit_breaker = CircuitBreaker(
+    'google-translate',
+    failure_threshold=getattr(settings, 'TRANSLATION_BREAKER_FAILURE_THRESHOLD', 5),
+    recovery_timeout=getattr(settings, 'TRANSLATION_BREAKER_RECOVERY_TIMEOUT', 30),
+)
+
+# Aksharamukha pulls a large dependency tree, so it is imported on first use
+# (or pre-warmed in a background thread by VoicesConfig.ready()).
+_akshara_transliterate = None
+_akshara_import_failed = False
+_akshara_lock = threading.Lock()
+
+TRANSLITERATION_CACHE_SIZE = 4096
+PROSE_CACHE_SIZE = 4096
+
+# Translated templates keyed on (template, source, target). With names replaced
+# by placeholders, templated messages ("Happy birthday <name>!") share one entry.
+_prose_cache = OrderedDict()
+_prose_cache_lock = threading.Lock()
+
+
+def _load_aksharamukha():
+    """Import aksharamukha once per process; returns the module or None."""
+    global _akshara_transliterate, _akshara_import_failed
+    if _akshara_transliterate is not None or _akshara_import_failed:
+        return _akshara_transliterate
+
+    with _akshara_lock:
+        if _akshara_transliterate is not None or _akshara_import_failed:
+            return _akshara_transliterate
+        try:
+            # Python 3.14 compatibility: ast.Str removed
+            import ast
+            if not hasattr(ast, 'Str'):
+                ast.Str = ast.Constant
+
+            from aksharamukha import transliterate as akshara_transliterate
+            _akshara_transliterate = akshara_transliterate
+        except ImportError as e:
+            _akshara_import_failed = True
+            print(f"Aksharamukha not available, transliteration will use fallback. Error: {e}")
+    return _akshara_transliterate
+
+
+def is_aksharamukha_available():
+    """Check (loading lazily if needed) whether aksharamukha can be used."""
+    return _load_aksharamukha() is not None
+
+
+def prewarm_transliteration():
+    """Load aksharamukha in a daemon thread so the first request doesn't pay for it."""
+    thread = threading.Thread(
+        target=_load_aksharamukha,
+        name='aksharamukha-prewarm',
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+@lru_cache(maxsize=TRANSLITERATION_CACHE_SIZE)
+def _cached_transliterate(text, target_script):
+    """
+    Memoized IAST -> target script transliteration with autodetect retry.
+    Keyed on (text, target_script) so recurring names skip both attempts.
+    """
+    akshara_transliterate = _load_aksharamukha()
+    if akshara_transliterate is None:
+        return None
+
+    try:
+        # Transliterate from Latin/IAST to target script
+        return akshara_transliterate.process('IAST', target_script, text)
+    except Exception as e:
+        print(f"Aksharamukha transliteration failed: {e}")
+        # Try with autodetect source
+        try:
+            return akshara_transliterate.process('autodetect', target_script, text)
+        except Exception as e2:
+            print(f"Aksharamukha autodetect also failed: {e2}")
+            return None
+
 
 # Language code mapping for Google Translate
 LANGUAGE_CODE_MAP = {
     'zh': 'zh-CN',  # Chinese (Simplified)
     'no': 'no',     # Norwegian
     'fil': 'tl',    # Filipino -> Tagalog
+    'he': 'iw',     # Hebrew (Google's legacy code)
 }
 
+# Source codes deep_translator accepts for Google
+GOOGLE_LANGUAGE_CODES = frozenset(GOOGLE_LANGUAGES_TO_CODES.values())
+
 # Aksharamukha script mapping for Indian languages
 AKSHARAMUKHA_SCRIPT_MAP = {
     'ta': 'Tamil',      # Tamil
@@ -50,6 +224,45 @@ AKSHARAMUKHA_SCRIPT_MAP = {
     'ar': 'Arab',       # Arabic
 }
 
+# Sentence boundaries: Latin, Devanagari danda, CJK and Arabic full stops
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?।॥۔])\s+|(?<=[。！？])\s*')
+
+# Tokens for the name planner: whitespace, words, punctuation runs
+PLAN_TOKEN_RE = re.compile(r'\s+|\w+|[^\w\s]+')
+
+# Glue after which the next word starts a sentence
+SENTENCE_END_RE = re.compile(r'[.!?।॥…]|\n')
+
+# Opaque stand-ins for protected names while the sentence is translated whole;
+# matched loosely because the provider may change spacing or case
+NAME_PLACEHOLDER = 'ZQX{}XQZ'
+NAME_PLACEHOLDER_RE = re.compile(r'ZQX\s*(\d+)\s*XQZ', re.IGNORECASE)
+
+# Words that are capitalized as sentence starters, greetings or titles but are
+# not proper nouns; a capitalized word in this list is never protected
+COMMON_CAPITALIZED_WORDS = frozenset("""
+    a an the this that these those there here it its he she we they you me my
+    our your his her their him them us what when where why who whom whose which
+    how if then but and or so because although though while after before since
+    until unless as at by for from in into of on to with without about above
+    below over under between is are was were be been am do does did can could
+    will would shall should may might must have has had not no yes ok okay
+    please thank thanks hello hi hey dear good today tomorrow yesterday now
+    also all any every each some many much more most very just only even
+    let lets one two three first next last once again always never sometimes
+    happy welcome congratulations greetings sorry merry best great nice
+    call tell ask send give take bring come go see look wait meet read write
+    keep stop start try make get put find check remember note listen turn open
+    close pay buy use help join leave order book visit enjoy follow watch
+    morning evening night afternoon day week month year time home work school
+    breakfast lunch dinner coffee tea water food love life family friend
+""".split())
+
+
+def split_sentences(text):
+    """Split text into sentences, keeping terminal punctuation."""
+    return [sentence for sentence in SENTENCE_BOUNDARY_RE.split(text.strip()) if sentence.strip()]
+
 
 class TranslationService:
     """Service for translating text between languages."""
@@ -71,6 +284,16 @@ class TranslationService:
             return LANGUAGE_CODE_MAP[code]
         return code
     
+    def _is_provider_language(self, code):
+        """Whether Google (through deep_translator) accepts the code."""
+        return self._normalize_language_code(code) in GOOGLE_LANGUAGE_CODES
+    
+    def _is_same_language(self, source, target):
+        """Whether two language codes refer to the same Google language."""
+        if not source or source == 'auto':
+            return False
+        return self._normalize_language_code(source) == self._normalize_language_code(target)
+    
     def _is_likely_name(self, text):
         """
         Check if the input text is likely a name/proper noun.
@@ -92,43 +315,149 @@ class TranslationService:
         Transliterate text using Aksharamukha (phonetic conversion).
         This is better for names and proper nouns.
         """
-        if not AKSHARAMUKHA_AVAILABLE:
-            return None
-        
         target_script = AKSHARAMUKHA_SCRIPT_MAP.get(target_language)
         if not target_script:
             return None
         
-        try:
-            # Transliterate from Latin/IAST to target script
-            result = akshara_transliterate.process('IAST', target_script, text)
-            return result
-        except Exception as e:
-            print(f"Aksharamukha transliteration failed: {e}")
-            # Try with autodetect source
-            try:
-                result = akshara_transliterate.process('autodetect', target_script, text)
-                return result
-            except Exception as e2:
-                print(f"Aksharamukha autodetect also failed: {e2}")
-                return None
+        return _cached_transliterate(text, target_script)
+    
+    def _is_name_token(self, token):
+        """A capitalized Latin word (not an acronym) that may be a proper noun."""
+        return (
+            len(token) > 1 and token.isascii() and token.isalpha()
+            and token[0].isupper() and not token.isupper()
+        )
+    
+    def _find_names(self, text):
+        """
+        Find the proper nouns worth protecting from translation.
+        
+        A capitalized word (not an acronym, not in COMMON_CAPITALIZED_WORDS)
+        counts as a name mid-sentence. At the start of a sentence it only
+        counts as the first word of a multi-word name ("Priya Kumar"), since
+        any word is capitalized there. Input made only of such words (a name
+        or a list of names) is all names. Adjacent names separated by single
+        spaces form one run.
+        
+        Returns (tokens, runs) where each run is a (first, last) token index pair.
+        """
+        tokens = PLAN_TOKEN_RE.findall(text)
+        words = [i for i, token in enumerate(tokens) if token[0].isalnum() or token[0] == '_']
+        candidates = {
+            i for i in words
+            if self._is_name_token(tokens[i]) and tokens[i].lower() not in COMMON_CAPITALIZED_WORDS
+        }
+        if words and len(candidates) == len(words):
+            names = candidates
+        else:
+            names = set()
+            sentence_start = True
+            for position, i in enumerate(words):
+                glue = ''.join(tokens[words[position - 1] + 1:i]) if position else ''
+                if position and SENTENCE_END_RE.search(glue):
+                    sentence_start = True
+                next_i = words[position + 1] if position + 1 < len(words) else None
+                joins_next = next_i is not None and next_i in candidates and next_i == i + 2 and tokens[i + 1] == ' '
+                if i in candidates and (not sentence_start or joins_next):
+                    names.add(i)
+                sentence_start = False
+        
+        runs = []
+        for i in sorted(names):
+            if runs and runs[-1][1] == i - 2 and tokens[i - 1] == ' ':
+                runs[-1][1] = i
+            else:
+                runs.append([i, i])
+        return tokens, runs
+    
+    def _translate_template(self, template, source, target):
+        """Translate a placeholder template through the template cache."""
+        key = (template, source, target)
+        with _prose_cache_lock:
+            if key in _prose_cache:
+                _prose_cache.move_to_end(key)
+                return _prose_cache[key]
+        
+        translated = self._translate_with_google(template, source, target)
+        if translated:
+            with _prose_cache_lock:
+                _prose_cache[key] = translated
+                _prose_cache.move_to_end(key)
+                while len(_prose_cache) > PROSE_CACHE_SIZE:
+                    _prose_cache.popitem(last=False)
+        return translated
+    
+    def _translate_mixed(self, text, source, target):
+        """
+        Transliterate names locally and translate the text around them whole.
+        
+        Each name run is replaced by an opaque placeholder, the resulting
+        template goes to the provider in one call (so grammar is kept), and
+        the transliterated names are put back in. Returns (translated_text,
+        method) or (None, None) when nothing needs protecting or a placeholder
+        did not survive, so the caller translates the original text instead.
+        """
+        tokens, runs = self._find_names(text)
+        names = []
+        for first, last in runs:
+            transliterated = self._transliterate_with_aksharamukha(''.join(tokens[first:last + 1]), target)
+            if transliterated:
+                names.append((first, last, transliterated))
+        if not names:
+            return None, None
+        
+        pieces = []
+        position = 0
+        for index, (first, last, _) in enumerate(names):
+            pieces.extend(tokens[position:first])
+            pieces.append(NAME_PLACEHOLDER.format(index))
+            position = last + 1
+        pieces.extend(tokens[position:])
+        template = ''.join(pieces)
+        
+        if not NAME_PLACEHOLDER_RE.sub('', template).strip(' \t\n,;&+/-'):
+            # Nothing but names: no provider call at all
+            translated = template
+            method = 'transliteration'
+        else:
+            translated = self._translate_template(template, source, target)
+            method = 'mixed'
+        if not translated:
+            return None, None
+        
+        found = [int(index) for index in NAME_PLACEHOLDER_RE.findall(translated)]
+        if sorted(found) != list(range(len(names))):
+            return None, None
+        output = NAME_PLACEHOLDER_RE.sub(lambda match: names[int(match.group(1))][2], translated)
+        return output.strip(), method
     
     def _translate_with_google(self, text, source, target):
-        """Translate with Google Translate."""
-        try:
-            source_code = self._normalize_language_code(source)
-            target_code = self._normalize_language_code(target)
-            
-            translator = GoogleTranslator(source=source_code, target=target_code)
-            return translator.translate(text)
-        except Exception as e:
-            print(f"Google translation failed: {e}")
-            return None
+        """
+        Translate with Google Translate through the circuit breaker.
+        Transient errors are retried with jittered backoff until
+        TRANSLATION_DEADLINE seconds have passed; raises CircuitOpenError
+        without a request while the provider is failing.
+        """
+        source_code = self._normalize_language_code(source)
+        target_code = self._normalize_language_code(target)
+        
+        deadline = time.monotonic() + getattr(settings, 'TRANSLATION_DEADLINE', 15)
+        translator = TimeoutGoogleTranslator(source=source_code, target=target_code, deadline=deadline)
+        return call_with_resilience(
+            lambda: translator.translate(text),
+            google_circuit_breaker,
+            RETRYABLE_PROVIDER_ERRORS,
+            max_retries=getattr(settings, 'TRANSLATION_MAX_RETRIES', 2),
+            backoff_base=getattr(settings, 'TRANSLATION_RETRY_BACKOFF', 0.25),
+            backoff_cap=getattr(settings, 'TRANSLATION_RETRY_BACKOFF_CAP', 2.0),
+            deadline=deadline,
+        )
     
     def translate(self, text, target_language, source_language='auto'):
         """
         Translate text to target language.
-        For names/proper nouns going to Indian languages, uses transliteration.
+        For names/proper nouns going to Indian languages, transliterates the
+        names locally and translates the sentence around them in one call.
         
         Args:
             text: The text to translate
@@ -139,6 +468,7 @@ class TranslationService:
             dict: {
                 'translated_text': str,
                 'source_language': str (detected or provided),
+                'detected_language': str or None (local detection),
                 'target_language': str,
                 'success': bool,
                 'error': str (if any)
@@ -148,27 +478,43 @@ class TranslationService:
             return {
                 'translated_text': text,
                 'source_language': source_language,
+                'detected_language': None,
                 'target_language': target_language,
                 'success': True,
                 'error': None
             }
         
+        # Resolve 'auto' locally so the provider doesn't have to detect (unless
+        # it has no code for the detected language), and skip the round trip
+        # entirely when the text is already in the target
+        detected_language = detect_language(text)
+        if source_language == 'auto' and detected_language and self._is_provider_language(detected_language):
+            source_language = detected_language
+        
+        if self._is_same_language(source_language, target_language) or \
+                self._is_same_language(detected_language, target_language):
+            return {
+                'translated_text': text,
+                'source_language': source_language,
+                'detected_language': detected_language,
+                'target_language': target_language,
+                'success': True,
+                'error': None,
+                'method': 'noop'
+            }
+        
         try:
             translated_text = None
             method_used = 'google'
             
-            # Check if it's a name going to an Indian language - use transliteration
-            is_name = self._is_likely_name(text)
+            # Going to an Indian language - transliterate names locally and
+            # send the text with placeholders in their place to Google
             is_indian_target = target_language in AKSHARAMUKHA_SCRIPT_MAP
             
-            if is_name and is_indian_target and AKSHARAMUKHA_AVAILABLE:
-                # Use transliteration for names
-                transliterated = self._transliterate_with_aksharamukha(text.strip(), target_language)
-                if transliterated:
-                    translated_text = transliterated
-                    method_used = 'transliteration'
+            if is_indian_target and is_aksharamukha_available():
+                translated_text, method_used = self._translate_mixed(text, source_language, target_language)
             
-            # If not a name or transliteration failed, use Google Translate
+            # If there were no names or a placeholder was lost, use Google Translate
             if not translated_text:
                 translated_text = self._translate_with_google(text, source_language, target_language)
                 method_used = 'google'
@@ -177,6 +523,7 @@ class TranslationService:
                 return {
                     'translated_text': translated_text,
                     'source_language': source_language,
+                    'detected_language': detected_language,
                     'target_language': target_language,
                     'success': True,
                     'error': None,
@@ -186,15 +533,26 @@ class TranslationService:
                 return {
                     'translated_text': text,
                     'source_language': source_language,
+                    'detected_language': detected_language,
                     'target_language': target_language,
                     'success': False,
                     'error': 'Translation failed'
                 }
             
+        except CircuitOpenError:
+            return {
+                'translated_text': text,
+                'source_language': source_language,
+                'detected_language': detected_language,
+                'target_language': target_language,
+                'success': False,
+                'error': 'Translation provider temporarily unavailable'
+            }
         except LanguageNotSupportedException as e:
             return {
                 'translated_text': text,
                 'source_language': source_language,
+                'detected_language': detected_language,
                 'target_language': target_language,
                 'success': False,
                 'error': f'Language not supported: {str(e)}'
@@ -203,14 +561,16 @@ class TranslationService:
             return {
                 'translated_text': text,
                 'source_language': source_language,
+                'detected_language': detected_language,
                 'target_language': target_language,
                 'success': False,
                 'error': f'Translation not found: {str(e)}'
             }
-        except RequestError as e:
+        except (RequestError, ProviderClientError) as e:
             return {
                 'translated_text': text,
                 'source_language': source_language,
+                'detected_language': detected_language,
                 'target_language': target_language,
                 'success': False,
                 'error': f'Translation request failed: {str(e)}'
@@ -219,6 +579,7 @@ class TranslationService:
             return {
                 'translated_text': text,
                 'source_language': source_language,
+                'detected_language': detected_language,
                 'target_language': target_language,
                 'success': False,
                 'error': f'Translation error: {str(e)}'
@@ -229,7 +590,7 @@ class TranslationService:
         Pure transliteration (phonetic conversion) without translation.
         Best for names, proper nouns, and when you want the sound preserved.
         """
-        if not AKSHARAMUKHA_AVAILABLE:
+        if not is_aksharamukha_available():
             return {
                 'transliterated_text': text,
                 'success': False,
@@ -0,0 +1,409 @@
+"""
+Chunked, resumable uploads for voice clone samples.
+
+Chunks are streamed from the request body to disk in fixed-size blocks, so
+worker memory per upload is bounded by the block size regardless of the
+file size. The SHA-256 is updated as bytes arrive, the declared size is
+never exceeded, and for WAV files the duration limits are enforced from the
+streamed header before the rest of the audio is accepted.
+
+No transaction or row lock is held while a chunk streams in: the offset is
+claimed with a conditional UPDATE (uploading -> receiving, tagged with a
+random token) and released with another, so a slow client only holds its
+own upload. Each writer streams into its own temp file in the upload's part
+directory; only while its token still holds the claim is the file renamed
+into place as the segment at its offset, so a writer whose stale claim was
+taken over never touches committed bytes. When the last byte lands, the
+segments are joined into the clone's sample and the clone is handed to the
+processing queue. Abandoned uploads and their part directories are removed
+by expire_stale_uploads().
+"""
+
+import hashlib
+import os
+import shutil
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CloneUpload, VoiceClone
+from .storage import reserve_path, sharded_name
+
+STREAM_BLOCK_SIZE = 64 * 1024
+# Bytes of a WAV upload inspected for the fmt chunk
+WAV_HEADER_BYTES = 4096
+PART_DIR = 'clone_uploads'
+SEGMENT_SUFFIX = '.seg'
+HASHER_CACHE_SIZE = 1024
+
+# In-process SHA-256 state per upload id, as (offset, hasher), least
+# recently used first. Chunks normally arrive at the same worker in order;
+# a resumed upload on another worker rebuilds the state from the segments
+# once. Uploads that are never finished fall off the end.
+_hashers = OrderedDict()
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Rejected chunk; carries the HTTP status code to respond with."""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def part_path(upload):
+    """Directory holding the upload's committed segments and in-flight temp files."""
+    return os.path.join(settings.MEDIA_ROOT, PART_DIR, f'{upload.id}.part')
+
+
+def _segment_path(directory, offset):
+    return os.path.join(directory, f'{offset:012d}{SEGMENT_SUFFIX}')
+
+
+def _segments(directory, end):
+    """(offset, path) of the committed segments covering bytes [0, end), in order."""
+    segments = []
+    for name in os.listdir(directory):
+        if name.endswith(SEGMENT_SUFFIX):
+            offset = int(name[:-len(SEGMENT_SUFFIX)])
+            if offset < end:
+                segments.append((offset, os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def _read_committed(directory, end):
+    """Yield the committed bytes [0, end) in blocks, each segment up to the next one's offset."""
+    segments = _segments(directory, end)
+    for index, (offset, path) in enumerate(segments):
+        remaining = (segments[index + 1][0] if index + 1 < len(segments) else end) - offset
+        with open(path, 'rb') as f:
+            while remaining:
+                block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+
+
+def _remove_part(path):
+    """Delete a part directory, or a part file left by the single-file layout."""
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _ensure_part_dir(upload):
+    """Return the part directory, converting a single part file from before segments."""
+    path = part_path(upload)
+    if os.path.isfile(path):
+        legacy = f'{path}.legacy'
+        os.replace(path, legacy)
+        os.makedirs(path, exist_ok=True)
+        if upload.received_bytes:
+            os.replace(legacy, _segment_path(path, 0))
+        else:
+            os.remove(legacy)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def wav_byte_rate(header):
+    """Return the byte rate from a WAV header, or None if not (yet) parseable."""
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        return None
+    position = 12
+    while position + 8 <= len(header):
+        chunk_id = header[position:position + 4]
+        chunk_size = struct.unpack('<I', header[position + 4:position + 8])[0]
+        if chunk_id == b'fmt ':
+            # fmt: format(2) channels(2) sample_rate(4) byte_rate(4) ...
+            if position + 20 > len(header):
+                return None
+            return struct.unpack('<I', header[position + 16:position + 20])[0]
+        position += 8 + chunk_size + (chunk_size % 2)
+    return None
+
+
+def _take_hasher(upload, directory):
+    with _hashers_lock:
+        entry = _hashers.pop(upload.id, None)
+    if entry is not None and entry[0] == upload.received_bytes:
+        return entry[1]
+    hasher = hashlib.sha256()
+    for block in _read_committed(directory, upload.received_bytes):
+        hasher.update(block)
+    return hasher
+
+
+def _keep_hasher(upload_id, offset, hasher):
+    with _hashers_lock:
+        _hashers[upload_id] = (offset, hasher)
+        _hashers.move_to_end(upload_id)
+        while len(_hashers) > HASHER_CACHE_SIZE:
+            _hashers.popitem(last=False)
+
+
+def _drop_hashers(upload_ids):
+    with _hashers_lock:
+        for upload_id in upload_ids:
+            _hashers.pop(upload_id, None)
+
+
+def start_upload(user, validated_data):
+    upload = CloneUpload.objects.create(user=user, **validated_data)
+    os.makedirs(part_path(upload), exist_ok=True)
+    return upload
+
+
+def _claim_chunk(upload_id, user, offset):
+    """Move the upload to 'receiving' at ``offset``; returns (upload, token) or raises UploadError."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'CLONE_UPLOAD_CHUNK_TIMEOUT', 600))
+    token = uuid.uuid4().hex
+    claimed = CloneUpload.objects.filter(
+        Q(status='uploading') | Q(status='receiving', updated_at__lt=stale),
+        id=upload_id, user=user, received_bytes=offset,
+    ).update(status='receiving', claim_token=token, updated_at=now)
+
+    upload = CloneUpload.objects.get(id=upload_id, user=user)
+    if not claimed:
+        if upload.status == 'receiving':
+            raise UploadError('Another chunk is being received', status_code=409)
+        if upload.status != 'uploading':
+            raise UploadError('Upload is not in progress', status_code=409)
+        raise UploadError(f'Offset mismatch: expected {upload.received_bytes}', status_code=409)
+    return upload, token
+
+
+def _check_wav_header(upload, header):
+    """Reject WAVs whose declared size and byte rate fall outside the duration limits."""
+    byte_rate = wav_byte_rate(header)
+    if not byte_rate:
+        return
+    seconds = upload.total_size / byte_rate
+    max_seconds = getattr(settings, 'CLONE_SAMPLE_MAX_SECONDS', 600)
+    min_seconds = getattr(settings, 'CLONE_SAMPLE_MIN_SECONDS', 3)
+    if seconds > max_seconds:
+        raise UploadError(f'Audio sample must be at most {max_seconds} seconds long', status_code=413)
+    if seconds < min_seconds:
+        raise UploadError(f'Audio sample must be at least {min_seconds} seconds long', status_code=422)
+
+
+def _write_chunk(upload, offset, stream, limit, hasher, directory, temp):
+    """Stream the chunk into the writer's temp file; returns the number of bytes written."""
+    header_size = min(WAV_HEADER_BYTES, upload.total_size)
+    header = None
+    if offset < header_size and upload.filename.lower().endswith('.wav'):
+        # The header is checked from the streamed bytes; only a prefix from
+        # an earlier chunk has to come from the committed segments
+        header = bytearray()
+        for block in _read_committed(directory, offset):
+            header += block
+
+    written = 0
+    with open(temp, 'wb') as f:
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                break
+            if written + len(block) > limit:
+                raise UploadError('Chunk exceeds the declared size or chunk limit', status_code=413)
+            f.write(block)
+            hasher.update(block)
+            written += len(block)
+
+            if header is not None:
+                header += block[:header_size - len(header)]
+                if len(header) >= header_size:
+                    _check_wav_header(upload, bytes(header))
+                    header = None
+    return written
+
+
+def append_chunk(upload_id, user, offset, stream, content_length=None):
+    """
+    Stream one chunk into the upload at ``offset``.
+    Returns the updated upload; finalizes it when the last byte arrives.
+    """
+    max_chunk = getattr(settings, 'CLONE_UPLOAD_MAX_CHUNK_BYTES', 8 * 1024 * 1024)
+
+    upload, token = _claim_chunk(upload_id, user, offset)
+    claimed = CloneUpload.objects.filter(id=upload.id, status='receiving', claim_token=token)
+    temp = None
+    try:
+        remaining = upload.total_size - upload.received_bytes
+        limit = min(remaining, max_chunk)
+        if content_length is not None and content_length > limit:
+            raise UploadError('Chunk exceeds the declared size or chunk limit', status_code=413)
+        directory = _ensure_part_dir(upload)
+        temp = os.path.join(directory, f'{token}.tmp')
+        hasher = _take_hasher(upload, directory)
+        written = _write_chunk(upload, offset, stream, limit, hasher, directory, temp)
+        # Publish only while the claim is ours; renewing it keeps a stale
+        # takeover from starting between this check and the rename
+        if not claimed.update(updated_at=timezone.now()):
+            raise UploadError('Upload is not in progress', status_code=409)
+        if written:
+            os.replace(temp, _segment_path(directory, offset))
+    except Exception:
+        claimed.update(status='uploading', claim_token='', updated_at=timezone.now())
+        raise
+    finally:
+        if temp and os.path.exists(temp):
+            os.remove(temp)
+
+    upload.received_bytes = offset + written
+    if upload.received_bytes < upload.total_size:
+        if not claimed.update(
+            status='uploading', claim_token='', received_bytes=upload.received_bytes, updated_at=timezone.now(),
+        ):
+            raise UploadError('Upload is not in progress', status_code=409)
+        _keep_hasher(upload.id, upload.received_bytes, hasher)
+        upload.status = 'uploading'
+        return upload
+
+    upload.sha256 = hasher.hexdigest()
+    if upload.checksum and upload.checksum.lower() != upload.sha256:
+        claimed.update(
+            status='aborted', claim_token='', received_bytes=upload.received_bytes, sha256=upload.sha256,
+            updated_at=timezone.now(),
+        )
+        _remove_part(directory)
+        raise UploadError('Checksum mismatch', status_code=422)
+    return _finalize(upload, claimed, directory)
+
+
+def _assemble(directory, end, target):
+    """Join the committed segments into ``target``."""
+    segments = _segments(directory, end)
+    if len(segments) == 1 and os.path.getsize(segments[0][1]) == end:
+        os.replace(segments[0][1], target)
+        return
+    with open(target, 'wb') as out:
+        for block in _read_committed(directory, end):
+            out.write(block)
+
+
+def _finalize(upload, claimed, directory):
+    """
+    Join the segments into place and create the pending clone; its
+    decoding and analysis run in the processing queue.
+    """
+    target_name = sharded_name('clone_samples', os.path.splitext(upload.filename)[1])
+    target = reserve_path(target_name)
+    _assemble(directory, upload.received_bytes, target)
+    with transaction.atomic():
+        if not claimed.update(
+            status='complete', claim_token='', received_bytes=upload.received_bytes, sha256=upload.sha256,
+            updated_at=timezone.now(),
+        ):
+            os.remove(target)
+            raise UploadError('Upload is not in progress', status_code=409)
+
+        clone = VoiceClone(
+            user=upload.user,
+            name=upload.name,
+            description=upload.description,
+            language=upload.language,
+            sample_sha256=upload.sha256,
+        )
+        clone.audio_sample.name = target_name
+        clone.save()
+        CloneUpload.objects.filter(id=upload.id).update(voice_clone=clone)
+
+        from .services import voice_service
+        transaction.on_commit(lambda: voice_service.process_voice_clone(clone))
+    _remove_part(directory)
+
+    upload.status = 'complete'
+    upload.voice_clone = clone
+    return upload
+
+
+def abort_upload(upload):
+    CloneUpload.objects.filter(id=upload.id, status__in=['uploading', 'receiving']).update(
+        status='aborted', claim_token='', updated_at=timezone.now(),
+    )
+    _drop_hashers([upload.id])
+    _remove_part(part_path(upload))
+
+
+def _part_size(entry):
+    if not entry.is_dir():
+        return entry.stat().st_size
+    return sum(child.stat().st_size for child in os.scandir(entry.path) if child.is_file())
+
+
+def expire_stale_uploads(max_age_hours=None, batch_size=1000, dry_run=False, now=None):
+    """
+    Abort uploads idle for longer than ``max_age_hours`` (default
+    CLONE_UPLOAD_EXPIRY_HOURS) and delete part directories that no live
+    upload owns once they are that old. With ``dry_run`` nothing is changed.
+    Returns (uploads aborted, parts deleted, bytes).
+    """
+    if max_age_hours is None:
+        max_age_hours = getattr(settings, 'CLONE_UPLOAD_EXPIRY_HOURS', 24)
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=max_age_hours)
+    live = ['uploading', 'receiving']
+
+    stale = CloneUpload.objects.filter(status__in=live, updated_at__lt=cutoff)
+    if dry_run:
+        aborted = stale.count()
+        live_filter = Q(status__in=live, updated_at__gte=cutoff)
+    else:
+        aborted = 0
+        live_filter = Q(status__in=live)
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            aborted += stale.filter(id__in=ids).update(status='aborted', claim_token='', updated_at=now)
+            _drop_hashers(ids)
+
+    deleted = deleted_bytes = 0
+    directory = os.path.join(settings.MEDIA_ROOT, PART_DIR)
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith('.part')]
+    except FileNotFoundError:
+        entries = []
+    cutoff_ts = cutoff.timestamp()
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start:start + batch_size]
+        ids = {entry.name[:-len('.part')] for entry in batch}
+        owned = {
+            str(upload_id) for upload_id in
+            CloneUpload.objects.filter(live_filter, id__in=[i for i in ids if _is_uuid(i)])
+            .values_list('id', flat=True)
+        }
+        for entry in batch:
+            if entry.name[:-len('.part')] in owned:
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff_ts:
+                    continue
+                size = _part_size(entry)
+                if not dry_run:
+                    _remove_part(entry.path)
+            except FileNotFoundError:
+                continue
+            deleted += 1
+            deleted_bytes += size
+    return aborted, deleted, deleted_bytes
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
@@ -4,13 +4,18 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     VoiceProfileViewSet,
     VoiceCloneViewSet,
+    CloneUploadCreateView,
+    CloneUploadDetailView,
     GenerateSpeechView,
+    TranslateAndGenerateView,
     TranslateTextView,
     SpeechHistoryViewSet,
+    UsageView,
     AdminVoiceProfileViewSet,
     AdminVoiceCloneViewSet,
     AdminGeneratedSpeechViewSet,
     AdminDashboardView,
+    TranslationProviderStatusView,
 )
 
 router = DefaultRouter()
@@ -24,8 +29,13 @@ router.register(r'admin/clones', AdminVoiceCloneViewSet, basename='admin-voice-c
 router.register(r'admin/speeches', AdminGeneratedSpeechViewSet, basename='admin-speeches')
 
 urlpatterns = [
+    path('clones/uploads/', CloneUploadCreateView.as_view(), name='clone-upload-create'),
+    path('clones/uploads/<uuid:pk>/', CloneUploadDetailView.as_view(), name='clone-upload-detail'),
     path('generate/', GenerateSpeechView.as_view(), name='generate-speech'),
+    path('translate-generate/', TranslateAndGenerateView.as_view(), name='translate-generate'),
     path('translate/', TranslateTextView.as_view(), name='translate-text'),
+    path('usage/', UsageView.as_view(), name='usage'),
     path('admin/dashboard/', AdminDashboardView.as_view(), name='admin-dashboard'),
+    path('admin/translation-provider/', TranslationProviderStatusView.as_view(), name='admin-translation-provider'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,136 @@
+"""
+Pre-aggregated daily usage per user.
+
+A DailyUsage row per (user, local date) is incremented with F() updates:
+when a GeneratedSpeech is created (generations, characters, audio seconds,
+credits spent; post_save handler, same transaction as the insert) and when
+credits for a created speech are refunded. The usage endpoint then reads at
+most one row per day of the requested range.
+
+``python manage.py backfill_daily_usage`` rebuilds the rows from
+GeneratedSpeech and the credit ledger's speech refunds. Credits refunded
+before a speech was saved are neither spent nor refunded here.
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, Length, TruncDate
+from django.utils import timezone
+
+from apps.payments.ledger import change_credits
+from apps.payments.models import CreditLedgerEntry
+
+from .models import DailyUsage, GeneratedSpeech
+
+USAGE_DEFAULT_DAYS = 30
+USAGE_MAX_DAYS = 366
+
+COUNTERS = ['generations', 'characters', 'audio_seconds', 'credits_spent', 'credits_refunded']
+
+
+def record_usage(user_id, day=None, **increments):
+    """Atomically add ``increments`` to the user's counters for ``day`` (default today)."""
+    day = day or timezone.localdate()
+    updates = {field: F(field) + value for field, value in increments.items()}
+    with transaction.atomic():
+        if DailyUsage.objects.filter(user_id=user_id, date=day).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                DailyUsage.objects.create(user_id=user_id, date=day, **increments)
+        except IntegrityError:
+            # Another request created today's row first
+            DailyUsage.objects.filter(user_id=user_id, date=day).update(**updates)
+
+
+def record_generation(sender, instance, created=False, raw=False, **kwargs):
+    """post_save handler for GeneratedSpeech."""
+    if not created or raw:
+        return
+    record_usage(
+        instance.user_id,
+        timezone.localdate(instance.created_at),
+        generations=1,
+        characters=len(instance.input_text),
+        audio_seconds=instance.duration_seconds or 0,
+        credits_spent=instance.credits_used,
+    )
+
+
+def refund_generation(speech):
+    """Give back the credits of a created speech and count the refund."""
+    if not speech.credits_used:
+        return
+    with transaction.atomic():
+        change_credits(speech.user_id, speech.credits_used, 'refund', reference=f'speech:{speech.pk}')
+        record_usage(speech.user_id, credits_refunded=speech.credits_used)
+
+
+def usage_between(user_id, start, end):
+    """Daily counters from ``start`` to ``end`` inclusive (zeros for idle days) and their totals."""
+    rows = {
+        row['date']: row
+        for row in DailyUsage.objects.filter(user_id=user_id, date__range=(start, end)).values('date', *COUNTERS)
+    }
+    days = []
+    totals = dict.fromkeys(COUNTERS, 0)
+    day = start
+    while day <= end:
+        row = rows.get(day) or dict.fromkeys(COUNTERS, 0)
+        days.append({'date': day.isoformat(), **{field: row[field] for field in COUNTERS}})
+        for field in COUNTERS:
+            totals[field] += row[field]
+        day += timedelta(days=1)
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'days': days, 'totals': totals}
+
+
+def _daily_rows(user_ids):
+    """Recompute ``{(user_id, date): counters}`` for ``user_ids`` from the source tables."""
+    rows = {}
+    speeches = (
+        GeneratedSpeech.objects.filter(user_id__in=user_ids)
+        .annotate(day=TruncDate('created_at')).order_by().values('user', 'day')
+        .annotate(
+            generations=Count('id'),
+            characters=Coalesce(Sum(Length('input_text')), 0),
+            audio_seconds=Coalesce(Sum('duration_seconds'), 0.0),
+            credits_spent=Coalesce(Sum('credits_used'), 0),
+        )
+    )
+    for row in speeches:
+        rows[(row['user'], row['day'])] = {field: row[field] for field in COUNTERS if field in row}
+    refunds = (
+        CreditLedgerEntry.objects.filter(user_id__in=user_ids, kind='refund', reference__startswith='speech:')
+        .annotate(day=TruncDate('created_at')).order_by().values('user', 'day')
+        .annotate(total=Sum('delta'))
+    )
+    for row in refunds:
+        rows.setdefault((row['user'], row['day']), {})['credits_refunded'] = row['total']
+    return rows
+
+
+def backfill_daily_usage(batch_size=500):
+    """
+    Rebuild DailyUsage from GeneratedSpeech and the ledger, ``batch_size``
+    users at a time. Rows are upserted, so re-running it is safe.
+    Returns the number of rows written.
+    """
+    User = get_user_model()
+    written = 0
+    last_pk = 0
+    while True:
+        ids = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return written
+        last_pk = ids[-1]
+        usage = [
+            DailyUsage(user_id=user_id, date=day, **{field: counters.get(field, 0) for field in COUNTERS})
+            for (user_id, day), counters in _daily_rows(ids).items()
+        ]
+        DailyUsage.objects.bulk_create(
+            usage, update_conflicts=True, unique_fields=['user', 'date'], update_fields=COUNTERS,
+        )
+        written += len(usage)
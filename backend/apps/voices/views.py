@@ -2,25 +2,48 @@ from rest_framework import viewsets, generics, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 
+from apps.payments.ledger import change_credits
+from apps.users.stats import user_stats
 from apps.users.views import IsAdminPermission
-from .models import VoiceProfile, VoiceClone, GeneratedSpeech
+from .models import VoiceProfile, VoiceClone, GeneratedSpeech, CloneUpload
 from .serializers import (
     VoiceProfileSerializer,
     VoiceCloneSerializer,
     VoiceCloneCreateSerializer,
+    CloneUploadSerializer,
     GeneratedSpeechSerializer,
     GenerateSpeechSerializer,
+    TranslateAndGenerateSerializer,
     TranslateTextSerializer,
     AdminVoiceProfileSerializer,
     AdminVoiceCloneSerializer,
     AdminGeneratedSpeechSerializer,
 )
-from .services import voice_service
-from .translation import translation_service
+from .services import voice_service, OUTPUT_FORMATS
+from .clone_processing import CloneProcessingError, ingest_sample, discard_clone
+from .media_serving import MediaPassthroughRenderer, serve_media, signed_owner_id
+from .response_cache import cached_json_response
+from . import uploads, waveform
+from .usage import USAGE_DEFAULT_DAYS, USAGE_MAX_DAYS, refund_generation, usage_between
+from .translation import translation_service, split_sentences, google_circuit_breaker
+
+
+def signed_media_object(request, model, url_name, pk, view):
+    """The object for a media action: by signed ``token`` if given, else the owner's via get_object()."""
+    token = request.query_params.get('token')
+    if token is None:
+        return view.get_object()
+    user_id = signed_owner_id(token, url_name, pk)
+    if user_id is None:
+        raise PermissionDenied('Invalid or expired media link.')
+    return get_object_or_404(model, pk=pk, user_id=user_id)
 
 
 class VoiceProfileViewSet(viewsets.ReadOnlyModelViewSet):
@@ -33,6 +56,16 @@ class VoiceProfileViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['gender', 'emotion', 'language', 'is_premium']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at']
+    
+    def list(self, request, *args, **kwargs):
+        # Same list for every user: cached as JSON, revalidated by ETag
+        return cached_json_response(
+            request,
+            'voice-profiles',
+            lambda: super(VoiceProfileViewSet, self).list(request, *args, **kwargs).data,
+            vary=(request.build_absolute_uri('/'), sorted(request.query_params.lists())),
+            cache_control='private, no-cache',
+        )
 
 
 class VoiceCloneViewSet(viewsets.ModelViewSet):
@@ -44,6 +77,12 @@ class VoiceCloneViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return VoiceClone.objects.filter(user=self.request.user)
     
+    def get_permissions(self):
+        # Signed sample URLs are checked in the action itself
+        if self.action == 'sample' and 'token' in self.request.query_params:
+            return []
+        return super().get_permissions()
+    
     def get_serializer_class(self):
         if self.action == 'create':
             return VoiceCloneCreateSerializer
@@ -52,8 +91,90 @@ class VoiceCloneViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         print(f"DEBUG: Validated Data: {serializer.validated_data}")
         voice_clone = serializer.save()
-        # Process the voice clone (in background in production)
-        voice_service.process_voice_clone(voice_clone)
+        # Only the cheap header checks run here; decoding happens in the queue
+        try:
+            ingest_sample(voice_clone)
+        except CloneProcessingError as e:
+            discard_clone(voice_clone)
+            raise ValidationError({'audio_sample': [str(e)]})
+        # Processing runs in the background; the clone is returned as pending
+        transaction.on_commit(lambda: voice_service.process_voice_clone(voice_clone))
+    
+    @action(detail=True, methods=['get'], renderer_classes=[MediaPassthroughRenderer])
+    def sample(self, request, pk=None):
+        """Stream the clone's uploaded sample (owner, or a signed URL from sample_url)."""
+        clone = signed_media_object(request, VoiceClone, 'voice-clones-sample', pk, self)
+        return serve_media(request, clone.audio_sample)
+
+
+class CloneUploadCreateView(generics.CreateAPIView):
+    """Start a resumable chunked upload for a voice clone sample."""
+    
+    serializer_class = CloneUploadSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        serializer.instance = uploads.start_upload(self.request.user, serializer.validated_data)
+    
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response['Upload-Offset'] = '0'
+        response['Location'] = f"{request.path}{response.data['id']}/"
+        return response
+
+
+class CloneUploadDetailView(generics.GenericAPIView):
+    """
+    Resumable upload session.
+    
+    HEAD/GET report the current offset; PATCH appends the raw request body at
+    the ``Upload-Offset`` header; DELETE aborts the upload.
+    """
+    
+    serializer_class = CloneUploadSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return CloneUpload.objects.filter(user=self.request.user)
+    
+    def _offset_response(self, upload, status_code=status.HTTP_200_OK):
+        response = Response(self.get_serializer(upload).data, status=status_code)
+        response['Upload-Offset'] = str(upload.received_bytes)
+        response['Upload-Length'] = str(upload.total_size)
+        return response
+    
+    def get(self, request, pk=None):
+        return self._offset_response(self.get_object())
+    
+    def head(self, request, pk=None):
+        return self._offset_response(self.get_object())
+    
+    def patch(self, request, pk=None):
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Upload-Offset header is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0) or None
+        except ValueError:
+            content_length = None
+        
+        try:
+            # Read the raw body stream; request.data is never touched, so
+            # nothing is buffered by the parsers
+            upload = uploads.append_chunk(upload.id, request.user, offset, request.stream, content_length)
+        except uploads.UploadError as e:
+            return Response({'error': str(e)}, status=e.status_code)
+        
+        status_code = status.HTTP_201_CREATED if upload.status == 'complete' else status.HTTP_200_OK
+        return self._offset_response(upload, status_code)
+    
+    def delete(self, request, pk=None):
+        upload = self.get_object()
+        if upload.status in ('uploading', 'receiving'):
+            uploads.abort_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class GenerateSpeechView(generics.CreateAPIView):
@@ -63,16 +184,16 @@ class GenerateSpeechView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     
     def create(self, request, *args, **kwargs):
-        from django.db.models import F
-        from apps.users.models import User # Ensure User is imported
         import traceback
 
         print(f"DEBUG: Generate request for user {request.user.email}")
 
-        try:
-            serializer = self.get_serializer(data=request.data)
-            serializer.is_valid(raise_exception=True)
+        # Validate before charging so bad input is a 400, not a refunded 500
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
+        generated = None
+        try:
             is_preview = serializer.validated_data.get('is_preview', False)
             
             if is_preview:
@@ -88,12 +209,9 @@ class GenerateSpeechView(generics.CreateAPIView):
             print(f"DEBUG: Attempting to deduct credits (Cost: {CREDIT_COST})...")
             
             if CREDIT_COST > 0:
-                updated = User.objects.filter(
-                    id=request.user.id, 
-                    credits__gte=CREDIT_COST
-                ).update(credits=F('credits') - CREDIT_COST)
+                updated = change_credits(request.user.id, -CREDIT_COST, 'generation', require_balance=True)
 
-                if updated == 0:
+                if not updated:
                     print("DEBUG: Insufficient credits")
                     return Response(
                         {'error': 'Insufficient credits. Please recharge.'},
@@ -116,7 +234,7 @@ class GenerateSpeechView(generics.CreateAPIView):
                     )
                 except VoiceProfile.DoesNotExist:
                     print("DEBUG: Voice Profile not found")
-                    User.objects.filter(id=request.user.id).update(credits=F('credits') + CREDIT_COST)
+                    change_credits(request.user.id, CREDIT_COST, 'refund')
                     return Response(
                         {'error': 'Voice profile not found'},
                         status=status.HTTP_404_NOT_FOUND
@@ -132,7 +250,7 @@ class GenerateSpeechView(generics.CreateAPIView):
                     )
                 except VoiceClone.DoesNotExist:
                     print("DEBUG: Voice Clone not found")
-                    User.objects.filter(id=request.user.id).update(credits=F('credits') + CREDIT_COST)
+                    change_credits(request.user.id, CREDIT_COST, 'refund')
                     return Response(
                         {'error': 'Voice clone not found or not ready'},
                         status=status.HTTP_404_NOT_FOUND
@@ -140,28 +258,29 @@ class GenerateSpeechView(generics.CreateAPIView):
             
             print(f"DEBUG: Generating speech for text: {serializer.validated_data['text'][:20]}...")
             # Generate speech
-            result = voice_service.generate_speech(
-                text=serializer.validated_data['text'],
-                voice_profile=voice_profile,
-                voice_clone=voice_clone
-            )
+            result = self.synthesize(serializer.validated_data, voice_profile, voice_clone)
             print(f"DEBUG: Generation result: {result}")
+            output_format = serializer.validated_data['output_format']
             
-            # Save generated speech record
-            generated = GeneratedSpeech.objects.create(
-                user=request.user,
-                voice_profile=voice_profile,
-                voice_clone=voice_clone,
-                input_text=serializer.validated_data['text'],
-                audio_file=result['audio_path'],
-                duration_seconds=result['duration'],
-                credits_used=CREDIT_COST,
-                balance_after=balance_after
-            )
+            # Save generated speech record (its daily usage is counted in the same transaction)
+            with transaction.atomic():
+                generated = GeneratedSpeech.objects.create(
+                    user=request.user,
+                    voice_profile=voice_profile,
+                    voice_clone=voice_clone,
+                    input_text=result.get('spoken_text', serializer.validated_data['text']),
+                    audio_file=result['audio_path'],
+                    output_format=output_format,
+                    duration_seconds=result['duration'],
+                    credits_used=CREDIT_COST,
+                    balance_after=balance_after
+                )
+                # Peaks are decoded in the background once the row is committed
+                waveform.schedule_peaks(generated.pk)
             print("DEBUG: Record saved successfully")
             
             return Response(
-                GeneratedSpeechSerializer(generated).data,
+                self.get_response_data(generated, result, serializer.validated_data),
                 status=status.HTTP_201_CREATED
             )
             
@@ -169,12 +288,67 @@ class GenerateSpeechView(generics.CreateAPIView):
             print(f"CRITICAL ERROR in GenerateSpeechView: {e}")
             traceback.print_exc()
             # Atomic Refund if generation fails
-            User.objects.filter(id=request.user.id).update(credits=F('credits') + CREDIT_COST)
+            if generated is not None:
+                refund_generation(generated)
+            else:
+                change_credits(request.user.id, CREDIT_COST, 'refund')
             return Response(
                 {'error': f'Generation failed: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    
+    def synthesize(self, validated_data, voice_profile, voice_clone):
+        """Produce the audio for a paid request; returns the service result dict."""
+        return voice_service.generate_speech(
+            text=validated_data['text'],
+            voice_profile=voice_profile,
+            voice_clone=voice_clone,
+            output_format=validated_data['output_format']
+        )
+    
+    def get_response_data(self, generated, result, validated_data):
+        return GeneratedSpeechSerializer(generated).data
+
+
+class TranslateAndGenerateView(GenerateSpeechView):
+    """
+    Translate text and generate speech in one pipelined request.
+    
+    Sentences are translated and synthesized concurrently, and credits are
+    charged once for the whole pipeline.
+    """
+    
+    serializer_class = TranslateAndGenerateSerializer
+    
+    def synthesize(self, validated_data, voice_profile, voice_clone):
+        target_language = validated_data['target_language']
+        source_language = validated_data.get('source_language', 'auto')
+        
+        result = voice_service.generate_translated_speech(
+            sentences=split_sentences(validated_data['text']),
+            translate=lambda sentence: translation_service.translate_and_generate_payload(
+                sentence, target_language, source_language
+            ),
+            voice_profile=voice_profile,
+            voice_clone=voice_clone,
+            output_format=validated_data['output_format']
+        )
+        result['spoken_text'] = result['translated_text']
+        return result
+    
+    def get_response_data(self, generated, result, validated_data):
+        data = GeneratedSpeechSerializer(generated).data
+        data.update({
+            'original_text': validated_data['text'],
+            'translated_text': result['translated_text'],
+            'source_language': validated_data.get('source_language', 'auto'),
+            'target_language': validated_data['target_language'],
+        })
+        if result['translation_error']:
+            data['translation_error'] = result['translation_error']
+        return data
+
 
 class TranslateTextView(generics.CreateAPIView):
     """Translate text to target language."""
@@ -198,6 +372,7 @@ class TranslateTextView(generics.CreateAPIView):
                 'original_text': text,
                 'translated_text': result['translated_text'],
                 'source_language': result['source_language'],
+                'detected_language': result['detected_language'],
                 'target_language': result['target_language'],
             }, status=status.HTTP_200_OK)
         else:
@@ -205,6 +380,7 @@ class TranslateTextView(generics.CreateAPIView):
                 'original_text': text,
                 'translated_text': result['translated_text'],
                 'source_language': result['source_language'],
+                'detected_language': result['detected_language'],
                 'target_language': result['target_language'],
                 'error': result['error'],
             }, status=status.HTTP_200_OK)  # Still return 200 with partial data
@@ -220,6 +396,47 @@ class SpeechHistoryViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         return GeneratedSpeech.objects.filter(user=self.request.user)
+    
+    def get_permissions(self):
+        # Signed audio URLs are checked in the action itself
+        if self.action == 'audio' and 'token' in self.request.query_params:
+            return []
+        return super().get_permissions()
+    
+    @action(detail=True, methods=['get'], renderer_classes=[MediaPassthroughRenderer])
+    def audio(self, request, pk=None):
+        """Stream the generated audio with Range and conditional request support (owner, or a signed audio_url)."""
+        speech = signed_media_object(request, GeneratedSpeech, 'speech-history-audio', pk, self)
+        content_type = OUTPUT_FORMATS.get(speech.output_format, {}).get('content_type')
+        return serve_media(request, speech.audio_file, content_type=content_type)
+
+
+class UsageView(generics.GenericAPIView):
+    """The current user's daily usage: GET ?start=YYYY-MM-DD&end=YYYY-MM-DD (default: last 30 days)."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        end = timezone.localdate()
+        start = end - timedelta(days=USAGE_DEFAULT_DAYS - 1)
+        try:
+            if request.query_params.get('end'):
+                end = date.fromisoformat(request.query_params['end'])
+            if request.query_params.get('start'):
+                start = date.fromisoformat(request.query_params['start'])
+            elif request.query_params.get('end'):
+                start = end - timedelta(days=USAGE_DEFAULT_DAYS - 1)
+        except ValueError:
+            return Response({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= USAGE_MAX_DAYS:
+            return Response(
+                {'error': f'The range is limited to {USAGE_MAX_DAYS} days'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(usage_between(request.user.id, start, end))
 
 
 # Admin ViewSets
@@ -285,23 +502,21 @@ class AdminDashboardView(generics.GenericAPIView):
         last_30_days = today - timedelta(days=30)
         last_7_days = today - timedelta(days=7)
         
-        # Voice profiles stats
-        total_profiles = VoiceProfile.objects.count()
-        active_profiles = VoiceProfile.objects.filter(is_active=True).count()
-        
-        # Voice clones stats
-        total_clones = VoiceClone.objects.count()
-        pending_clones = VoiceClone.objects.filter(status='pending').count()
-        ready_clones = VoiceClone.objects.filter(status='ready').count()
-        
-        # Generated speeches stats
-        total_generations = GeneratedSpeech.objects.count()
-        monthly_generations = GeneratedSpeech.objects.filter(
-            created_at__gte=last_30_days
-        ).count()
-        weekly_generations = GeneratedSpeech.objects.filter(
-            created_at__gte=last_7_days
-        ).count()
+        # One conditional-aggregation query per table
+        profiles = VoiceProfile.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+        )
+        clones = VoiceClone.objects.aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='pending')),
+            ready=Count('id', filter=Q(status='ready')),
+        )
+        generations = GeneratedSpeech.objects.aggregate(
+            total=Count('id'),
+            this_month=Count('id', filter=Q(created_at__gte=last_30_days)),
+            this_week=Count('id', filter=Q(created_at__gte=last_7_days)),
+        )
         
         # Most used voices
         top_voices = VoiceProfile.objects.annotate(
@@ -309,19 +524,18 @@ class AdminDashboardView(generics.GenericAPIView):
         ).order_by('-usage_count')[:5]
         
         return Response({
-            'voice_profiles': {
-                'total': total_profiles,
-                'active': active_profiles,
-            },
-            'voice_clones': {
-                'total': total_clones,
-                'pending': pending_clones,
-                'ready': ready_clones,
-            },
-            'generated_speeches': {
-                'total': total_generations,
-                'this_month': monthly_generations,
-                'this_week': weekly_generations,
-            },
+            'voice_profiles': profiles,
+            'voice_clones': clones,
+            'generated_speeches': generations,
             'top_voices': VoiceProfileSerializer(top_voices, many=True).data,
+            'users': user_stats(),
         })
+
+
+class TranslationProviderStatusView(generics.GenericAPIView):
+    """Circuit breaker state and transition counters for the translation provider (this worker)."""
+    
+    permission_classes = [IsAdminPermission]
+    
+    def get(self, request):
+        return Response(google_circuit_breaker.snapshot())
@@ -0,0 +1,129 @@
+"""
+Nearest-voice matching for voice clones.
+
+Every Edge TTS voice in VOICE_MAP is described by a small feature vector
+(log pitch, log spectral centroid) measured once from a reference render by
+`build_voice_index` and stored in ReferenceVoice. A clone sample is matched
+to the closest voice of its language with a single vectorized distance
+computation, and the result is cached on the clone. Voices that have not
+been analyzed yet use typical values for their gender.
+"""
+
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .models import ReferenceVoice
+
+# Typical features used for voices without a reference analysis
+DEFAULT_FEATURES = {
+    'male': (120.0, 1500.0),
+    'female': (210.0, 2000.0),
+}
+# Pitch dominates; brightness breaks ties between similar voices
+FEATURE_WEIGHTS = np.array([1.0, 0.5])
+
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def voice_catalog():
+    """
+    Return sorted (shortname, language, gender) for every distinct voice in
+    VOICE_MAP. The language is the VOICE_MAP key's, i.e. the app's language
+    code ('no' for 'nb-NO-...' voices), not the shortname prefix.
+    """
+    from .services import VOICE_MAP
+
+    voices = {}
+    for (gender, language, _emotion), shortname in VOICE_MAP.items():
+        voices.setdefault(shortname, (language, gender))
+    return sorted((shortname, language, gender) for shortname, (language, gender) in voices.items())
+
+
+def feature_vector(pitch_hz, spectral_centroid_hz):
+    """Log-frequency features; missing values are NaN."""
+    return np.array([
+        np.log2(pitch_hz) if pitch_hz else np.nan,
+        np.log2(spectral_centroid_hz) if spectral_centroid_hz else np.nan,
+    ])
+
+
+class VoiceIndex:
+    """Feature matrix over the voice catalog with language-filtered nearest-neighbour lookup."""
+
+    def __init__(self, voices):
+        # voices: iterable of (shortname, language, pitch_hz, spectral_centroid_hz)
+        voices = list(voices)
+        self.shortnames = np.array([voice[0] for voice in voices])
+        self.languages = np.array([voice[1] for voice in voices])
+        self.vectors = np.array([feature_vector(voice[2], voice[3]) for voice in voices]).reshape(-1, 2)
+
+    def __len__(self):
+        return len(self.shortnames)
+
+    def nearest(self, vector, language=None):
+        """Return the closest shortname, restricted to ``language`` when it has voices."""
+        present = ~np.isnan(vector)
+        if not len(self) or not present.any():
+            return None
+        mask = self.languages == language
+        if not mask.any():
+            mask = np.ones(len(self), dtype=bool)
+        candidates = self.vectors[mask][:, present]
+        distances = np.square((candidates - vector[present]) * FEATURE_WEIGHTS[present]).sum(axis=1)
+        return str(self.shortnames[mask][np.argmin(distances)])
+
+
+def build_index():
+    analyzed = {voice.shortname: voice for voice in ReferenceVoice.objects.all()}
+    voices = []
+    for shortname, language, gender in voice_catalog():
+        default_pitch, default_centroid = DEFAULT_FEATURES.get(gender, DEFAULT_FEATURES['female'])
+        reference = analyzed.get(shortname)
+        voices.append((
+            shortname,
+            language,
+            (reference and reference.pitch_hz) or default_pitch,
+            (reference and reference.spectral_centroid_hz) or default_centroid,
+        ))
+    return VoiceIndex(voices)
+
+
+def get_index():
+    """Process-wide index, rebuilt after VOICE_INDEX_TTL seconds."""
+    global _index, _index_built_at
+    ttl = getattr(settings, 'VOICE_INDEX_TTL', 3600)
+    with _index_lock:
+        if _index is None or time.monotonic() - _index_built_at > ttl:
+            _index = build_index()
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def match_voice(clone):
+    """
+    Pick the Edge voice closest to the clone's sample among voices of the
+    clone's language. Samples without usable features get a deterministic
+    voice of their language.
+    """
+    index = get_index()
+    shortname = index.nearest(feature_vector(clone.pitch_hz, clone.spectral_centroid_hz), clone.language)
+    if shortname:
+        return shortname
+
+    from .services import LANGUAGE_FALLBACKS
+
+    candidates = sorted(index.shortnames[index.languages == clone.language].tolist())
+    if candidates:
+        return candidates[(clone.id or 0) % len(candidates)]
+    return LANGUAGE_FALLBACKS.get(clone.language, 'en-US-AriaNeural')
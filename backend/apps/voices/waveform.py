@@ -0,0 +1,146 @@
+"""
+Precomputed waveform peaks for generated audio.
+
+Audio is decoded once and reduced to WAVEFORM_BUCKETS (min, max) pairs
+scaled to int8, stored interleaved as raw bytes on GeneratedSpeech (2 bytes
+per bucket). Clients draw the waveform from these bytes instead of
+downloading the audio.
+
+Peaks are computed off the request: schedule_peaks() hands a new speech to
+a small thread pool once its row is committed, and ``backfill_waveforms``
+fills in older rows. A row whose audio cannot be decoded gets empty peaks
+(b''), so it is not decoded again; NULL means not computed yet.
+"""
+
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from .clone_processing import _decode_with_ffmpeg
+
+WAVEFORM_BUCKETS = 1000
+
+# Raw PCM output formats decode without ffmpeg
+RAW_PCM_FORMATS = {'raw-16khz-16bit-mono-pcm', 'raw-8khz-16bit-mono-pcm'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def compute_peaks(samples, buckets=WAVEFORM_BUCKETS):
+    """
+    Reduce float samples in [-1, 1] to interleaved int8 (min, max) pairs.
+    Uses at most ``buckets`` buckets (fewer for very short audio).
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if not len(samples):
+        return b''
+    buckets = min(buckets, len(samples))
+    starts = np.linspace(0, len(samples), buckets, endpoint=False).astype(np.int64)
+    peaks = np.empty((buckets, 2), dtype=np.float32)
+    peaks[:, 0] = np.minimum.reduceat(samples, starts)
+    peaks[:, 1] = np.maximum.reduceat(samples, starts)
+    return np.clip(np.round(peaks * 127), -127, 127).astype(np.int8).tobytes()
+
+
+def decode_peaks(data):
+    """Inverse of compute_peaks: an (n, 2) int8 array of (min, max)."""
+    return np.frombuffer(bytes(data), dtype=np.int8).reshape(-1, 2)
+
+
+def decode_audio(path, output_format=None):
+    """Decode an audio file to mono float32, or return None if it cannot be decoded here."""
+    if output_format in RAW_PCM_FORMATS:
+        return np.fromfile(path, dtype='<i2').astype(np.float32) / 32768
+    if shutil.which('ffmpeg'):
+        samples, _ = _decode_with_ffmpeg(path)
+        return samples
+    return None
+
+
+def peaks_for_file(path, output_format=None):
+    """Peaks for an audio file; None when the file is missing, empty or undecodable."""
+    try:
+        if not os.path.getsize(path):
+            return None
+        samples = decode_audio(path, output_format)
+    except Exception as e:
+        print(f"Waveform decode failed for {path}: {e}")
+        return None
+    if samples is None or not len(samples):
+        return None
+    return compute_peaks(samples)
+
+
+def fill_missing_peaks(speeches, executor=None, workers=4):
+    """
+    Compute and store peaks for the GeneratedSpeech rows in ``speeches`` that
+    have none, decoding in parallel. Returns (updated, skipped).
+    """
+    from .models import GeneratedSpeech
+
+    missing = [speech for speech in speeches if speech.waveform_peaks is None and speech.audio_file]
+    if not missing:
+        return 0, 0
+
+    def peaks_of(speech):
+        return peaks_for_file(default_storage.path(speech.audio_file.name), speech.output_format)
+
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(missing)))) as pool:
+            results = list(pool.map(peaks_of, missing))
+    else:
+        results = list(executor.map(peaks_of, missing))
+
+    updated = []
+    for speech, peaks in zip(missing, results):
+        if peaks is not None:
+            speech.waveform_peaks = peaks
+            updated.append(speech)
+    GeneratedSpeech.objects.bulk_update(updated, ['waveform_peaks'])
+    return len(updated), len(missing) - len(updated)
+
+
+def compute_speech_peaks(speech_id):
+    """Store peaks for one GeneratedSpeech, or b'' when its audio cannot be decoded."""
+    from .models import GeneratedSpeech
+
+    close_old_connections()
+    try:
+        speech = GeneratedSpeech.objects.filter(pk=speech_id, waveform_peaks__isnull=True).first()
+        if speech is None or not speech.audio_file:
+            return
+        peaks = peaks_for_file(default_storage.path(speech.audio_file.name), speech.output_format)
+        GeneratedSpeech.objects.filter(pk=speech_id, waveform_peaks__isnull=True).update(waveform_peaks=peaks or b'')
+    except Exception as e:
+        print(f"Waveform peaks failed for speech {speech_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'WAVEFORM_THREADS', 1),
+                thread_name_prefix='waveform-peaks',
+            )
+        return _executor
+
+
+def schedule_peaks(speech_id):
+    """Compute a speech's peaks after the current transaction commits, off the request thread."""
+    def submit():
+        if getattr(settings, 'WAVEFORM_ASYNC', True):
+            _get_executor().submit(compute_speech_peaks, speech_id)
+        else:
+            compute_speech_peaks(speech_id)
+
+    transaction.on_commit(submit)
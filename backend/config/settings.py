@@ -205,7 +205,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -217,6 +217,8 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # Proxies in front of the app; client IPs for throttling come from X-Forwarded-For
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES')) if os.getenv('NUM_PROXIES') else None,
 }
 
 # JWT Settings
@@ -300,3 +302,146 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 EMAIL_TIMEOUT = 10  # Prevent SMTP from hanging too long
+
+# Translation
+# Load the aksharamukha transliteration engine in a background thread at boot
+# instead of on the first name transliteration request.
+TRANSLITERATION_PREWARM = os.getenv('TRANSLITERATION_PREWARM', 'False').lower() == 'true'
+
+# Maximum sentences translated/synthesized concurrently by the
+# translate-and-speak pipeline.
+TTS_PIPELINE_CONCURRENCY = int(os.getenv('TTS_PIPELINE_CONCURRENCY', 4))
+
+# Translation provider resilience: (connect, read) timeouts in seconds,
+# retries with jittered exponential backoff for transient errors within an
+# overall per-call deadline, and a per-worker circuit breaker that fails
+# fast while Google keeps failing.
+TRANSLATION_CONNECT_TIMEOUT = float(os.getenv('TRANSLATION_CONNECT_TIMEOUT', 3.05))
+TRANSLATION_READ_TIMEOUT = float(os.getenv('TRANSLATION_READ_TIMEOUT', 10))
+TRANSLATION_DEADLINE = float(os.getenv('TRANSLATION_DEADLINE', 15))
+TRANSLATION_MAX_RETRIES = int(os.getenv('TRANSLATION_MAX_RETRIES', 2))
+TRANSLATION_RETRY_BACKOFF = float(os.getenv('TRANSLATION_RETRY_BACKOFF', 0.25))
+TRANSLATION_RETRY_BACKOFF_CAP = float(os.getenv('TRANSLATION_RETRY_BACKOFF_CAP', 2.0))
+TRANSLATION_BREAKER_FAILURE_THRESHOLD = int(os.getenv('TRANSLATION_BREAKER_FAILURE_THRESHOLD', 5))
+TRANSLATION_BREAKER_RECOVERY_TIMEOUT = float(os.getenv('TRANSLATION_BREAKER_RECOVERY_TIMEOUT', 30))
+
+# Voice clone processing
+# 'thread': web workers process uploads in a background thread pool.
+# 'worker': uploads stay pending for `python manage.py process_voice_clones`.
+CLONE_PROCESSING_MODE = os.getenv('CLONE_PROCESSING_MODE', 'thread')
+CLONE_PROCESSING_THREADS = int(os.getenv('CLONE_PROCESSING_THREADS', 2))
+# In 'thread' mode each web process requeues clones stuck in processing for
+# CLONE_PROCESSING_STALE_AFTER seconds and resubmits pending ones at startup and
+# every CLONE_RECOVERY_INTERVAL seconds (0: at startup only)
+CLONE_PROCESSING_STALE_AFTER = int(os.getenv('CLONE_PROCESSING_STALE_AFTER', 600))
+CLONE_RECOVERY_INTERVAL = int(os.getenv('CLONE_RECOVERY_INTERVAL', 300))
+CLONE_SAMPLE_MAX_BYTES = int(os.getenv('CLONE_SAMPLE_MAX_BYTES', 50 * 1024 * 1024))
+# Largest single PATCH accepted by the resumable clone upload endpoint
+CLONE_UPLOAD_MAX_CHUNK_BYTES = int(os.getenv('CLONE_UPLOAD_MAX_CHUNK_BYTES', 8 * 1024 * 1024))
+# Seconds after which a chunk that never finished no longer blocks its upload
+CLONE_UPLOAD_CHUNK_TIMEOUT = int(os.getenv('CLONE_UPLOAD_CHUNK_TIMEOUT', 600))
+# Idle uploads and their part directories are removed by collect_media_garbage after this
+CLONE_UPLOAD_EXPIRY_HOURS = float(os.getenv('CLONE_UPLOAD_EXPIRY_HOURS', 24))
+CLONE_SAMPLE_MIN_SECONDS = float(os.getenv('CLONE_SAMPLE_MIN_SECONDS', 3))
+CLONE_SAMPLE_MAX_SECONDS = float(os.getenv('CLONE_SAMPLE_MAX_SECONDS', 600))
+# Analysis limits applied by the processing pipeline: overall loudness, share of clipped samples and
+# share of silent 40 ms frames
+CLONE_SAMPLE_MIN_RMS_DBFS = float(os.getenv('CLONE_SAMPLE_MIN_RMS_DBFS', -50))
+CLONE_SAMPLE_MAX_CLIPPING_RATIO = float(os.getenv('CLONE_SAMPLE_MAX_CLIPPING_RATIO', 0.01))
+CLONE_SAMPLE_MAX_SILENCE_RATIO = float(os.getenv('CLONE_SAMPLE_MAX_SILENCE_RATIO', 0.8))
+
+# Seconds before the clone voice-matching index reloads ReferenceVoice features
+VOICE_INDEX_TTL = int(os.getenv('VOICE_INDEX_TTL', 3600))
+
+# Media garbage collection (python manage.py collect_media_garbage)
+# Unreferenced files younger than this are kept (uncommitted requests)
+MEDIA_GC_GRACE_HOURS = float(os.getenv('MEDIA_GC_GRACE_HOURS', 24))
+# Optional generated audio retention per user tier, in days (empty = keep forever)
+AUDIO_RETENTION_DAYS = {
+    tier: int(days)
+    for tier, days in (
+        ('free', os.getenv('AUDIO_RETENTION_DAYS_FREE')),
+        ('paid', os.getenv('AUDIO_RETENTION_DAYS_PAID')),
+    )
+    if days
+}
+
+# Authenticated media endpoints hand the byte transfer to the front proxy when set:
+# 'x-accel' (nginx, internal location at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT)
+# or 'x-sendfile' (Apache mod_xsendfile / lighttpd). Empty streams from Django.
+MEDIA_ACCEL_MODE = os.getenv('MEDIA_ACCEL_MODE', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+# Seconds a signed media URL (audio_url, sample_url) stays valid
+MEDIA_URL_MAX_AGE = int(os.getenv('MEDIA_URL_MAX_AGE', 3600))
+
+# Image variants (thumbnail/medium/WebP) render in this many background threads;
+# IMAGE_VARIANTS_ASYNC=False renders them inline after commit
+IMAGE_VARIANTS_ASYNC = os.getenv('IMAGE_VARIANTS_ASYNC', 'True').lower() == 'true'
+IMAGE_VARIANT_THREADS = int(os.getenv('IMAGE_VARIANT_THREADS', 1))
+
+# Waveform peaks of new speech are decoded in this many background threads after
+# the row commits; WAVEFORM_ASYNC=False decodes them inline after commit
+WAVEFORM_ASYNC = os.getenv('WAVEFORM_ASYNC', 'True').lower() == 'true'
+WAVEFORM_THREADS = int(os.getenv('WAVEFORM_THREADS', 1))
+
+# Seconds an authenticated user is cached per process by CachedJWTAuthentication
+# (0 disables the cache); entries are invalidated on User save/delete
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 30))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 10000))
+
+# Email outbox (apps.users.outbox)
+# 'thread': each web process delivers queued email in background threads.
+# 'worker': email stays queued for `python manage.py send_outbox`.
+EMAIL_OUTBOX_MODE = os.getenv('EMAIL_OUTBOX_MODE', 'thread')
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+# SMTP connections (sender threads) per web process in 'thread' mode
+EMAIL_OUTBOX_CONNECTIONS = int(os.getenv('EMAIL_OUTBOX_CONNECTIONS', 2))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+# Full-jitter exponential backoff between attempts, in seconds
+EMAIL_OUTBOX_RETRY_BASE = float(os.getenv('EMAIL_OUTBOX_RETRY_BASE', 30))
+EMAIL_OUTBOX_RETRY_CAP = float(os.getenv('EMAIL_OUTBOX_RETRY_CAP', 3600))
+# In 'thread' mode each web process requeues rows stuck in sending for
+# EMAIL_OUTBOX_STALE_AFTER seconds and drains due rows at startup and every
+# EMAIL_OUTBOX_RECOVERY_INTERVAL seconds (0: at startup only)
+EMAIL_OUTBOX_STALE_AFTER = int(os.getenv('EMAIL_OUTBOX_STALE_AFTER', 600))
+EMAIL_OUTBOX_RECOVERY_INTERVAL = int(os.getenv('EMAIL_OUTBOX_RECOVERY_INTERVAL', 60))
+# Largest number of messages accepted by one bulk text-mail request
+TEXT_MAIL_BULK_MAX_MESSAGES = int(os.getenv('TEXT_MAIL_BULK_MAX_MESSAGES', 1000))
+
+# Cached JSON of read-mostly endpoints (voice profiles, payment settings):
+# seconds an entry lives, and max-age sent for the public ones
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_MAX_AGE = int(os.getenv('RESPONSE_CACHE_MAX_AGE', 60))
+
+# Seconds the admin user statistics (apps.users.stats) are cached
+ADMIN_STATS_CACHE_TTL = int(os.getenv('ADMIN_STATS_CACHE_TTL', 30))
+
+# Per-process cache for everything except throttling and the response cache's
+# version tokens, which need one store shared by all workers: Redis when
+# REDIS_URL is set, otherwise database tables (created by
+# `python manage.py createcachetable`)
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'throttle': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+        if REDIS_URL else
+        {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'throttle_cache'}
+    ),
+    'shared': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL, 'KEY_PREFIX': 'shared'}
+        if REDIS_URL else
+        {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'shared_cache'}
+    ),
+}
+
+# Token buckets for the unauthenticated OTP and mail endpoints (apps.users.throttling):
+# "<capacity>:<tokens>/<period>", keyed by client IP and by the email in the request
+THROTTLE_BUCKETS = {
+    'otp-send-ip': os.getenv('THROTTLE_OTP_SEND_IP', '10:30/hour'),
+    'otp-send-email': os.getenv('THROTTLE_OTP_SEND_EMAIL', '3:10/hour'),
+    'otp-verify-ip': os.getenv('THROTTLE_OTP_VERIFY_IP', '20:60/hour'),
+    'otp-verify-email': os.getenv('THROTTLE_OTP_VERIFY_EMAIL', '5:10/hour'),
+    'text-mail-ip': os.getenv('THROTTLE_TEXT_MAIL_IP', '10:60/hour'),
+    'text-mail-email': os.getenv('THROTTLE_TEXT_MAIL_EMAIL', '5:20/hour'),
+}
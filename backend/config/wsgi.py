@@ -7,3 +7,10 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 application = get_wsgi_application()
+
+# Background queues in 'thread' mode: pick up work orphaned by earlier processes
+from apps.users.outbox import start_recovery as start_outbox_recovery  # noqa: E402
+from apps.voices.clone_processing import start_recovery as start_clone_recovery  # noqa: E402
+
+start_clone_recovery()
+start_outbox_recovery()
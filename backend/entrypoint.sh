@@ -5,6 +5,7 @@ set -e
 
 echo "Running migrations..."
 python manage.py migrate
+python manage.py createcachetable
 
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
@@ -73,7 +73,7 @@ export function Dashboard() {
         audioInstance.current.pause();
       }
       
-      const url = getAudioUrl(item.audio_file);
+      const url = getAudioUrl(item.audio_url || item.audio_file);
       if (!url) {
         toast.error('Audio not available');
         return;
@@ -90,7 +90,7 @@ export function Dashboard() {
   };
 
   const handleDownload = async (item) => {
-    const url = getAudioUrl(item.audio_file);
+    const url = getAudioUrl(item.audio_url || item.audio_file);
     if (!url) {
       toast.error('Audio not available');
       return;
@@ -120,7 +120,7 @@ export function GenerationHistory() {
                                             <Button 
                                                 variant="ghost" 
                                                 size="sm" 
-                                                onClick={() => togglePlay(item.id, item.audio_file)}
+                                                onClick={() => togglePlay(item.id, item.audio_url || item.audio_file)}
                                                 className={playingId === item.id ? "text-primary" : ""}
                                             >
                                                 {playingId === item.id ? <Pause className="w-4 h-4" /> : <Play className="w-4 h-4" />}
@@ -180,7 +180,7 @@ export function VoiceGenerate() {
         audioInstance.current.pause();
       }
 
-      const url = getAudioUrl(item.audio_file);
+      const url = getAudioUrl(item.audio_url || item.audio_file);
       if (!url) {
         toast.error('Audio not available');
         return;
@@ -196,7 +196,7 @@ export function VoiceGenerate() {
   };
 
   const handleDownload = async (item) => {
-    const audioUrl = getAudioUrl(item.audio_file);
+    const audioUrl = getAudioUrl(item.audio_url || item.audio_file);
     if (!audioUrl) {
       toast.error('No audio file available');
       return;
@@ -272,7 +272,7 @@ export function VoiceGenerate() {
           text: sampleText,
           voice_profile_id: profile.id
         }, true);
-        audioUrl = result.audio_file;
+        audioUrl = result.audio_url || result.audio_file;
       }
 
       const url = getAudioUrl(audioUrl);